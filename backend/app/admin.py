@@ -0,0 +1,19 @@
+"""Authentication for admin-only endpoints."""
+
+import os
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+
+def require_admin(authorization: Optional[str] = Header(default=None)) -> None:
+    """FastAPI dependency accepting `Authorization: Bearer <ADMIN_TOKEN>`."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
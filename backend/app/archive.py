@@ -0,0 +1,445 @@
+"""Bulk export and import of sessions with their participants and history.
+
+An archive is gzip-compressed JSON lines. Each session is one `session`
+record (with its current code) followed by its `user` records, its
+`stats` record and per-minute `activity` records, and its `change`
+records in (timestamp, id) order. Like the history endpoint's
+diff mode, the first change of a session carries its full content and
+every following one only a splice against its predecessor.
+
+Both directions stream: the export pages through sessions, and through
+the history of each page of sessions with one keyset-paginated query, and
+compresses as it goes; the import reads line by line and writes in
+batched inserts. Memory stays bounded by the page and batch sizes, not
+by the archive size.
+
+The import commits only between sessions, so a failed import leaves no
+half-imported session behind and can simply be run again: the sessions
+it completed are skipped.
+
+    python -m app.archive export --since 2024-01-01 --until 2024-02-01 -o jan.jsonl.gz
+    python -m app.archive import jan.jsonl.gz
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import zlib
+from datetime import datetime
+from typing import IO, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from .database import hash_code
+from .history import apply_diff, compute_diff
+from .orm_models import CodeBlob, CodeChange, Session as ORMSession, SessionActivity, SessionStats, SessionUser
+from .search import index_new_sessions
+
+ARCHIVE_MEDIA_TYPE = "application/gzip"
+# Sessions read per query during export
+EXPORT_PAGE_SIZE = 200
+# History rows read per query during export
+EXPORT_CHANGE_PAGE_SIZE = 1000
+# Compressed output is yielded in chunks of roughly this many input bytes
+EXPORT_CHUNK_BYTES = 64 * 1024
+# Rows per INSERT during import; commits happen at the first session boundary after a batch
+IMPORT_BATCH_SIZE = 1000
+# Uploaded archives larger than this are spooled to disk before import
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+def _iter_session_pages(
+    db: Session,
+    session_ids: Optional[Sequence[str]],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    page_size: int,
+) -> Iterator[list]:
+    """Pages of selected sessions with their code, in id order."""
+    base = select(
+        ORMSession.id,
+        ORMSession.language,
+        ORMSession.createdAt,
+        ORMSession.lastActivityAt,
+        ORMSession.isActive,
+        ORMSession.version,
+        CodeBlob.content.label("code"),
+    ).join(CodeBlob, CodeBlob.hash == ORMSession.code_hash)
+    if session_ids is not None:
+        base = base.where(ORMSession.id.in_(session_ids))
+    if since is not None:
+        base = base.where(ORMSession.createdAt >= since)
+    if until is not None:
+        base = base.where(ORMSession.createdAt < until)
+
+    last_id: Optional[str] = None
+    while True:
+        query = base if last_id is None else base.where(ORMSession.id > last_id)
+        rows = db.execute(query.order_by(ORMSession.id).limit(page_size)).all()
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1].id
+
+
+_COUNTERS = ("codeUpdates", "charsInserted", "charsDeleted", "runs", "failedRuns")
+# Fields of the `stats` and `activity` records besides sessionId
+_STATS_FIELDS = _COUNTERS + ("activeMinutes", "firstEditAt", "lastEditAt", "firstRunAt", "lastRunAt")
+_ACTIVITY_FIELDS = ("minute",) + _COUNTERS
+_TIME_FIELDS = {"firstEditAt", "lastEditAt", "firstRunAt", "lastRunAt", "minute"}
+
+
+def _stats_record(row, fields: Sequence[str]) -> dict:
+    record = {"sessionId": row.session_id}
+    for field in fields:
+        value = getattr(row, field)
+        record[field] = value.isoformat() if isinstance(value, datetime) else value
+    return record
+
+
+def _stats_row(session_id: str, record: dict) -> dict:
+    row = {"session_id": session_id}
+    for field, value in record.items():
+        if field not in ("type", "sessionId"):
+            row[field] = _parse_time(value) if field in _TIME_FIELDS else value
+    return row
+
+
+def _iter_page_changes(db: Session, session_ids: Sequence[str], page_size: int) -> Iterator:
+    """History rows of the given sessions in (session_id, timestamp, id) order."""
+    order = (CodeChange.session_id, CodeChange.timestamp, CodeChange.id)
+    base = (
+        select(*order, CodeChange.userId, CodeChange.language, CodeBlob.content)
+        .join(CodeBlob, CodeBlob.hash == CodeChange.content_hash)
+        .where(CodeChange.session_id.in_(session_ids))
+    )
+    last: Optional[tuple] = None
+    while True:
+        query = base if last is None else base.where(tuple_(*order) > tuple_(*last))
+        rows = db.execute(query.order_by(*order).limit(page_size)).all()
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = (rows[-1].session_id, rows[-1].timestamp, rows[-1].id)
+
+
+def iter_archive_records(
+    db: Session,
+    session_ids: Optional[Sequence[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+    change_page_size: int = EXPORT_CHANGE_PAGE_SIZE,
+) -> Iterator[dict]:
+    """Archive records of the selected sessions; `since`/`until` bound createdAt."""
+    for page in _iter_session_pages(db, session_ids, since, until, page_size):
+        page_ids = [row.id for row in page]
+        users: dict = {}
+        for user in db.execute(
+            select(SessionUser.id, SessionUser.name, SessionUser.isHost, SessionUser.joinedAt, SessionUser.session_id)
+            .where(SessionUser.session_id.in_(page_ids))
+            .order_by(SessionUser.joinedAt, SessionUser.id)
+        ):
+            users.setdefault(user.session_id, []).append(user)
+        stats = {
+            row.session_id: row
+            for row in db.scalars(select(SessionStats).where(SessionStats.session_id.in_(page_ids)))
+        }
+        activity: dict = {}
+        for bucket in db.scalars(
+            select(SessionActivity)
+            .where(SessionActivity.session_id.in_(page_ids))
+            .order_by(SessionActivity.session_id, SessionActivity.minute)
+        ):
+            activity.setdefault(bucket.session_id, []).append(bucket)
+        changes = _iter_page_changes(db, page_ids, change_page_size)
+        pending = next(changes, None)
+
+        for row in page:
+            yield {
+                "type": "session",
+                "id": row.id,
+                "language": row.language,
+                "createdAt": row.createdAt.isoformat(),
+                "lastActivityAt": row.lastActivityAt.isoformat(),
+                "isActive": row.isActive,
+                "version": row.version,
+                "code": row.code,
+            }
+            for user in users.get(row.id, ()):
+                yield {
+                    "type": "user",
+                    "id": user.id,
+                    "sessionId": row.id,
+                    "name": user.name,
+                    "isHost": user.isHost,
+                    "joinedAt": user.joinedAt.isoformat() if user.joinedAt is not None else None,
+                }
+            if row.id in stats:
+                yield {"type": "stats", **_stats_record(stats[row.id], _STATS_FIELDS)}
+            for bucket in activity.get(row.id, ()):
+                yield {"type": "activity", **_stats_record(bucket, _ACTIVITY_FIELDS)}
+            previous: Optional[str] = None
+            # Sessions and their history come in the same id order
+            while pending is not None and pending.session_id == row.id:
+                record = {
+                    "type": "change",
+                    "sessionId": row.id,
+                    "userId": pending.userId,
+                    "language": pending.language,
+                    "timestamp": pending.timestamp.isoformat(),
+                }
+                if previous is None:
+                    record["content"] = pending.content
+                else:
+                    record["diff"] = compute_diff(previous, pending.content)
+                previous = pending.content
+                yield record
+                pending = next(changes, None)
+
+
+def iter_gzip_jsonl(records: Iterable[dict], level: int = 6) -> Iterator[bytes]:
+    """Encode records as gzip-compressed JSON lines, incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    pending: List[bytes] = []
+    size = 0
+    for record in records:
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        pending.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            chunk = compressor.compress(b"".join(pending))
+            pending, size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b"".join(pending)) + compressor.flush()
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+class _BatchWriter:
+    """Buffers rows per table and writes them with multi-row inserts.
+
+    Writes are only committed by `commit`, which the import calls between
+    sessions.
+    """
+
+    def __init__(self, db: Session, batch_size: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.blobs: dict = {}
+        self.session_ids: set = set()
+        self.sessions: List[dict] = []
+        self.search_documents: List[dict] = []
+        self.users: List[dict] = []
+        self.stats: List[dict] = []
+        self.activity: List[dict] = []
+        self.changes: List[dict] = []
+        # Rows written or buffered since the last commit
+        self.uncommitted = 0
+
+    def blob(self, content: str, now: datetime) -> str:
+        digest = hash_code(content)
+        if digest not in self.blobs:
+            self.blobs[digest] = {
+                "hash": digest,
+                "content": content,
+                "size": len(content.encode("utf-8")),
+                "lastUsedAt": now,
+            }
+        return digest
+
+    def add(self, rows: List[dict], row: dict) -> None:
+        rows.append(row)
+        self.uncommitted += 1
+        if len(rows) >= self.batch_size or len(self.blobs) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        # Parents before children, so the batch also satisfies foreign keys
+        if self.blobs:
+            existing = set(self.db.scalars(select(CodeBlob.hash).where(CodeBlob.hash.in_(list(self.blobs)))))
+            missing = [row for digest, row in self.blobs.items() if digest not in existing]
+            if missing:
+                self.db.execute(insert(CodeBlob.__table__), missing)
+        # Core inserts: the ORM bulk path costs more per row than the INSERT itself
+        for model, rows in (
+            (ORMSession, self.sessions),
+            (SessionUser, self.users),
+            (SessionStats, self.stats),
+            (SessionActivity, self.activity),
+            (CodeChange, self.changes),
+        ):
+            if rows:
+                self.db.execute(insert(model.__table__), rows)
+        index_new_sessions(self.db, self.search_documents)
+        self.blobs, self.session_ids = {}, set()
+        self.sessions, self.users, self.changes, self.search_documents = [], [], [], []
+        self.stats, self.activity = [], []
+
+    def commit(self) -> None:
+        self.flush()
+        self.db.commit()
+        self.uncommitted = 0
+
+
+def import_archive(db: Session, lines: Iterable[bytes], batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Load archive lines; sessions that already exist are skipped with their rows.
+
+    Returns the number of sessions, users and changes imported and of
+    sessions skipped. On error everything since the last commit is rolled
+    back, so every session in the database is complete.
+    """
+    try:
+        return _import_lines(_BatchWriter(db, batch_size), lines)
+    except BaseException:
+        db.rollback()
+        raise
+
+
+def _import_lines(writer: _BatchWriter, lines: Iterable[bytes]) -> dict:
+    db = writer.db
+    counts = {"sessions": 0, "users": 0, "changes": 0, "skipped": 0}
+    now = datetime.utcnow()
+    session_id: Optional[str] = None
+    skip = False
+    previous: Optional[str] = None
+
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        kind = record["type"]
+        if kind == "session":
+            # The previous session is complete; a good point to commit
+            if writer.uncommitted >= writer.batch_size:
+                writer.commit()
+            session_id, previous = record["id"], None
+            skip = session_id in writer.session_ids or (
+                db.scalar(select(ORMSession.id).where(ORMSession.id == session_id)) is not None
+            )
+            if skip:
+                counts["skipped"] += 1
+                continue
+            counts["sessions"] += 1
+            writer.session_ids.add(session_id)
+            writer.search_documents.append(
+                {
+                    "session_id": session_id,
+                    "language": record["language"],
+                    "code": record["code"],
+                    "updatedAt": _parse_time(record["lastActivityAt"]),
+                }
+            )
+            writer.add(
+                writer.sessions,
+                {
+                    "id": record["id"],
+                    "code_hash": writer.blob(record["code"], now),
+                    "language": record["language"],
+                    "createdAt": _parse_time(record["createdAt"]),
+                    "lastActivityAt": _parse_time(record["lastActivityAt"]),
+                    "isActive": record["isActive"],
+                    "version": record["version"],
+                },
+            )
+            continue
+
+        if record["sessionId"] != session_id:
+            raise ValueError(f"{kind} record for {record['sessionId']} outside its session")
+        if skip:
+            continue
+        if kind == "user":
+            counts["users"] += 1
+            writer.add(
+                writer.users,
+                {
+                    "id": record["id"],
+                    "session_id": session_id,
+                    "name": record["name"],
+                    "isHost": record["isHost"],
+                    "joinedAt": _parse_time(record["joinedAt"]),
+                },
+            )
+        elif kind == "stats":
+            writer.add(writer.stats, _stats_row(session_id, record))
+        elif kind == "activity":
+            writer.add(writer.activity, _stats_row(session_id, record))
+        elif kind == "change":
+            if "diff" in record:
+                if previous is None:
+                    raise ValueError(f"Change diff without a base content in session {session_id}")
+                content = apply_diff(previous, record["diff"])
+            else:
+                content = record["content"]
+            previous = content
+            counts["changes"] += 1
+            writer.add(
+                writer.changes,
+                {
+                    "session_id": session_id,
+                    "userId": record["userId"],
+                    "content_hash": writer.blob(content, now),
+                    "language": record["language"],
+                    "timestamp": _parse_time(record["timestamp"]),
+                },
+            )
+        else:
+            raise ValueError(f"Unknown archive record type {kind!r}")
+
+    writer.commit()
+    return counts
+
+
+def read_archive(file: IO[bytes]) -> Iterator[bytes]:
+    """Lines of a gzip-compressed archive, decompressed as they are read."""
+    with gzip.open(file, "rb") as lines:
+        yield from lines
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from .db import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m app.archive", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write sessions to a .jsonl.gz archive")
+    export_parser.add_argument("--ids", help="comma-separated session ids")
+    export_parser.add_argument("--since", type=datetime.fromisoformat, help="created at or after (UTC)")
+    export_parser.add_argument("--until", type=datetime.fromisoformat, help="created before (UTC)")
+    export_parser.add_argument("-o", "--output", help="archive path; stdout if omitted")
+    import_parser = commands.add_parser("import", help="load a .jsonl.gz archive")
+    import_parser.add_argument("archive", help="archive path; - for stdin")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "export":
+            ids = [item for item in args.ids.split(",") if item] if args.ids else None
+            chunks = iter_gzip_jsonl(iter_archive_records(db, ids, args.since, args.until))
+            output = open(args.output, "wb") if args.output else sys.stdout.buffer
+            try:
+                for chunk in chunks:
+                    output.write(chunk)
+            finally:
+                if args.output:
+                    output.close()
+        else:
+            source = sys.stdin.buffer if args.archive == "-" else open(args.archive, "rb")
+            try:
+                counts = import_archive(db, read_archive(source), args.batch_size)
+            finally:
+                if source is not sys.stdin.buffer:
+                    source.close()
+            print(json.dumps(counts))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Ephemeral cursor/selection awareness, kept in memory only.
+
+Each session holds at most one state per user: a newer update simply
+replaces the older one, so however fast a client sends cursor moves, a
+poller only ever receives the latest position per user. Every change
+bumps a per-session sequence number, and readers pass the last number
+they saw to get just what changed since.
+
+Nothing here touches the database; the endpoint only checks that a user
+belongs to the session while the user has no live state. Memory is
+bounded by the number of users per session, by the number of sessions
+tracked (least recently updated sessions are dropped first), and by a
+TTL after which silent users disappear. Reaped sessions are evicted
+through the reaper hook.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from .reaper import register_eviction_hook
+
+# Users that have not sent an update for this long are dropped
+AWARENESS_TTL_SECONDS = float(os.environ.get("AWARENESS_TTL_SECONDS", "30"))
+MAX_USERS_PER_SESSION = int(os.environ.get("AWARENESS_MAX_USERS_PER_SESSION", "32"))
+MAX_SESSIONS = int(os.environ.get("AWARENESS_MAX_SESSIONS", "10000"))
+
+# anchorLine, anchorColumn, headLine, headColumn; a bare cursor has anchor == head
+Selection = Tuple[int, int, int, int]
+
+
+class _SessionAwareness:
+    __slots__ = ("seq", "states", "removed")
+
+    def __init__(self):
+        self.seq = 0
+        # userId -> (seq, last update (monotonic), selection)
+        self.states: Dict[str, Tuple[int, float, Selection]] = {}
+        # userId -> (seq, removal time (monotonic)); kept for one TTL so pollers notice
+        self.removed: Dict[str, Tuple[int, float]] = {}
+
+    def expire(self, now: float) -> None:
+        cutoff = now - AWARENESS_TTL_SECONDS
+        for user_id in [u for u, (_, updated, _) in self.states.items() if updated < cutoff]:
+            self.remove(user_id, now)
+        for user_id in [u for u, (_, removed_at) in self.removed.items() if removed_at < cutoff]:
+            del self.removed[user_id]
+
+    def remove(self, user_id: str, now: float) -> None:
+        if self.states.pop(user_id, None) is not None:
+            self.seq += 1
+            self.removed[user_id] = (self.seq, now)
+
+
+class AwarenessHub:
+    """Latest selection per user for every session with recent activity."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, _SessionAwareness]" = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def update(self, session_id: str, user_id: str, selection: Selection) -> int:
+        """Replace a user's state; returns the session's new sequence number."""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _SessionAwareness()
+                while len(self._sessions) > MAX_SESSIONS:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+
+            current = session.states.get(user_id)
+            if current is not None and current[2] == selection:
+                # Unchanged: only keep the user alive
+                session.states[user_id] = (current[0], now, selection)
+                return session.seq
+
+            session.seq += 1
+            session.states[user_id] = (session.seq, now, selection)
+            session.removed.pop(user_id, None)
+            if len(session.states) > MAX_USERS_PER_SESSION:
+                stalest = min(session.states, key=lambda u: session.states[u][1])
+                session.remove(stalest, now)
+            return session.seq
+
+    def has_user(self, session_id: str, user_id: str) -> bool:
+        """Whether a user has a live state in the session."""
+        cutoff = time.monotonic() - AWARENESS_TTL_SECONDS
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            state = session.states.get(user_id)
+            return state is not None and state[1] >= cutoff
+
+    def changes(self, session_id: str, since: int = 0) -> Tuple[int, List[tuple], List[str]]:
+        """States updated and users removed after sequence number `since`.
+
+        Returns (cursor, states, removed), where each state is
+        `(userId, anchorLine, anchorColumn, headLine, headColumn)`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return 0, [], []
+            session.expire(now)
+            if since > session.seq:
+                # The session was evicted and recreated; resend everything
+                since = 0
+            states = [(user_id,) + selection for user_id, (seq, _, selection) in session.states.items() if seq > since]
+            removed = [user_id for user_id, (seq, _) in session.removed.items() if seq > since]
+            return session.seq, states, removed
+
+    def remove_user(self, session_id: str, user_id: str) -> None:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.remove(user_id, time.monotonic())
+
+    def evict(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+hub = AwarenessHub()
+
+
+@register_eviction_hook
+def _evict_session(session_id: str) -> None:
+    hub.evict(session_id)
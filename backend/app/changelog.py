@@ -0,0 +1,155 @@
+"""Per-session ring buffer of recent versioned code changes.
+
+Every code update bumps the session version. The buffer keeps the last
+few changes of each active session as splices against the previous
+version, plus the current text to diff the next update against. A
+client that reconnects with the last version it saw gets just the
+changes it missed, straight from memory. Only when the gap is older than
+the buffer (or the buffer is cold, e.g. after a restart) does it need a
+snapshot from the database.
+
+Splice offsets count UTF-16 code units, as JavaScript strings do (see
+`history.compute_diff`), so a browser can apply them with `slice` even
+when the code contains emoji or other characters outside the Basic
+Multilingual Plane.
+
+The buffer is per process, which matches the single-worker deployment.
+With several workers, route each session to one worker.
+"""
+
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, List, Optional
+
+from .history import compute_diff
+from .reaper import register_eviction_hook
+
+# Changes kept per session
+CHANGE_BUFFER_SIZE = int(os.environ.get("CHANGE_BUFFER_SIZE", "256"))
+# Upper bound on the splice text held per session; older changes are dropped first
+CHANGE_BUFFER_MAX_BYTES = int(os.environ.get("CHANGE_BUFFER_MAX_BYTES", str(256 * 1024)))
+# Sessions with a buffer; the least recently updated one is dropped first
+CHANGE_BUFFER_MAX_SESSIONS = int(os.environ.get("CHANGE_BUFFER_MAX_SESSIONS", "1000"))
+
+
+class _SessionLog:
+    __slots__ = ("version", "text", "language", "changes", "size")
+
+    def __init__(self, version: int, text: Optional[str], language: str):
+        self.version = version
+        self.text = text
+        self.language = language
+        self.changes: Deque[dict] = deque(maxlen=CHANGE_BUFFER_SIZE)
+        self.size = 0
+
+    @property
+    def base_version(self) -> int:
+        """Oldest version a client can resume from."""
+        return self.changes[0]["version"] - 1 if self.changes else self.version
+
+    def append(self, change: dict) -> None:
+        if len(self.changes) == self.changes.maxlen:
+            self.size -= len(self.changes[0]["edit"]["text"])
+        self.changes.append(change)
+        self.size += len(change["edit"]["text"])
+        while self.size > CHANGE_BUFFER_MAX_BYTES and len(self.changes) > 1:
+            self.size -= len(self.changes.popleft()["edit"]["text"])
+
+
+class ChangeLog:
+    """Ring buffers of recent changes for the most recently active sessions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, _SessionLog]" = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def record(
+        self, session_id: str, version: int, user_id: str, code: str, language: str, timestamp: datetime
+    ) -> None:
+        """Add the change that produced `version`.
+
+        If the buffer does not hold the previous version, it restarts from
+        this one, so it never serves a sequence with a hole in it.
+        """
+        with self._lock:
+            log = self._sessions.get(session_id)
+            if log is not None and log.version >= version:
+                return
+            if log is None or log.version != version - 1 or log.text is None:
+                self._store(session_id, _SessionLog(version, code, language))
+                return
+            log.append(
+                {
+                    "version": version,
+                    "userId": user_id,
+                    "language": language,
+                    "timestamp": timestamp,
+                    "edit": compute_diff(log.text, code),
+                }
+            )
+            log.version, log.text, log.language = version, code, language
+            self._sessions.move_to_end(session_id)
+
+    def record_edit(
+        self, session_id: str, version: int, user_id: str, language: str, timestamp: datetime, edit: dict
+    ) -> None:
+        """Add a change already known as a splice, e.g. an op on a live document.
+
+        The splice offsets must already count UTF-16 code units. The
+        buffer does not rebuild the full text from the splice, so the
+        next whole-text `record` restarts it. A buffer that does not hold
+        the previous version is dropped; clients then get a snapshot.
+        """
+        with self._lock:
+            log = self._sessions.get(session_id)
+            if log is None or log.version >= version:
+                return
+            if log.version != version - 1:
+                del self._sessions[session_id]
+                return
+            log.append(
+                {"version": version, "userId": user_id, "language": language, "timestamp": timestamp, "edit": edit}
+            )
+            log.version, log.text, log.language = version, None, language
+            self._sessions.move_to_end(session_id)
+
+    def seed(self, session_id: str, version: int, code: str, language: str) -> None:
+        """Start a buffer from a snapshot, unless one is already further along."""
+        with self._lock:
+            log = self._sessions.get(session_id)
+            if log is None or log.version < version:
+                self._store(session_id, _SessionLog(version, code, language))
+
+    def changes_since(self, session_id: str, last_version: int) -> Optional[tuple]:
+        """(current version, changes after `last_version`), or None if a snapshot is needed."""
+        with self._lock:
+            log = self._sessions.get(session_id)
+            if log is None or not log.base_version <= last_version <= log.version:
+                return None
+            skip = len(log.changes) - (log.version - last_version)
+            changes: List[dict] = list(log.changes)[skip:] if last_version < log.version else []
+            return log.version, changes
+
+    def evict(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _store(self, session_id: str, log: _SessionLog) -> None:
+        self._sessions[session_id] = log
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > CHANGE_BUFFER_MAX_SESSIONS:
+            self._sessions.popitem(last=False)
+
+
+changelog = ChangeLog()
+
+
+@register_eviction_hook
+def _evict_session(session_id: str) -> None:
+    changelog.evict(session_id)
@@ -0,0 +1,90 @@
+"""Custom SQLAlchemy column types."""
+
+import base64
+import logging
+import os
+import zlib
+
+from sqlalchemy.types import Text, TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Codec used for new writes: "off", "zlib" or "zstd". Reads handle every codec.
+COMPRESSION_CODEC = os.environ.get("CODE_COMPRESSION", "off")
+# Values shorter than this (in UTF-8 bytes) are stored as plain text
+COMPRESSION_MIN_BYTES = int(os.environ.get("CODE_COMPRESSION_MIN_BYTES", "1024"))
+
+if COMPRESSION_CODEC == "zstd" and zstandard is None:
+    logger.warning("CODE_COMPRESSION=zstd but zstandard is not installed; using zlib")
+    COMPRESSION_CODEC = "zlib"
+
+# Encoded values start with this control character followed by a codec tag
+# and ":". Plain text that happens to start with it is escaped with tag "r".
+_MARKER = "\x1e"
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(tag: str, data: bytes) -> bytes:
+    if tag == "s":
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed value found but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def encode_text(value: str, codec: str, min_bytes: int) -> str:
+    """Encode text for storage, compressing it if it is large enough."""
+    if codec != "off":
+        raw = value.encode("utf-8")
+        if len(raw) >= min_bytes:
+            compressed = _compress(codec, raw)
+            # base64 keeps the column a plain TEXT; only keep it if it still wins
+            encoded = base64.b64encode(compressed).decode("ascii")
+            if len(encoded) + 3 < len(raw):
+                tag = "s" if codec == "zstd" else "z"
+                return f"{_MARKER}{tag}:{encoded}"
+    if value.startswith(_MARKER):
+        return f"{_MARKER}r:{value}"
+    return value
+
+
+def decode_text(value: str) -> str:
+    """Reverse `encode_text`; plain values pass through untouched."""
+    if not value.startswith(_MARKER):
+        return value
+    tag, payload = value[1], value[3:]
+    if tag == "r":
+        return payload
+    return _decompress(tag, base64.b64decode(payload)).decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """TEXT column that transparently compresses large values.
+
+    Compression is opt-in through CODE_COMPRESSION, and rows written before
+    it was enabled remain readable. The column stays TEXT in the schema, so
+    switching it on needs no migration.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_text(value, COMPRESSION_CODEC, COMPRESSION_MIN_BYTES)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decode_text(value)
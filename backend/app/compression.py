@@ -0,0 +1,144 @@
+"""Negotiated compression of API responses.
+
+Session payloads carry the whole editor buffer, so the polling path can
+send tens of KB per request. Complete (non-streaming) responses above a
+size threshold are compressed with zstd when the client accepts it and
+zstandard is installed, otherwise gzip. Tiny, bodiless, already-encoded
+and streaming responses pass through untouched.
+"""
+
+import gzip
+import os
+from typing import Optional, Set
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .metrics import record_compression, record_compression_skip
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+RESPONSE_COMPRESSION = os.environ.get("RESPONSE_COMPRESSION", "1") == "1"
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+MIN_SIZE = int(os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("RESPONSE_COMPRESSION_GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.environ.get("RESPONSE_COMPRESSION_ZSTD_LEVEL", "3"))
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/msgpack",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def accepted_encodings(accept_encoding: str) -> Set[str]:
+    """Content codings listed in an Accept-Encoding header, minus those with q=0."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and float(params[2:] or 0) == 0:
+            continue
+        if name.strip():
+            accepted.add(name.strip())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best coding this server can produce for a request."""
+    if not accept_encoding:
+        return None
+    try:
+        accepted = accepted_encodings(accept_encoding)
+    except ValueError:
+        return None
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(encoding: str, body: bytes) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete responses the client can decode."""
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RESPONSE_COMPRESSION:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        def route() -> str:
+            return getattr(scope.get("route"), "path", "<unmatched>")
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                status = message["status"]
+                reason = None
+                if status < 200 or status in (204, 304):
+                    reason = "no_body"
+                elif "content-encoding" in headers:
+                    reason = "encoded"
+                elif not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                    reason = "content_type"
+                if reason is not None:
+                    record_compression_skip(route(), reason)
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows whether to compress
+                    start_message = message
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                record_compression_skip(route(), "streaming")
+            elif len(body) < self.minimum_size:
+                record_compression_skip(route(), "small")
+            else:
+                compressed = compress(encoding, body)
+                if len(compressed) < len(body):
+                    headers = MutableHeaders(scope=start_message)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(compressed))
+                    headers.add_vary_header("Accept-Encoding")
+                    record_compression(route(), encoding, len(body), len(compressed))
+                    message = {**message, "body": compressed}
+                else:
+                    record_compression_skip(route(), "incompressible")
+
+            passthrough = True
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,13 +1,38 @@
 """SQL-backed repository using SQLAlchemy."""
 
-from datetime import datetime
-from typing import Optional, Tuple
-from sqlalchemy.orm import Session
-from .orm_models import Session as ORMSession, SessionUser, CodeChange
+from datetime import datetime, timedelta
+from typing import Collection, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, case, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from .orm_models import Session as ORMSession, SessionUser, CodeChange, CodeBlob, SessionActivity, SessionStats
+from .history import diff_bounds
+from .search import index_queue
 from .models import SupportedLanguage
+import hashlib
 import uuid
 
 
+# Fields of a session payload, in response order
+SESSION_FIELDS = ("id", "code", "language", "participants", "createdAt", "isActive")
+# Fields read straight from the sessions row
+_SESSION_COLUMNS = ("language", "createdAt", "isActive")
+
+# Counters kept per session and per minute of activity
+ACTIVITY_COUNTERS = ("codeUpdates", "charsInserted", "charsDeleted", "runs", "failedRuns")
+
+# Reused blobs get their lastUsedAt refreshed at most this often
+BLOB_TOUCH_INTERVAL = timedelta(minutes=10)
+
+# Attempts at a batch insert when a concurrent request takes one of its ids
+CREATE_SESSIONS_ATTEMPTS = 3
+
+
+def hash_code(content: str) -> str:
+    """Content address of a code blob."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
 # Default code templates with syntax highlighting examples
 DEFAULT_CODE = {
     "javascript": """// Welcome to the coding interview!
@@ -94,17 +119,65 @@ print(f"Sum of 'Hello, World!': {result3}")  # Output: 0
 }
 
 
+def _per_minute(count: int, minutes: int) -> Optional[float]:
+    return count / minutes if minutes else None
+
+
+def _stats_dict(created_at: datetime, stats: Optional[SessionStats]) -> dict:
+    """Response fields of a session's stats row; zeros if it has no activity yet."""
+    names = (*ACTIVITY_COUNTERS, "activeMinutes", "firstEditAt", "lastEditAt", "firstRunAt", "lastRunAt")
+    values = {name: getattr(stats, name) if stats is not None else None for name in names}
+    for name in (*ACTIVITY_COUNTERS, "activeMinutes"):
+        values[name] = values[name] or 0
+    first_run = values["firstRunAt"]
+    values["timeToFirstRunSeconds"] = (first_run - created_at).total_seconds() if first_run else None
+    values["charsPerActiveMinute"] = _per_minute(values["charsInserted"], values["activeMinutes"])
+    return values
+
+
+class HistoryUnavailable(Exception):
+    """The history needed to answer a query has been purged."""
+
+
 class DatabaseService:
     """Repository backed by SQLAlchemy."""
 
     def __init__(self, db: Session):
         self.db = db
 
+    def store_code(self, content: str) -> str:
+        """Store code text once and return its content hash.
+
+        Identical text (e.g. the default templates shared by every new
+        session) maps to a single code_blobs row.
+        """
+        digest = hash_code(content)
+        now = datetime.utcnow()
+        last_used = self.db.scalar(select(CodeBlob.lastUsedAt).where(CodeBlob.hash == digest))
+        if last_used is None:
+            try:
+                with self.db.begin_nested():
+                    self.db.add(
+                        CodeBlob(
+                            hash=digest,
+                            content=content,
+                            size=len(content.encode("utf-8")),
+                            lastUsedAt=now,
+                        )
+                    )
+            except IntegrityError:
+                # Another request stored the same content first
+                pass
+        elif last_used < now - BLOB_TOUCH_INTERVAL:
+            self.db.execute(update(CodeBlob).where(CodeBlob.hash == digest).values(lastUsedAt=now))
+        return digest
+
     def create_session(self, host_name: str, base_url: str) -> Tuple[str, str]:
         """Create a new session."""
         session_id = str(uuid.uuid4())[:8]
         
-        orm_session = ORMSession(id=session_id, code=DEFAULT_CODE["javascript"], language="javascript")
+        code_hash = self.store_code(DEFAULT_CODE["javascript"])
+        orm_session = ORMSession(id=session_id, code_hash=code_hash, language="javascript")
         self.db.add(orm_session)
         self.db.flush()
 
@@ -121,28 +194,130 @@ class DatabaseService:
         share_link = f"{base_url}/interview/{orm_session.id}"
         return orm_session.id, share_link
 
-    def get_session(self, session_id: str) -> Optional[dict]:
-        """Get session by ID."""
-        orm = self.db.query(ORMSession).filter(ORMSession.id == session_id).first()
-        if not orm:
+    def create_sessions(self, host_names: Sequence[str], base_url: str) -> List[Tuple[str, str]]:
+        """Create one session per host name in a single transaction.
+
+        Rows are written with two bulk INSERTs, so the cost is a handful of
+        statements regardless of how many sessions are created. Session ids
+        are short, so generated ids are checked against existing sessions;
+        if another request takes one between the check and the insert, the
+        batch is retried with fresh ids.
+        """
+        code_hash = self.store_code(DEFAULT_CODE["javascript"])
+        for attempt in range(CREATE_SESSIONS_ATTEMPTS):
+            session_ids = self._new_session_ids(len(host_names))
+            now = datetime.utcnow()
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(
+                        insert(ORMSession),
+                        [
+                            {
+                                "id": session_id,
+                                "code_hash": code_hash,
+                                "language": "javascript",
+                                "createdAt": now,
+                                "isActive": True,
+                                "lastActivityAt": now,
+                                "version": 0,
+                            }
+                            for session_id in session_ids
+                        ],
+                    )
+            except IntegrityError:
+                if attempt == CREATE_SESSIONS_ATTEMPTS - 1:
+                    raise
+                continue
+            break
+
+        self.db.execute(
+            insert(SessionUser),
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "name": host_name,
+                    "isHost": True,
+                    "joinedAt": now,
+                    "session_id": session_id,
+                }
+                for session_id, host_name in zip(session_ids, host_names)
+            ],
+        )
+        self.db.commit()
+        return [(session_id, f"{base_url}/interview/{session_id}") for session_id in session_ids]
+
+    def _new_session_ids(self, count: int) -> List[str]:
+        """`count` distinct session ids not used by any existing session."""
+        session_ids: List[str] = []
+        while len(session_ids) < count:
+            candidates = set()
+            while len(candidates) < count - len(session_ids):
+                session_id = str(uuid.uuid4())[:8]
+                if session_id not in session_ids:
+                    candidates.add(session_id)
+            taken = set(self.db.scalars(select(ORMSession.id).where(ORMSession.id.in_(candidates))))
+            session_ids.extend(candidates - taken)
+        return session_ids
+
+    def lookup_sessions(self, session_ids: Sequence[str]) -> List[dict]:
+        """Summaries of the given sessions, fetched with one query.
+
+        Sessions that do not exist are left out; results follow the order
+        of `session_ids`.
+        """
+        host_name = func.max(case((SessionUser.isHost == True, SessionUser.name)))
+        stmt = (
+            select(
+                ORMSession.id,
+                ORMSession.language,
+                ORMSession.isActive,
+                ORMSession.createdAt,
+                ORMSession.lastActivityAt,
+                host_name.label("hostName"),
+                func.count(SessionUser.id).label("participantCount"),
+            )
+            .outerjoin(SessionUser, SessionUser.session_id == ORMSession.id)
+            .where(ORMSession.id.in_(set(session_ids)))
+            .group_by(ORMSession.id)
+        )
+        found = {row.id: row._asdict() for row in self.db.execute(stmt)}
+        return [found[session_id] for session_id in dict.fromkeys(session_ids) if session_id in found]
+
+    def get_session(self, session_id: str, fields: Optional[Collection[str]] = None) -> Optional[dict]:
+        """Get session by ID.
+
+        `fields` limits the result to a subset of SESSION_FIELDS; columns and
+        relationships that were not asked for are not queried at all.
+        """
+        fields = SESSION_FIELDS if fields is None else fields
+        columns = [ORMSession.id]
+        columns.extend(getattr(ORMSession, name) for name in _SESSION_COLUMNS if name in fields)
+        stmt = select(*columns).where(ORMSession.id == session_id)
+        if "code" in fields:
+            stmt = stmt.add_columns(CodeBlob.content.label("code")).join(
+                CodeBlob, CodeBlob.hash == ORMSession.code_hash
+            )
+        row = self.db.execute(stmt).first()
+        if row is None:
             return None
 
-        return {
-            "id": orm.id,
-            "code": orm.code,
-            "language": orm.language,
-            "participants": [
-                {"id": p.id, "name": p.name, "isHost": p.isHost, "joinedAt": p.joinedAt}
-                for p in orm.participants
-            ],
-            "createdAt": orm.createdAt,
-            "isActive": orm.isActive,
-        }
+        values = row._asdict()
+        if "participants" in fields:
+            values["participants"] = [
+                participant._asdict()
+                for participant in self.db.execute(
+                    select(SessionUser.id, SessionUser.name, SessionUser.isHost, SessionUser.joinedAt).where(
+                        SessionUser.session_id == session_id
+                    )
+                )
+            ]
+        return {name: values[name] for name in SESSION_FIELDS if name in values}
 
     def join_session(self, session_id: str, user_name: str) -> Optional[Tuple[dict, str]]:
         """Join a session."""
         orm = (
             self.db.query(ORMSession)
+            .options(joinedload(ORMSession.code_blob))
             .filter(ORMSession.id == session_id, ORMSession.isActive == True)
             .first()
         )
@@ -157,6 +332,7 @@ class DatabaseService:
             session_id=orm.id,
         )
         self.db.add(new_user)
+        orm.lastActivityAt = new_user.joinedAt
         self.db.commit()
         self.db.refresh(orm)
 
@@ -173,28 +349,221 @@ class DatabaseService:
         }
         return session_dict, new_user.id
 
-    def update_code(self, session_id: str, code: str, language: SupportedLanguage) -> bool:
-        """Update code in a session."""
-        orm = self.db.query(ORMSession).filter(ORMSession.id == session_id).first()
-        if not orm:
-            return False
+    def update_code(
+        self, session_id: str, code: str, language: SupportedLanguage, user_id: str = "system"
+    ) -> Optional[int]:
+        """Update code in a session and return the session version.
+
+        Every effective change bumps the version by one. Updates that leave
+        both code and language unchanged (editor blur, re-sent state) are
+        detected by hash and skipped without any write; they return the
+        current version. Returns None if the session does not exist.
+        """
+        current = self.db.execute(
+            select(ORMSession.code_hash, ORMSession.language, ORMSession.version).where(ORMSession.id == session_id)
+        ).first()
+        if current is None:
+            return None
 
-        orm.code = code
-        orm.language = language
-        self.db.commit()
+        code_hash = hash_code(code)
+        if current.code_hash == code_hash and current.language == language:
+            return current.version
+
+        now = datetime.utcnow()
+        previous = self.db.scalar(select(CodeBlob.content).where(CodeBlob.hash == current.code_hash))
+        start, end_old, end_new = diff_bounds(previous or "", code)
+        self.store_code(code)
+        version = self.db.execute(
+            update(ORMSession)
+            .where(ORMSession.id == session_id)
+            .values(code_hash=code_hash, language=language, lastActivityAt=now, version=ORMSession.version + 1)
+            .returning(ORMSession.version)
+        ).scalar_one()
 
         # Log change for audit trail
         change = CodeChange(
             session_id=session_id,
-            userId="system",
-            content=code,
+            userId=user_id,
+            content_hash=code_hash,
             language=language,
-            timestamp=datetime.utcnow(),
+            timestamp=now,
         )
         self.db.add(change)
+        self.record_activity(
+            session_id, now, codeUpdates=1, charsInserted=end_new - start, charsDeleted=end_old - start
+        )
+        self.db.commit()
+        index_queue.mark(session_id, now)
+        return version
+
+    def get_versioned_code(self, session_id: str) -> Optional[dict]:
+        """Current code, language and version of a session."""
+        row = self.db.execute(
+            select(CodeBlob.content.label("code"), ORMSession.language, ORMSession.version)
+            .join(CodeBlob, CodeBlob.hash == ORMSession.code_hash)
+            .where(ORMSession.id == session_id)
+        ).first()
+        return row._asdict() if row is not None else None
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        """Current version of a session, without loading its code."""
+        return self.db.scalar(select(ORMSession.version).where(ORMSession.id == session_id))
+
+    def save_document(
+        self,
+        session_id: str,
+        code: str,
+        language: SupportedLanguage,
+        version: int,
+        user_id: str = "system",
+        activity: Sequence[tuple] = (),
+    ) -> bool:
+        """Write the text of a live document as the session code at `version`.
+
+        Unlike update_code the version is given, not bumped: the document
+        already numbered its edits. The write is skipped (returning False)
+        if the stored version is not older, so a late flush never rolls a
+        session back. `activity` holds the counters of the edits being
+        saved, as (first edit, last edit, counts) per minute of editing.
+        """
+        now = datetime.utcnow()
+        code_hash = self.store_code(code)
+        saved = self.db.execute(
+            update(ORMSession)
+            .where(ORMSession.id == session_id, ORMSession.version < version)
+            .values(code_hash=code_hash, language=language, lastActivityAt=now, version=version)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not saved:
+            self.db.rollback()
+            return False
+        self.db.add(
+            CodeChange(
+                session_id=session_id,
+                userId=user_id,
+                content_hash=code_hash,
+                language=language,
+                timestamp=now,
+            )
+        )
+        for first_at, last_at, counts in activity:
+            self.record_activity(session_id, last_at, first_at, **counts)
         self.db.commit()
+        index_queue.mark(session_id, now)
         return True
 
+    def record_run(self, session_id: str, success: bool) -> None:
+        """Count a code execution in the session's activity stats."""
+        self.record_activity(session_id, datetime.utcnow(), runs=1, failedRuns=0 if success else 1)
+        self.db.commit()
+
+    def record_activity(
+        self, session_id: str, at: datetime, first_at: Optional[datetime] = None, **counts: int
+    ) -> None:
+        """Add to a session's counters and to its bucket for the minute of `at`.
+
+        `counts` are increments of ACTIVITY_COUNTERS. When they sum up
+        several events of one minute, `at` is the last of them and
+        `first_at` the first. Each call is two or three single-row writes,
+        so stats never need a history scan. The caller commits.
+        """
+        counts = {name: value for name, value in counts.items() if value}
+        first_at = first_at or at
+        minute = at.replace(second=0, microsecond=0)
+        new_minute = self._increment(SessionActivity, {"session_id": session_id, "minute": minute}, counts)
+
+        totals = dict(counts, activeMinutes=1) if new_minute else counts
+        updates, inserts = {}, {}
+        if counts.get("codeUpdates"):
+            updates.update(lastEditAt=at, firstEditAt=func.coalesce(SessionStats.firstEditAt, first_at))
+            inserts.update(lastEditAt=at, firstEditAt=first_at)
+        if counts.get("runs"):
+            updates.update(lastRunAt=at, firstRunAt=func.coalesce(SessionStats.firstRunAt, first_at))
+            inserts.update(lastRunAt=at, firstRunAt=first_at)
+        self._increment(SessionStats, {"session_id": session_id}, totals, updates, inserts)
+
+    def _increment(
+        self, model, keys: dict, counts: dict, updates: Optional[dict] = None, inserts: Optional[dict] = None
+    ) -> bool:
+        """Add `counts` to the row of `model` with primary key `keys`, creating it if needed.
+
+        Returns True if the row was created.
+        """
+        where = [getattr(model, name) == value for name, value in keys.items()]
+        values = {name: getattr(model, name) + delta for name, delta in counts.items()}
+        values.update(updates or {})
+        stmt = update(model).where(*where).values(**values).execution_options(synchronize_session=False)
+        if self.db.execute(stmt).rowcount:
+            return False
+        try:
+            with self.db.begin_nested():
+                self.db.execute(insert(model.__table__).values(**keys, **counts, **(inserts or {})))
+            return True
+        except IntegrityError:
+            # Another request created the row first
+            self.db.execute(stmt)
+            return False
+
+    def get_session_stats(self, session_id: str, window: timedelta = timedelta(0)) -> Optional[dict]:
+        """Activity counters of a session plus its minute buckets within `window`.
+
+        Reads the session's stats row and at most `window` bucket rows, no
+        matter how long the history is. Returns None if the session does
+        not exist.
+        """
+        row = self.db.execute(
+            select(ORMSession.createdAt, SessionStats)
+            .outerjoin(SessionStats, SessionStats.session_id == ORMSession.id)
+            .where(ORMSession.id == session_id)
+        ).first()
+        if row is None:
+            return None
+        stats = _stats_dict(row.createdAt, row.SessionStats)
+        stats["sessionId"] = session_id
+        stats["recent"] = []
+        if window > timedelta(0):
+            since = (datetime.utcnow() - window).replace(second=0, microsecond=0)
+            buckets = self.db.scalars(
+                select(SessionActivity)
+                .where(SessionActivity.session_id == session_id, SessionActivity.minute >= since)
+                .order_by(SessionActivity.minute)
+            )
+            stats["recent"] = [
+                {"minute": bucket.minute, **{name: getattr(bucket, name) for name in ACTIVITY_COUNTERS}}
+                for bucket in buckets
+            ]
+        return stats
+
+    def summarize_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> dict:
+        """Activity totals over the sessions created in [since, until)."""
+        filters = []
+        if since is not None:
+            filters.append(ORMSession.createdAt >= since)
+        if until is not None:
+            filters.append(ORMSession.createdAt < until)
+        columns = (*ACTIVITY_COUNTERS, "activeMinutes")
+        totals = self.db.execute(
+            select(
+                func.count(ORMSession.id).label("sessions"),
+                *(func.coalesce(func.sum(getattr(SessionStats, name)), 0).label(name) for name in columns),
+            )
+            .select_from(ORMSession)
+            .outerjoin(SessionStats, SessionStats.session_id == ORMSession.id)
+            .where(*filters)
+        ).one()._asdict()
+
+        first_runs = [
+            (first_run - created).total_seconds()
+            for created, first_run in self.db.execute(
+                select(ORMSession.createdAt, SessionStats.firstRunAt)
+                .join(SessionStats, SessionStats.session_id == ORMSession.id)
+                .where(SessionStats.firstRunAt.is_not(None), *filters)
+            )
+        ]
+        totals["avgTimeToFirstRunSeconds"] = sum(first_runs) / len(first_runs) if first_runs else None
+        totals["charsPerActiveMinute"] = _per_minute(totals["charsInserted"], totals["activeMinutes"])
+        return totals
+
     def leave_session(self, session_id: str, user_id: str) -> bool:
         """Remove a user from a session."""
         user = self.db.query(SessionUser).filter(
@@ -204,6 +573,9 @@ class DatabaseService:
             return False
 
         self.db.delete(user)
+        self.db.query(ORMSession).filter(ORMSession.id == session_id).update(
+            {ORMSession.lastActivityAt: datetime.utcnow()}
+        )
         self.db.commit()
         return True
 
@@ -217,6 +589,120 @@ class DatabaseService:
         self.db.commit()
         return True
 
+    def is_participant(self, session_id: str, user_id: str) -> Optional[bool]:
+        """Whether a user is in a session, or None if the session does not exist."""
+        row = self.db.execute(
+            select(SessionUser.id)
+            .select_from(ORMSession)
+            .outerjoin(SessionUser, (SessionUser.session_id == ORMSession.id) & (SessionUser.id == user_id))
+            .where(ORMSession.id == session_id)
+        ).first()
+        if row is None:
+            return None
+        return row.id is not None
+
+    def session_exists(self, session_id: str) -> bool:
+        """Check whether a session exists without loading it."""
+        return self.db.scalar(select(ORMSession.id).where(ORMSession.id == session_id)) is not None
+
+    def iter_code_changes(
+        self,
+        session_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        page_size: int = 500,
+    ) -> Iterator[dict]:
+        """Yield a session's code changes in (timestamp, id) order.
+
+        Rows are fetched in pages using keyset pagination, so memory use is
+        bounded by `page_size` regardless of how long the history is.
+        """
+        columns = (
+            CodeChange.id,
+            CodeChange.userId,
+            CodeBlob.content,
+            CodeChange.language,
+            CodeChange.timestamp,
+        )
+        base = (
+            select(*columns)
+            .join(CodeBlob, CodeBlob.hash == CodeChange.content_hash)
+            .where(CodeChange.session_id == session_id)
+        )
+        if since is not None:
+            base = base.where(CodeChange.timestamp >= since)
+        if until is not None:
+            base = base.where(CodeChange.timestamp <= until)
+
+        last: Optional[Tuple[datetime, int]] = None
+        while True:
+            query = base
+            if last is not None:
+                last_ts, last_id = last
+                query = query.where(
+                    or_(
+                        CodeChange.timestamp > last_ts,
+                        and_(CodeChange.timestamp == last_ts, CodeChange.id > last_id),
+                    )
+                )
+            rows = self.db.execute(
+                query.order_by(CodeChange.timestamp, CodeChange.id).limit(page_size)
+            ).all()
+            for row in rows:
+                yield {
+                    "id": row.id,
+                    "userId": row.userId,
+                    "content": row.content,
+                    "language": row.language,
+                    "timestamp": row.timestamp,
+                }
+            if len(rows) < page_size:
+                return
+            last = (rows[-1].timestamp, rows[-1].id)
+
+    def get_code_at(self, session_id: str, at: datetime) -> Optional[dict]:
+        """Get the session's code as it was at `at`.
+
+        Every history row stores the full text, so the newest change at or
+        before `at` is the snapshot. The (session_id, timestamp, id) index
+        turns that into a single index seek, independent of history length.
+        Returns None if the session did not exist at `at`, and raises
+        HistoryUnavailable if its history was purged (see the reaper).
+        """
+        session = self.db.execute(
+            select(ORMSession.createdAt, ORMSession.version).where(ORMSession.id == session_id)
+        ).first()
+        if session is None or at < session.createdAt:
+            return None
+
+        row = self.db.execute(
+            select(CodeChange.id, CodeBlob.content, CodeChange.language, CodeChange.timestamp)
+            .join(CodeBlob, CodeBlob.hash == CodeChange.content_hash)
+            .where(CodeChange.session_id == session_id, CodeChange.timestamp <= at)
+            .order_by(CodeChange.timestamp.desc(), CodeChange.id.desc())
+            .limit(1)
+        ).first()
+        if row is not None:
+            return {
+                "code": row.content,
+                "language": row.language,
+                "changeId": row.id,
+                "timestamp": row.timestamp,
+            }
+
+        # No change yet at `at`: the session held the template it was created
+        # with, unless it was edited and its history is gone
+        if session.version > 0 and not self.db.scalar(
+            select(CodeChange.id).where(CodeChange.session_id == session_id).limit(1)
+        ):
+            raise HistoryUnavailable(session_id)
+        return {
+            "code": DEFAULT_CODE["javascript"],
+            "language": "javascript",
+            "changeId": None,
+            "timestamp": session.createdAt,
+        }
+
     def get_default_code(self, language: SupportedLanguage) -> str:
         """Get default code template."""
         return DEFAULT_CODE.get(language, DEFAULT_CODE["javascript"])
@@ -1,7 +1,10 @@
 """SQLAlchemy database setup and session management."""
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from typing import Callable
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,6 +21,39 @@ SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
 
+# Callbacks run after every SQL statement with (statement, elapsed seconds).
+# Used by metrics and per-request SQL tracing.
+_statement_observers: list[Callable[[str, float], None]] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    for observer in _statement_observers:
+        observer(statement, elapsed)
+
+
+def add_statement_observer(observer: Callable[[str, float], None]) -> None:
+    """Call `observer` after every SQL statement.
+
+    Hooks are attached to the Engine class rather than `engine`, so engines
+    created elsewhere (tests, benchmarks) are observed too. They are only
+    installed once the first observer is added.
+    """
+    if observer in _statement_observers:
+        return
+    _statement_observers.append(observer)
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
 def get_db() -> Session:
     """Dependency for FastAPI to inject database session."""
     db = SessionLocal()
@@ -27,12 +63,14 @@ def get_db() -> Session:
         db.close()
 
 
-def init_db():
-    """Create tables."""
+def init_db() -> list:
+    """Create missing tables and upgrade older ones; returns the upgrade steps taken."""
     # Import ORM models here to avoid circular imports (models import `Base`)
     from . import orm_models  # noqa: F401
+    from .migrate import upgrade
 
     Base.metadata.create_all(bind=engine)
+    return upgrade(engine)
 
 
 def drop_db():
@@ -0,0 +1,237 @@
+"""Cheap syntax diagnostics for the code of a session.
+
+Python is parsed with `ast` (nothing is compiled or run). JavaScript and
+TypeScript get a bracket and string checker: it reports unbalanced
+`()[]{}`, unterminated strings, template literals and block comments,
+but does not parse the language, so regex literals containing brackets
+or quotes can confuse it.
+
+Lines and columns are 1-based, as editor markers expect; an end column
+points just past the last character of the range.
+
+Results are cached twice. Parses are keyed by (language, code hash), so
+identical code (templates, undo back to a known state) is parsed once
+across sessions. On top of that each session remembers the version it was
+last checked at, so a poll that finds the version unchanged reads one
+integer from the database and does no hashing or parsing at all.
+"""
+
+import ast
+import hashlib
+import os
+import threading
+import warnings
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from .reaper import register_eviction_hook
+
+# Parse results kept, keyed by (language, code hash)
+DIAGNOSTICS_CACHE_SIZE = int(os.environ.get("DIAGNOSTICS_CACHE_SIZE", "1024"))
+# Sessions whose last result is remembered by version
+DIAGNOSTICS_MAX_SESSIONS = int(os.environ.get("DIAGNOSTICS_MAX_SESSIONS", "10000"))
+# Longer code is not checked; parsing it would cost more than a poll should
+DIAGNOSTICS_MAX_CHARS = int(os.environ.get("DIAGNOSTICS_MAX_CHARS", str(200_000)))
+
+_OPENERS = {"(": ")", "[": "]", "{": "}"}
+_CLOSERS = {")": "(", "]": "[", "}": "{"}
+
+
+def _diagnostic(line: int, column: int, end_line: int, end_column: int, message: str, severity: str = "error"):
+    return {
+        "line": line,
+        "column": column,
+        "endLine": end_line,
+        "endColumn": end_column,
+        "message": message,
+        "severity": severity,
+    }
+
+
+def check_python(code: str) -> List[dict]:
+    """The syntax error of Python code, if any; Python stops at the first one."""
+    try:
+        with warnings.catch_warnings():
+            # e.g. invalid escape sequences; not what the candidate is asking about
+            warnings.simplefilter("ignore")
+            ast.parse(code)
+    except SyntaxError as exc:
+        line = exc.lineno or 1
+        column = exc.offset or 1
+        end_line = exc.end_lineno or line
+        end_column = exc.end_offset or column + 1
+        if (end_line, end_column) <= (line, column):
+            end_line, end_column = line, column + 1
+        return [_diagnostic(line, column, end_line, end_column, exc.msg)]
+    except ValueError as exc:
+        # e.g. source containing null bytes
+        return [_diagnostic(1, 1, 1, 2, str(exc))]
+    except (RecursionError, MemoryError):
+        # Deep nesting such as `-` * 3000 + `1` exhausts the parser's stack
+        # long before the length limit; the code may still be valid Python.
+        return [_diagnostic(1, 1, 1, 2, "Code is too deeply nested to check", severity="warning")]
+    return []
+
+
+def check_brackets(code: str) -> List[dict]:
+    """Unbalanced brackets and unterminated strings/comments in JS/TS code."""
+    diagnostics: List[dict] = []
+    # (bracket, line, column); "`" marks a template literal, "${" its substitution
+    stack: List[Tuple[str, int, int]] = []
+    line, column = 1, 1
+    i, length = 0, len(code)
+
+    def advance(count: int) -> None:
+        nonlocal i, line, column
+        for char in code[i : i + count]:
+            if char == "\n":
+                line, column = line + 1, 1
+            else:
+                column += 1
+        i += count
+
+    in_template = False
+    while i < length:
+        char = code[i]
+        if in_template:
+            if char == "\\":
+                advance(2)
+            elif char == "`":
+                stack.pop()
+                in_template = False
+                advance(1)
+            elif code.startswith("${", i):
+                stack.append(("${", line, column))
+                in_template = False
+                advance(2)
+            else:
+                advance(1)
+            continue
+
+        if code.startswith("//", i):
+            end = code.find("\n", i)
+            advance((end if end != -1 else length) - i)
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            if end == -1:
+                diagnostics.append(_diagnostic(line, column, line, column + 2, "Unterminated comment"))
+                break
+            advance(end + 2 - i)
+        elif char in "'\"":
+            start_line, start_column = line, column
+            advance(1)
+            while i < length and code[i] not in (char, "\n"):
+                advance(2 if code[i] == "\\" else 1)
+            if i >= length or code[i] == "\n":
+                diagnostics.append(
+                    _diagnostic(start_line, start_column, line, column, "Unterminated string literal")
+                )
+            else:
+                advance(1)
+        elif char == "`":
+            stack.append(("`", line, column))
+            in_template = True
+            advance(1)
+        elif char in _OPENERS:
+            stack.append((char, line, column))
+            advance(1)
+        elif char == "}" and stack and stack[-1][0] == "${":
+            stack.pop()
+            in_template = True
+            advance(1)
+        elif char in _CLOSERS:
+            if stack and stack[-1][0] == _CLOSERS[char]:
+                stack.pop()
+            elif stack and stack[-1][0] in _OPENERS:
+                opener, open_line, open_column = stack.pop()
+                diagnostics.append(
+                    _diagnostic(
+                        line,
+                        column,
+                        line,
+                        column + 1,
+                        f"'{char}' does not match '{opener}' opened at line {open_line}, column {open_column}",
+                    )
+                )
+            else:
+                diagnostics.append(_diagnostic(line, column, line, column + 1, f"Unexpected '{char}'"))
+            advance(1)
+        else:
+            advance(1)
+
+    for opener, open_line, open_column in reversed(stack):
+        if opener == "`":
+            message = "Unterminated template literal"
+        elif opener == "${":
+            message = "Unterminated '${' in template literal"
+        else:
+            message = f"'{opener}' is never closed"
+        diagnostics.append(_diagnostic(open_line, open_column, open_line, open_column + len(opener), message))
+    diagnostics.sort(key=lambda d: (d["line"], d["column"]))
+    return diagnostics
+
+
+_CHECKERS = {
+    "python": check_python,
+    "javascript": check_brackets,
+    "typescript": check_brackets,
+}
+
+
+def check(language: str, code: str) -> List[dict]:
+    """Diagnostics for code in a supported language."""
+    if len(code) > DIAGNOSTICS_MAX_CHARS:
+        return [_diagnostic(1, 1, 1, 2, "Code is too long to check", severity="warning")]
+    return _CHECKERS[language](code)
+
+
+class DiagnosticsCache:
+    """Parse results by content hash, and the last result of each session by version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._parses: "OrderedDict[Tuple[str, str], List[dict]]" = OrderedDict()
+        # session_id -> (version, language, diagnostics)
+        self._sessions: "OrderedDict[str, Tuple[int, str, List[dict]]]" = OrderedDict()
+
+    def for_version(self, session_id: str, version: int) -> Optional[Tuple[str, List[dict]]]:
+        """(language, diagnostics) remembered for this exact session version."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._sessions.move_to_end(session_id)
+            return entry[1], entry[2]
+
+    def check(self, session_id: str, version: int, language: str, code: str) -> List[dict]:
+        """Diagnostics of a session version, parsing only code not seen before."""
+        key = (language, hashlib.sha256(code.encode("utf-8")).hexdigest())
+        with self._lock:
+            diagnostics = self._parses.get(key)
+            if diagnostics is not None:
+                self._parses.move_to_end(key)
+        if diagnostics is None:
+            # Parse outside the lock; a concurrent parse of the same code is harmless
+            diagnostics = check(language, code)
+            with self._lock:
+                self._parses[key] = diagnostics
+                while len(self._parses) > DIAGNOSTICS_CACHE_SIZE:
+                    self._parses.popitem(last=False)
+        with self._lock:
+            self._sessions[session_id] = (version, language, diagnostics)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > DIAGNOSTICS_MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        return diagnostics
+
+    def evict(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+cache = DiagnosticsCache()
+
+
+@register_eviction_hook
+def _evict_session(session_id: str) -> None:
+    cache.evict(session_id)
@@ -0,0 +1,291 @@
+"""Live in-memory documents for sessions edited through ranged ops.
+
+A session that receives edit ops is loaded once into a `Rope`, and every
+op is applied to it in O(log n) instead of rewriting the whole code text.
+The text is only materialized into `sessions.code` when the document is
+flushed: periodically by a background task, before a whole-text update
+replaces it, when the session ends, and on shutdown.
+
+Each op bumps the document version by one, continuing from the version
+stored in the database, so the change log and the stored versions stay
+one sequence. Like the change log, documents are per process, which
+matches the single-worker deployment.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .database import DatabaseService
+from .db import SessionLocal
+from .history import utf16_index, utf16_length
+from .models import EditOp
+from .reaper import register_eviction_hook
+from .rope import Rope
+
+logger = logging.getLogger(__name__)
+
+# Live documents kept in memory; the least recently edited flushed one is dropped first
+MAX_DOCUMENTS = int(os.environ.get("MAX_LIVE_DOCUMENTS", "1000"))
+# How often edited documents are written back to the database; 0 disables it
+DOCUMENT_FLUSH_INTERVAL_SECONDS = float(os.environ.get("DOCUMENT_FLUSH_INTERVAL_SECONDS", "5"))
+
+
+class _Document:
+    __slots__ = (
+        "rope", "language", "version", "flushed_version", "user_id", "activity", "bmp_only", "_text", "_text_version"
+    )
+
+    def __init__(self, code: str, language: str, version: int):
+        self.rope = Rope(code)
+        self.language = language
+        self.version = version
+        self.flushed_version = version
+        self.user_id = "system"
+        # Edits not yet written to the stats: minute -> [first edit, last edit, counts]
+        self.activity: Dict[datetime, list] = {}
+        # Whether code point offsets equal UTF-16 offsets; once False it stays so
+        self.bmp_only = utf16_length(code) == len(code)
+        self._text = code
+        self._text_version = version
+
+    def count_edits(self, at: datetime, edits: int, inserted: int, deleted: int) -> None:
+        minute = at.replace(second=0, microsecond=0)
+        bucket = self.activity.get(minute)
+        if bucket is None:
+            bucket = self.activity[minute] = [at, at, {"codeUpdates": 0, "charsInserted": 0, "charsDeleted": 0}]
+        bucket[1] = at
+        counts = bucket[2]
+        counts["codeUpdates"] += edits
+        counts["charsInserted"] += inserted
+        counts["charsDeleted"] += deleted
+
+    def uncount_edits(self, saved: List[tuple]) -> None:
+        """Forget activity that has been written to the stats."""
+        for first_at, _, counts in saved:
+            minute = first_at.replace(second=0, microsecond=0)
+            bucket = self.activity.get(minute)
+            if bucket is None:
+                continue
+            for name, value in counts.items():
+                bucket[2][name] -= value
+            if not any(bucket[2].values()):
+                del self.activity[minute]
+
+    @property
+    def dirty(self) -> bool:
+        return self.version > self.flushed_version
+
+    def text(self) -> str:
+        """Full text, materialized at most once per version."""
+        if self._text_version != self.version:
+            self._text, self._text_version = str(self.rope), self.version
+        return self._text
+
+    def utf16_splice(self, start: int, end: int, removed: str, text: str) -> dict:
+        """The splice replacing `removed` at start..end, offsets in UTF-16 code units."""
+        if not self.bmp_only:
+            start16 = utf16_length(self.rope.slice(0, start))
+            start, end = start16, start16 + utf16_length(removed)
+        return {"start": start, "end": end, "text": text}
+
+    def _offset(self, units: int) -> int:
+        """Character offset of a position given in UTF-16 code units."""
+        if self.bmp_only:
+            return units
+        return self.rope.utf16_to_offset(units)
+
+    def _position(self, line: int, column: int) -> int:
+        """Character offset of (line, column), the column in UTF-16 code units."""
+        if self.bmp_only:
+            return self.rope.position_to_offset(line, column)
+        start = self.rope.position_to_offset(line, 0)
+        text = self.rope.slice(start, self.rope.position_to_offset(line, len(self.rope)))
+        return start + utf16_index(text, min(column, utf16_length(text)))
+
+    def resolve(self, op: EditOp) -> tuple:
+        """(start, end) character offsets of an op against the current text."""
+        if op.range is not None:
+            if op.start is not None or op.end is not None:
+                raise ValueError("Give either start/end or range, not both")
+            start_line, start_column, end_line, end_column = op.range
+            start = self._position(start_line, start_column)
+            end = self._position(end_line, end_column)
+        elif op.start is not None:
+            start = self._offset(op.start)
+            end = start if op.end is None else self._offset(op.end)
+        else:
+            raise ValueError("Each op needs start/end or range")
+        if not 0 <= start <= end <= len(self.rope):
+            raise IndexError(f"Range {start}..{end} outside document of length {len(self.rope)}")
+        return start, end
+
+
+class DocumentStore:
+    """Ropes of the sessions currently edited through ops."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents: "OrderedDict[str, _Document]" = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._documents)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._documents
+
+    def apply(
+        self,
+        session_id: str,
+        ops: Sequence[EditOp],
+        user_id: str,
+        base_version: Optional[int],
+        load: Callable[[], Optional[dict]],
+    ) -> Optional[dict]:
+        """Apply ops in order, each against the result of the previous one.
+
+        `load` returns the stored {code, language, version} of the session
+        and is only called when the document is not in memory yet. Returns
+        the new version, length, line count and language plus the applied
+        (version, splice) pairs, or None if the session does not exist.
+        Op offsets and columns count UTF-16 code units, as do the returned
+        splices, matching the change log and the frontend.
+        Raises 409 if `base_version` is not the current version and 400 if
+        an op is out of range; either way no op is applied.
+        """
+        with self._lock:
+            document = self._documents.get(session_id)
+            if document is None:
+                current = load()
+                if current is None:
+                    return None
+                document = _Document(current["code"], current["language"], current["version"])
+                self._store(session_id, document)
+            if base_version is not None and base_version != document.version:
+                raise HTTPException(
+                    status_code=409, detail=f"Document is at version {document.version}, not {base_version}"
+                )
+
+            edits: List[dict] = []
+            undo: List[tuple] = []
+            bmp_only = document.bmp_only
+            try:
+                for op in ops:
+                    start, end = document.resolve(op)
+                    removed = document.rope.slice(start, end)
+                    edits.append(document.utf16_splice(start, end, removed, op.text))
+                    undo.append((start, start + len(op.text), removed))
+                    document.rope.replace(start, end, op.text)
+                    document.bmp_only = document.bmp_only and utf16_length(op.text) == len(op.text)
+            except (IndexError, ValueError) as exc:
+                for start, end, text in reversed(undo):
+                    document.rope.replace(start, end, text)
+                document.bmp_only = bmp_only
+                raise HTTPException(status_code=400, detail=f"Op {len(undo)}: {exc}")
+
+            first_version = document.version + 1
+            document.version += len(edits)
+            document.count_edits(
+                datetime.utcnow(),
+                len(edits),
+                sum(inserted_end - start for start, inserted_end, _ in undo),
+                sum(len(removed) for _, _, removed in undo),
+            )
+            document.user_id = user_id
+            self._documents.move_to_end(session_id)
+            return {
+                "version": document.version,
+                "length": len(document.rope),
+                "lineCount": document.rope.line_count,
+                "edits": [(first_version + i, edit) for i, edit in enumerate(edits)],
+                "language": document.language,
+            }
+
+    def snapshot(self, session_id: str) -> Optional[dict]:
+        """{code, language, version} of a live document, or None if not in memory."""
+        with self._lock:
+            document = self._documents.get(session_id)
+            if document is None:
+                return None
+            return {"code": document.text(), "language": document.language, "version": document.version}
+
+    def flush(self, db: Session, session_ids: Optional[Sequence[str]] = None) -> int:
+        """Write edited documents to the database; returns how many were written."""
+        with self._lock:
+            ids = list(self._documents) if session_ids is None else session_ids
+            pending: Dict[str, tuple] = {}
+            for session_id in ids:
+                document = self._documents.get(session_id)
+                if document is not None and document.dirty:
+                    activity = [(first, last, dict(counts)) for first, last, counts in document.activity.values()]
+                    pending[session_id] = (
+                        document.text(),
+                        document.language,
+                        document.version,
+                        document.user_id,
+                        activity,
+                    )
+
+        service = DatabaseService(db)
+        for session_id, (code, language, version, user_id, activity) in pending.items():
+            # Activity is only forgotten once it is saved; edits made while
+            # saving stay counted for the next flush
+            saved = service.save_document(session_id, code, language, version, user_id, activity)
+            with self._lock:
+                document = self._documents.get(session_id)
+                if document is not None:
+                    document.flushed_version = max(document.flushed_version, version)
+                    if saved:
+                        document.uncount_edits(activity)
+        return len(pending)
+
+    def discard(self, session_id: str) -> None:
+        """Drop a document, flushed or not."""
+        with self._lock:
+            self._documents.pop(session_id, None)
+
+    def _store(self, session_id: str, document: _Document) -> None:
+        self._documents[session_id] = document
+        if len(self._documents) <= MAX_DOCUMENTS:
+            return
+        # Unflushed edits must not be lost; over the limit until the next flush
+        for other_id, other in list(self._documents.items()):
+            if len(self._documents) <= MAX_DOCUMENTS:
+                break
+            if other_id != session_id and not other.dirty:
+                del self._documents[other_id]
+
+
+documents = DocumentStore()
+
+
+@register_eviction_hook
+def _evict_session(session_id: str) -> None:
+    documents.discard(session_id)
+
+
+def _flush_once() -> int:
+    db = SessionLocal()
+    try:
+        return documents.flush(db)
+    finally:
+        db.close()
+
+
+async def run_document_flusher(interval: float = DOCUMENT_FLUSH_INTERVAL_SECONDS) -> None:
+    """Periodically write edited documents back until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_flush_once)
+        except Exception:
+            logger.exception("Document flush failed")
@@ -2,10 +2,19 @@
 
 import asyncio
 import time
+from .metrics import record_execution
 from .models import ExecutionResult, SupportedLanguage
 
 
 async def execute_code(code: str, language: SupportedLanguage) -> ExecutionResult:
+    """Execute code safely and record its timing."""
+    start_time = time.perf_counter()
+    result = await _execute_code(code, language)
+    record_execution(language, result.success, time.perf_counter() - start_time)
+    return result
+
+
+async def _execute_code(code: str, language: SupportedLanguage) -> ExecutionResult:
     """Execute code safely.
 
     For now, this is a mock implementation that simulates execution.
@@ -0,0 +1,109 @@
+"""Session history replay helpers."""
+
+import json
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize a client-supplied timestamp to the naive UTC the DB stores."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def utf16_length(text: str) -> int:
+    """Length of `text` in UTF-16 code units."""
+    return len(text) if text.isascii() else len(text.encode("utf-16-le")) // 2
+
+
+def utf16_index(text: str, units: int) -> int:
+    """Index into `text` of the position `units` UTF-16 code units in.
+
+    Raises IndexError past the end and ValueError inside a surrogate pair.
+    """
+    if text.isascii():
+        if not 0 <= units <= len(text):
+            raise IndexError(f"Offset {units} outside text of length {len(text)}")
+        return units
+    encoded = text.encode("utf-16-le")
+    if not 0 <= units <= len(encoded) // 2:
+        raise IndexError(f"Offset {units} outside text of length {len(encoded) // 2}")
+    prefix = encoded[: units * 2]
+    if prefix and 0xD800 <= int.from_bytes(prefix[-2:], "little") <= 0xDBFF:
+        raise ValueError(f"Offset {units} splits a surrogate pair")
+    return len(prefix.decode("utf-16-le"))
+
+
+def diff_bounds(old: str, new: str) -> tuple:
+    """(start, old end, new end) of the single splice turning `old` into `new`, in code points.
+
+    Editor changes are usually local, so trimming the common prefix and
+    suffix keeps the splice close to what was actually typed.
+    """
+    limit = min(len(old), len(new))
+    # Binary search on slice equality: the comparisons run in C, so long
+    # unchanged stretches cost far less than a character-by-character walk
+    start, high = 0, limit
+    while start < high:
+        mid = (start + high + 1) // 2
+        if old[start:mid] == new[start:mid]:
+            start = mid
+        else:
+            high = mid - 1
+
+    suffix, high = 0, limit - start
+    while suffix < high:
+        mid = (suffix + high + 1) // 2
+        if old[len(old) - mid : len(old) - suffix] == new[len(new) - mid : len(new) - suffix]:
+            suffix = mid
+        else:
+            high = mid - 1
+    return start, len(old) - suffix, len(new) - suffix
+
+
+def compute_diff(old: str, new: str) -> dict:
+    """Describe `new` as a single splice of `old`.
+
+    Returns `{"start", "end", "text"}` meaning the text between `start` and
+    `end` of `old` is replaced by `text`. Offsets count UTF-16 code units,
+    like every splice the API sends, so JavaScript clients can apply them
+    with `slice`.
+    """
+    start, end_old, end_new = diff_bounds(old, new)
+    text = new[start:end_new]
+    if not old.isascii():
+        removed = old[start:end_old]
+        start = utf16_length(old[:start])
+        end_old = start + utf16_length(removed)
+    return {"start": start, "end": end_old, "text": text}
+
+
+def apply_diff(old: str, diff: dict) -> str:
+    """Apply a splice produced by `compute_diff`."""
+    start, end = utf16_index(old, diff["start"]), utf16_index(old, diff["end"])
+    return old[:start] + diff["text"] + old[end:]
+
+
+def iter_history_ndjson(changes: Iterable[dict], diffs: bool = False) -> Iterator[bytes]:
+    """Encode code changes as newline-delimited JSON.
+
+    With `diffs` enabled the first change carries its full content and every
+    following one only a splice against its predecessor. Only the previous
+    content is kept around, so memory stays constant.
+    """
+    previous: Optional[str] = None
+    for change in changes:
+        record = {
+            "id": change["id"],
+            "userId": change["userId"],
+            "language": change["language"],
+            "timestamp": change["timestamp"].isoformat(),
+        }
+        content = change["content"]
+        if diffs and previous is not None:
+            record["diff"] = compute_diff(previous, content)
+        else:
+            record["content"] = content
+        previous = content
+        yield (json.dumps(record) + "\n").encode()
@@ -0,0 +1,249 @@
+"""Idempotency-Key support for POST endpoints.
+
+A POST carrying an `Idempotency-Key` header runs once per (path, query
+string, key). The first successful response is kept in a bounded LRU
+cache with a TTL and replayed verbatim to retries. Duplicates arriving
+while the first request is still running wait for it instead of running
+the endpoint again. Reusing a key with a different body is rejected with
+422.
+
+Only 2xx responses are cached: after an error the next retry with the
+same key runs the endpoint again. A 2xx response larger than
+MAX_CACHED_BODY_BYTES still completes its key but its body is not kept,
+so duplicates get a 409 rather than running the endpoint twice.
+
+Request bodies over IDEMPOTENCY_MAX_REQUEST_BYTES are not deduplicated
+at all: they are passed through as they arrive, so uploads such as
+archive imports are never held in memory. The cache is per process, so
+with several workers a retry that lands on another worker is not
+deduplicated.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+IDEMPOTENCY_ENABLED = os.environ.get("IDEMPOTENCY_ENABLED", "1") == "1"
+# Completed responses kept for replay
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "3600"))
+# Larger response bodies are not kept: retries get a 409 instead of a replay
+MAX_CACHED_BODY_BYTES = 256 * 1024
+# Larger request bodies are passed through without deduplication
+IDEMPOTENCY_MAX_REQUEST_BYTES = int(os.environ.get("IDEMPOTENCY_MAX_REQUEST_BYTES", str(1024 * 1024)))
+MAX_KEY_LENGTH = 255
+
+# (path, query string, key)
+CacheKey = Tuple[str, bytes, str]
+
+
+class _CachedResponse:
+    """A completed response; `body` is None when it was too large to keep."""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: Optional[bytes]):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class _Entry:
+    """One key: the request fingerprint and, once finished, its response."""
+
+    __slots__ = ("fingerprint", "response", "done", "expires")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.response: Optional[_CachedResponse] = None
+        self.done = asyncio.Event()
+        self.expires = float("inf")
+
+
+class IdempotencyCache:
+    """LRU of in-flight and completed requests, bounded by size and age."""
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_CACHE_SIZE, ttl: float = IDEMPOTENCY_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def begin(self, key: CacheKey, fingerprint: str) -> _Entry:
+        entry = self._entries[key] = _Entry(fingerprint)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def complete(self, entry: _Entry, response: _CachedResponse) -> None:
+        entry.response = response
+        entry.expires = time.monotonic() + self.ttl
+        entry.done.set()
+
+    def discard(self, key: CacheKey, entry: _Entry) -> None:
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        entry.done.set()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+cache = IdempotencyCache()
+
+
+async def _read_body(receive, limit: int) -> Tuple[List[dict], bool]:
+    """Receive messages until the body ends or exceeds `limit` bytes.
+
+    Returns the messages read and whether they hold the whole body.
+    """
+    messages = []
+    size = 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            return messages, True
+        size += len(message.get("body", b""))
+        if not message.get("more_body", False):
+            return messages, size <= limit
+        if size > limit:
+            return messages, False
+
+
+def _replaying(messages: List[dict], receive):
+    """A receive callable returning `messages` first, then reading on."""
+    pending = list(messages)
+
+    async def replay_receive():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay_receive
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware deduplicating POST requests by Idempotency-Key."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not IDEMPOTENCY_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        key = request_headers.get("idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            response = JSONResponse({"detail": "Invalid Idempotency-Key"}, status_code=400)
+            await response(scope, receive, send)
+            return
+
+        length = request_headers.get("content-length")
+        if length is not None and length.isdigit() and int(length) > IDEMPOTENCY_MAX_REQUEST_BYTES:
+            await self.app(scope, receive, send)
+            return
+        messages, complete = await _read_body(receive, IDEMPOTENCY_MAX_REQUEST_BYTES)
+        if not complete:
+            await self.app(scope, _replaying(messages, receive), send)
+            return
+        body = b"".join(message.get("body", b"") for message in messages if message["type"] == "http.request")
+        fingerprint = hashlib.sha256(body).hexdigest()
+        cache_key = (scope["path"], scope.get("query_string", b""), key)
+
+        while True:
+            entry = cache.get(cache_key)
+            if entry is None:
+                break
+            if entry.fingerprint != fingerprint:
+                response = JSONResponse(
+                    {"detail": "Idempotency-Key was already used with a different request body"},
+                    status_code=422,
+                )
+                await response(scope, receive, send)
+                return
+            if entry.response is None:
+                await entry.done.wait()
+                if entry.response is None:
+                    # The original request failed; this one takes over
+                    continue
+            await self._replay(entry.response, send)
+            return
+
+        entry = cache.begin(cache_key, fingerprint)
+        replay_receive = _replaying([{"type": "http.request", "body": body, "more_body": False}], receive)
+
+        status = 500
+        headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, headers, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size <= MAX_CACHED_BODY_BYTES:
+                    chunks.append(chunk)
+                else:
+                    chunks.clear()
+            await send(message)
+
+        completed = False
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+            completed = True
+        finally:
+            if completed and 200 <= status < 300:
+                # An oversized response still completes the key, so it is never run again
+                body = b"".join(chunks) if size <= MAX_CACHED_BODY_BYTES else None
+                cache.complete(entry, _CachedResponse(status, headers, body))
+            else:
+                cache.discard(cache_key, entry)
+
+    @staticmethod
+    async def _replay(response: _CachedResponse, send) -> None:
+        if response.body is None:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 409,
+                    "headers": [(b"content-type", b"application/json"), (b"idempotent-replayed", b"true")],
+                }
+            )
+            detail = b'{"detail":"Request already completed; its response is too large to replay"}'
+            await send({"type": "http.response.body", "body": detail})
+            return
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status,
+                "headers": response.headers + [(b"idempotent-replayed", b"true")],
+            }
+        )
+        await send({"type": "http.response.body", "body": response.body})
@@ -0,0 +1,272 @@
+"""In-process metrics exposed in the Prometheus text format.
+
+Each thread records into its own shard, so the hot path is a few list
+increments with no lock. Shards are only summed when /metrics is scraped.
+With several uvicorn workers every process reports its own series; scrape
+each worker (or aggregate in Prometheus) as usual.
+"""
+
+import bisect
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from .db import add_statement_observer
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Labels = Tuple[str, ...]
+
+
+class _Metric(ABC):
+    """Base class holding one shard per recording thread."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._shards_lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # Taken once per thread, never on the recording path afterwards
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def _format_labels(self, labels: Labels, extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    @abstractmethod
+    def collect(self) -> Iterable[str]:
+        """Sample lines of this metric, summed over all shards."""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.collect())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def values(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for shard in list(self._shards):
+            for labels, value in list(shard.items()):
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def collect(self) -> Iterable[str]:
+        for labels, value in sorted(self.values().items()):
+            yield f"{self.name}{self._format_labels(labels)} {value}"
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight."""
+
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    """Bucketed distribution with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: Labels, value: float) -> None:
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket counts (last slot is +Inf), then sum
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def values(self) -> Dict[Labels, list]:
+        totals: Dict[Labels, list] = {}
+        for shard in list(self._shards):
+            for labels, state in list(shard.items()):
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = list(state)
+                else:
+                    for i, v in enumerate(state):
+                        total[i] += v
+        return totals
+
+    def collect(self) -> Iterable[str]:
+        for labels, state in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = self._format_labels(labels, f'le="{le}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{self._format_labels(labels)} {state[-1]}"
+            yield f"{self.name}_count{self._format_labels(labels)} {cumulative}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUESTS = Counter(
+    "codecollab_http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "codecollab_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "codecollab_http_response_size_bytes",
+    "HTTP response body size by route template.",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge("codecollab_http_requests_in_flight", "HTTP requests currently being served.")
+DB_QUERIES = Counter("codecollab_db_queries_total", "SQL statements executed by operation.", ("operation",))
+DB_LATENCY = Histogram(
+    "codecollab_db_query_duration_seconds", "SQL statement execution time by operation.", ("operation",)
+)
+EXECUTIONS = Counter(
+    "codecollab_executions_total", "Code executions by language and outcome.", ("language", "outcome")
+)
+EXECUTION_LATENCY = Histogram(
+    "codecollab_execution_duration_seconds", "Code execution time by language.", ("language",)
+)
+RATE_LIMITED = Counter("codecollab_rate_limited_total", "Requests rejected by a rate limit.", ("limit",))
+COMPRESSION_INPUT_BYTES = Counter(
+    "codecollab_http_compression_input_bytes_total",
+    "Response bytes before compression by route template and encoding.",
+    ("route", "encoding"),
+)
+COMPRESSION_SAVED_BYTES = Counter(
+    "codecollab_http_compression_saved_bytes_total",
+    "Response bytes saved by compression by route template and encoding.",
+    ("route", "encoding"),
+)
+COMPRESSION_SKIPPED = Counter(
+    "codecollab_http_compression_skipped_total",
+    "Responses sent uncompressed to clients accepting compression, by reason.",
+    ("route", "reason"),
+)
+
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and size per route template.
+
+    The route template (e.g. `/sessions/{session_id}`) is read from the scope
+    after routing, so session ids never become label values.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            method = scope["method"]
+            HTTP_REQUESTS.inc((method, route, str(status)))
+            HTTP_LATENCY.observe((method, route), time.perf_counter() - start)
+            HTTP_RESPONSE_SIZE.observe((method, route), size)
+
+
+def _statement_operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def _observe_statement(statement: str, elapsed: float) -> None:
+    operation = _statement_operation(statement)
+    DB_QUERIES.inc((operation,))
+    DB_LATENCY.observe((operation,), elapsed)
+
+
+def install_db_metrics() -> None:
+    """Time every SQL statement on every engine."""
+    if METRICS_ENABLED:
+        add_statement_observer(_observe_statement)
+
+
+def record_execution(language: str, success: bool, duration: float) -> None:
+    """Record one call of the code executor."""
+    if METRICS_ENABLED:
+        EXECUTIONS.inc((language, "success" if success else "error"))
+        EXECUTION_LATENCY.observe((language,), duration)
+
+
+def record_compression(route: str, encoding: str, size: int, compressed_size: int) -> None:
+    """Record one compressed response."""
+    if METRICS_ENABLED:
+        COMPRESSION_INPUT_BYTES.inc((route, encoding), size)
+        COMPRESSION_SAVED_BYTES.inc((route, encoding), size - compressed_size)
+
+
+def record_compression_skip(route: str, reason: str) -> None:
+    """Record a response left uncompressed although the client accepts compression."""
+    if METRICS_ENABLED:
+        COMPRESSION_SKIPPED.inc((route, reason))
+
+
+def record_rate_limited(limit: str) -> None:
+    """Record one request rejected with 429."""
+    if METRICS_ENABLED:
+        RATE_LIMITED.inc((limit,))
@@ -0,0 +1,160 @@
+"""Upgrade a database created by an older version to the current schema.
+
+`create_all` only creates missing tables; it never alters existing ones.
+Databases from before code moved into `code_blobs` keep the text in
+`sessions.code` and `code_changes.content`, and lack the columns added
+since (`lastActivityAt`, `version` and the content hashes). `upgrade`
+adds those columns, moves the text into blobs in batches, drops the old
+text columns, creates missing indexes and indexes the sessions for
+search.
+
+Every step checks the schema first, so an up-to-date database costs a
+few schema lookups and `init_db` runs the upgrade on every startup. Columns added
+to an existing table are nullable there (SQLite cannot add a NOT NULL
+column without a constant default); the application always sets them.
+
+    python -m app.migrate
+"""
+
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import DateTime, Integer, String, column, inspect, insert, select, table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import sessionmaker
+
+from .column_types import decode_text
+from .database import hash_code
+from .db import Base
+from .orm_models import CodeBlob
+from .search import reindex_missing
+
+# Rows whose text is moved into blobs per statement batch
+MIGRATE_BATCH_SIZE = 500
+
+# (table, column, type, SQL expression backfilling existing rows)
+_ADDED_COLUMNS = (
+    # Read by the reaper; a session's last change is its last activity
+    (
+        "sessions",
+        "lastActivityAt",
+        DateTime(),
+        'COALESCE((SELECT MAX(c.timestamp) FROM code_changes c WHERE c.session_id = sessions.id), '
+        '"createdAt", :now)',
+    ),
+    # Every code update logs one change and bumps the version by one
+    ("sessions", "version", Integer(), "(SELECT COUNT(*) FROM code_changes c WHERE c.session_id = sessions.id)"),
+    ("sessions", "code_hash", String(64), None),
+    ("code_changes", "content_hash", String(64), None),
+)
+
+# (table, primary key, old text column, hash column)
+_MOVED_TEXT = (
+    ("sessions", "id", "code", "code_hash"),
+    ("code_changes", "id", "content", "content_hash"),
+)
+
+
+def _columns(conn: Connection, table_name: str) -> set:
+    return {info["name"] for info in inspect(conn).get_columns(table_name)}
+
+
+def _add_column(conn: Connection, table_name: str, name: str, type_, backfill: Optional[str]) -> None:
+    quote = conn.dialect.identifier_preparer.quote
+    ddl = f"ALTER TABLE {quote(table_name)} ADD COLUMN {quote(name)} {type_.compile(dialect=conn.dialect)}"
+    if name.endswith("_hash"):
+        ddl += f" REFERENCES {quote('code_blobs')} ({quote('hash')})"
+    conn.execute(text(ddl))
+    if backfill is not None:
+        conn.execute(text(f"UPDATE {quote(table_name)} SET {quote(name)} = {backfill}"), {"now": datetime.utcnow()})
+
+
+def _move_text(conn: Connection, table_name: str, key: str, source: str, target: str) -> int:
+    """Store the text of `source` as blobs and point `target` at them; returns rows moved."""
+    rows_table = table(table_name, column(key), column(source), column(target))
+    moved = 0
+    while True:
+        rows = conn.execute(
+            select(rows_table.c[key], rows_table.c[source])
+            .where(rows_table.c[target].is_(None))
+            .order_by(rows_table.c[key])
+            .limit(MIGRATE_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return moved
+        now = datetime.utcnow()
+        blobs = {}
+        updates = []
+        for row_key, raw in rows:
+            # Values may have been compressed at rest before blobs existed
+            content = decode_text(raw or "")
+            digest = hash_code(content)
+            blobs.setdefault(
+                digest, {"hash": digest, "content": content, "size": len(content.encode("utf-8")), "lastUsedAt": now}
+            )
+            updates.append({"row_key": row_key, "digest": digest})
+        existing = set(conn.scalars(select(CodeBlob.hash).where(CodeBlob.hash.in_(list(blobs)))))
+        missing = [blob for digest, blob in blobs.items() if digest not in existing]
+        if missing:
+            conn.execute(insert(CodeBlob.__table__), missing)
+        quote = conn.dialect.identifier_preparer.quote
+        conn.execute(
+            text(f"UPDATE {quote(table_name)} SET {quote(target)} = :digest WHERE {quote(key)} = :row_key"), updates
+        )
+        moved += len(rows)
+
+
+def _create_missing_indexes(conn: Connection) -> List[str]:
+    created = []
+    for table_name in ("sessions", "code_changes"):
+        existing = {index["name"] for index in inspect(conn).get_indexes(table_name)}
+        for index in Base.metadata.tables[table_name].indexes:
+            if index.name not in existing:
+                index.create(conn)
+                created.append(index.name)
+    return created
+
+
+def upgrade(engine: Engine) -> List[str]:
+    """Bring the schema of `engine` up to date; returns the steps taken.
+
+    Expects `create_all` to have run, so the new tables exist.
+    """
+    steps: List[str] = []
+    with engine.begin() as conn:
+        tables = set(inspect(conn).get_table_names())
+        if not {"sessions", "code_changes"} <= tables:
+            return steps
+        for table_name, name, type_, backfill in _ADDED_COLUMNS:
+            if name not in _columns(conn, table_name):
+                _add_column(conn, table_name, name, type_, backfill)
+                steps.append(f"added {table_name}.{name}")
+        for table_name, key, source, target in _MOVED_TEXT:
+            if source in _columns(conn, table_name):
+                moved = _move_text(conn, table_name, key, source, target)
+                quote = conn.dialect.identifier_preparer.quote
+                conn.execute(text(f"ALTER TABLE {quote(table_name)} DROP COLUMN {quote(source)}"))
+                steps.append(f"moved {moved} {table_name}.{source} values into code_blobs")
+        steps.extend(f"created index {name}" for name in _create_missing_indexes(conn))
+
+    if steps:
+        db = sessionmaker(bind=engine)()
+        try:
+            indexed = reindex_missing(db)
+        finally:
+            db.close()
+        if indexed:
+            steps.append(f"indexed {indexed} sessions for search")
+    return steps
+
+
+def main() -> None:
+    from .db import init_db
+
+    # init_db creates missing tables and runs the upgrade
+    steps = init_db()
+    print("\n".join(steps) if steps else "Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
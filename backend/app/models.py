@@ -17,6 +17,23 @@ class User(BaseModel):
     joinedAt: datetime
 
 
+class AwarenessUpdateRequest(BaseModel):
+    """Cursor or selection of one user; never persisted."""
+
+    userId: str
+    # anchorLine, anchorColumn, headLine, headColumn; a bare cursor has anchor == head
+    selection: tuple[int, int, int, int]
+
+
+class AwarenessResponse(BaseModel):
+    """Awareness changes since a cursor, as compact arrays."""
+
+    cursor: int
+    # [userId, anchorLine, anchorColumn, headLine, headColumn]
+    states: list[tuple[str, int, int, int, int]]
+    removed: list[str]
+
+
 class CodeChange(BaseModel):
     """Code change event."""
 
@@ -26,6 +43,39 @@ class CodeChange(BaseModel):
     language: SupportedLanguage
 
 
+class TextEdit(BaseModel):
+    """Replace `text[start:end]` with `text`; offsets count UTF-16 code units."""
+
+    start: int
+    end: int
+    text: str
+
+
+class VersionedChange(BaseModel):
+    """One code change, as a splice against the previous version."""
+
+    version: int
+    userId: str
+    language: SupportedLanguage
+    timestamp: datetime
+    edit: TextEdit
+
+
+class SessionCode(BaseModel):
+    """Full code of a session, sent when changes cannot be replayed."""
+
+    code: str
+    language: SupportedLanguage
+
+
+class ChangesResponse(BaseModel):
+    """Changes after a client's last version, or a snapshot if they are gone."""
+
+    version: int
+    changes: list[VersionedChange] = []
+    snapshot: SessionCode | None = None
+
+
 class InterviewSession(BaseModel):
     """Interview session state."""
 
@@ -98,3 +148,178 @@ class DefaultCodeResponse(BaseModel):
 
     language: SupportedLanguage
     code: str
+
+
+class CodeSnapshotResponse(BaseModel):
+    """Session code as of a point in time."""
+
+    sessionId: str
+    at: datetime
+    code: str
+    language: SupportedLanguage
+    changeId: int | None = None
+    timestamp: datetime
+
+
+# Upper bound on sessions created or looked up by one batch request
+MAX_BATCH_SIZE = 1000
+
+
+class BatchCreateSessionsRequest(BaseModel):
+    """Request to create many sessions at once."""
+
+    sessions: list[CreateSessionRequest] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BatchCreateSessionsResponse(BaseModel):
+    """Created sessions, in request order."""
+
+    sessions: list[CreateSessionResponse]
+
+
+class SessionLookupRequest(BaseModel):
+    """Request for summaries of many sessions."""
+
+    sessionIds: list[str] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class SessionSummary(BaseModel):
+    """Session overview without code or participant details."""
+
+    id: str
+    language: SupportedLanguage
+    isActive: bool
+    createdAt: datetime
+    lastActivityAt: datetime
+    hostName: str | None = None
+    participantCount: int
+
+
+class SessionLookupResponse(BaseModel):
+    """Summaries of the sessions found, in request order, and the ids that were not."""
+
+    sessions: list[SessionSummary]
+    missing: list[str]
+
+
+# Upper bound on edit operations sent in one request
+MAX_EDIT_OPS = 1000
+
+
+class EditOp(BaseModel):
+    """Replace a range of the document with `text`.
+
+    The range is given either as offsets `start`/`end` or as 0-based
+    `[startLine, startColumn, endLine, endColumn]`; offsets and columns
+    count UTF-16 code units.
+    """
+
+    start: int | None = None
+    end: int | None = None
+    range: tuple[int, int, int, int] | None = None
+    text: str = ""
+
+
+class ApplyOpsRequest(BaseModel):
+    """Edits to apply in order; `baseVersion` guards against concurrent changes."""
+
+    userId: str
+    baseVersion: int | None = None
+    ops: list[EditOp] = Field(min_length=1, max_length=MAX_EDIT_OPS)
+
+
+class ApplyOpsResponse(BaseModel):
+    """Document state after the edits were applied."""
+
+    version: int
+    length: int
+    lineCount: int
+
+
+class ActivityBucket(BaseModel):
+    """Activity of a session within one minute."""
+
+    minute: datetime
+    codeUpdates: int
+    charsInserted: int
+    charsDeleted: int
+    runs: int
+    failedRuns: int
+
+
+class SessionStatsResponse(BaseModel):
+    """Activity counters of one session."""
+
+    sessionId: str
+    codeUpdates: int
+    charsInserted: int
+    charsDeleted: int
+    runs: int
+    failedRuns: int
+    activeMinutes: int
+    firstEditAt: datetime | None = None
+    lastEditAt: datetime | None = None
+    firstRunAt: datetime | None = None
+    lastRunAt: datetime | None = None
+    timeToFirstRunSeconds: float | None = None
+    # Characters typed per minute with any activity
+    charsPerActiveMinute: float | None = None
+    recent: list[ActivityBucket] = []
+
+
+class StatsSummaryResponse(BaseModel):
+    """Activity totals across sessions."""
+
+    sessions: int
+    codeUpdates: int
+    charsInserted: int
+    charsDeleted: int
+    runs: int
+    failedRuns: int
+    activeMinutes: int
+    avgTimeToFirstRunSeconds: float | None = None
+    charsPerActiveMinute: float | None = None
+
+
+# Upper bound on search results per page
+MAX_SEARCH_LIMIT = 100
+
+
+class SearchResult(BaseModel):
+    """A session whose code matches a search, with the first matching line."""
+
+    sessionId: str
+    language: SupportedLanguage
+    updatedAt: datetime
+    # Higher is a better match; only comparable within one query
+    score: float
+    line: int | None = None
+    snippet: str
+
+
+class SearchResponse(BaseModel):
+    """One page of search results, best match first."""
+
+    results: list[SearchResult]
+    limit: int
+    offset: int
+    hasMore: bool
+
+
+class Diagnostic(BaseModel):
+    """A problem in the code; lines and columns are 1-based, the end is exclusive."""
+
+    line: int
+    column: int
+    endLine: int
+    endColumn: int
+    message: str
+    severity: Literal["error", "warning"]
+
+
+class DiagnosticsResponse(BaseModel):
+    """Diagnostics of a session's code at a version."""
+
+    version: int
+    language: SupportedLanguage
+    diagnostics: list[Diagnostic]
@@ -1,10 +1,23 @@
 """ORM models for sessions and users."""
-from sqlalchemy import Column, String, Boolean, DateTime, Text, ForeignKey, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Index, Text, DDL, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 
 from .db import Base
+from .column_types import CompressedText
+
+
+class CodeBlob(Base):
+    """Code text stored once, keyed by the SHA-256 of its UTF-8 bytes."""
+
+    __tablename__ = "code_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    content = Column(CompressedText, nullable=False)
+    size = Column(Integer, nullable=False)
+    # Refreshed when an existing blob is reused; orphan collection skips recent blobs
+    lastUsedAt = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 
 class SessionUser(Base):
@@ -27,14 +40,26 @@ class SessionUser(Base):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Lets the reaper find idle sessions without scanning ended ones
+        Index("ix_sessions_active_activity", "isActive", "lastActivityAt"),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4())[:8])
-    code = Column(Text, nullable=False)
+    code_hash = Column(String(64), ForeignKey("code_blobs.hash"), nullable=False, index=True)
     language = Column(String(32), nullable=False, default="javascript")
     createdAt = Column(DateTime, default=datetime.utcnow)
     isActive = Column(Boolean, default=True)
+    lastActivityAt = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Incremented by every code/language change; clients resume from it
+    version = Column(Integer, nullable=False, default=0)
 
     participants = relationship("SessionUser", backref="session", cascade="all, delete-orphan")
+    code_blob = relationship("CodeBlob")
+
+    @property
+    def code(self):
+        return self.code_blob.content
 
     def to_dict(self):
         return {
@@ -49,10 +74,101 @@ class Session(Base):
 
 class CodeChange(Base):
     __tablename__ = "code_changes"
+    __table_args__ = (
+        # Keyset pagination over a session's history in (timestamp, id) order
+        Index("ix_code_changes_session_timestamp_id", "session_id", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(String(36), ForeignKey("sessions.id"), nullable=False, index=True)
     userId = Column(String(36), nullable=False, index=True)
-    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), ForeignKey("code_blobs.hash"), nullable=False, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     language = Column(String(32), nullable=False)
+
+    content_blob = relationship("CodeBlob")
+
+    @property
+    def content(self):
+        return self.content_blob.content
+
+
+class SessionStats(Base):
+    """Running activity counters of a session, updated with every change and run."""
+
+    __tablename__ = "session_stats"
+
+    session_id = Column(String(36), ForeignKey("sessions.id"), primary_key=True)
+    codeUpdates = Column(Integer, nullable=False, default=0)
+    charsInserted = Column(Integer, nullable=False, default=0)
+    charsDeleted = Column(Integer, nullable=False, default=0)
+    runs = Column(Integer, nullable=False, default=0)
+    failedRuns = Column(Integer, nullable=False, default=0)
+    # Minutes with any activity, i.e. the number of session_activity rows
+    activeMinutes = Column(Integer, nullable=False, default=0)
+    firstEditAt = Column(DateTime, nullable=True)
+    lastEditAt = Column(DateTime, nullable=True)
+    firstRunAt = Column(DateTime, nullable=True)
+    lastRunAt = Column(DateTime, nullable=True)
+
+
+class SessionActivity(Base):
+    """Activity of a session within one minute."""
+
+    __tablename__ = "session_activity"
+
+    session_id = Column(String(36), ForeignKey("sessions.id"), primary_key=True)
+    # Start of the minute, naive UTC
+    minute = Column(DateTime, primary_key=True)
+    codeUpdates = Column(Integer, nullable=False, default=0)
+    charsInserted = Column(Integer, nullable=False, default=0)
+    charsDeleted = Column(Integer, nullable=False, default=0)
+    runs = Column(Integer, nullable=False, default=0)
+    failedRuns = Column(Integer, nullable=False, default=0)
+
+
+class SearchDocument(Base):
+    """Current code of a session as the full-text index sees it.
+
+    The text is kept uncompressed so the database can index it: through an
+    FTS5 table kept in sync by triggers on SQLite, and through an
+    expression GIN index on PostgreSQL (both created below).
+    """
+
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String(36), ForeignKey("sessions.id"), nullable=False, unique=True)
+    language = Column(String(32), nullable=False)
+    code = Column(Text, nullable=False)
+    updatedAt = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# SQLite: external-content FTS5 table over search_documents.code. The
+# standard trigger recipe keeps it in sync with every insert/update/delete.
+_SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE search_fts USING fts5("
+    "code, content='search_documents', content_rowid='id', prefix='2 3 4')",
+    "CREATE TRIGGER search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_fts(rowid, code) VALUES (new.id, new.code); END",
+    "CREATE TRIGGER search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, code) VALUES ('delete', old.id, old.code); END",
+    "CREATE TRIGGER search_documents_au AFTER UPDATE OF code ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, code) VALUES ('delete', old.id, old.code); "
+    "INSERT INTO search_fts(rowid, code) VALUES (new.id, new.code); END",
+)
+for _statement in _SQLITE_SEARCH_DDL:
+    event.listen(SearchDocument.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    SearchDocument.__table__, "before_drop", DDL("DROP TABLE IF EXISTS search_fts").execute_if(dialect="sqlite")
+)
+
+# PostgreSQL: the 'simple' configuration keeps identifiers unstemmed
+event.listen(
+    SearchDocument.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX ix_search_documents_code_tsv ON search_documents "
+        "USING GIN (to_tsvector('simple', code))"
+    ).execute_if(dialect="postgresql"),
+)
@@ -0,0 +1,239 @@
+"""On-demand statistical profiler for a running worker.
+
+A background thread samples the Python stacks of every thread in the
+process at a fixed interval. It only exists while a profile is being
+taken; otherwise the middleware costs a single global lookup per request.
+
+Profiles can cover a fixed number of seconds, or the next N requests
+matching a route template. In the latter mode samples are only taken
+while a matching request is in flight. Concurrent requests to other
+routes are sampled too, since stacks are collected process-wide.
+"""
+
+import asyncio
+import sys
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from starlette.routing import compile_path
+
+DEFAULT_INTERVAL = 0.005
+MAX_SECONDS = 60.0
+
+# Leaf frames in these files are threads parked waiting for work, not hot spots
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+class Sampler:
+    """Background thread collecting stack samples into a counter."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._active = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self, active: bool = True) -> None:
+        if active:
+            self._active.set()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def pause(self) -> None:
+        self._active.clear()
+
+    def resume(self) -> None:
+        self._active.set()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if not self._active.is_set():
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack: List[Frame] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, frame.f_lineno))
+                    frame = frame.f_back
+                stack.append((names.get(thread_id, str(thread_id)), "<thread>", 0))
+                stack.reverse()
+                self.samples[tuple(stack)] += 1
+            self.sample_count += 1
+
+
+def to_collapsed(samples: Dict[Stack, int]) -> str:
+    """Render samples in the collapsed-stack format used by flamegraph tools."""
+    lines = []
+    for stack, count in samples.items():
+        names = [name if file == "<thread>" else f"{name} ({file}:{line})" for name, file, line in stack]
+        lines.append(f"{';'.join(names)} {count}")
+    return "\n".join(sorted(lines)) + "\n"
+
+
+def to_speedscope(samples: Dict[Stack, int], name: str, interval: float) -> dict:
+    """Render samples as a speedscope 'sampled' profile."""
+    frame_index: Dict[Frame, int] = {}
+    frames = []
+    profile_samples = []
+    weights = []
+    for stack, count in samples.items():
+        indices = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                func, file, line = frame
+                frames.append({"name": func, "file": file, "line": line} if line else {"name": func})
+            indices.append(frame_index[frame])
+        profile_samples.append(indices)
+        weights.append(count * interval)
+
+    total = sum(weights)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": profile_samples,
+                "weights": weights,
+            }
+        ],
+        "name": name,
+        "exporter": "codecollab-profiler",
+    }
+
+
+class _RequestProfile:
+    """State of a profile covering the next N requests to a route."""
+
+    def __init__(self, sampler: Sampler, route: str, method: Optional[str], count: int):
+        self.sampler = sampler
+        self.route_regex = compile_path(route)[0]
+        self.method = method.upper() if method else None
+        self.count = count
+        self.admitted = 0
+        self.completed = 0
+        self.in_flight = 0
+        self.done = asyncio.Event()
+
+    def matches(self, scope) -> bool:
+        if self.method and scope["method"] != self.method:
+            return False
+        return self.route_regex.match(scope["path"]) is not None
+
+    def try_enter(self, scope) -> bool:
+        if self.admitted >= self.count or not self.matches(scope):
+            return False
+        self.admitted += 1
+        self.in_flight += 1
+        self.sampler.resume()
+        return True
+
+    def exit(self) -> None:
+        self.in_flight -= 1
+        self.completed += 1
+        if self.in_flight <= 0:
+            self.sampler.pause()
+        if self.completed >= self.count:
+            self.done.set()
+
+
+_lock = threading.Lock()
+_running = False
+_request_profile: Optional[_RequestProfile] = None
+
+
+def _acquire() -> None:
+    global _running
+    with _lock:
+        if _running:
+            raise ProfilerBusy("A profile is already being taken")
+        _running = True
+
+
+def _release() -> None:
+    global _running
+    with _lock:
+        _running = False
+
+
+async def profile_for(seconds: float, interval: float = DEFAULT_INTERVAL) -> Sampler:
+    """Sample the whole process for `seconds`."""
+    _acquire()
+    sampler = Sampler(interval)
+    try:
+        sampler.start()
+        await asyncio.sleep(min(seconds, MAX_SECONDS))
+    finally:
+        sampler.stop()
+        _release()
+    return sampler
+
+
+async def profile_requests(
+    route: str,
+    count: int,
+    method: Optional[str] = None,
+    timeout: float = MAX_SECONDS,
+    interval: float = DEFAULT_INTERVAL,
+) -> Tuple[Sampler, int]:
+    """Sample while the next `count` requests matching `route` run.
+
+    Returns the sampler and the number of requests actually profiled,
+    which is lower than `count` if `timeout` expired first.
+    """
+    global _request_profile
+    _acquire()
+    sampler = Sampler(interval)
+    profile = _RequestProfile(sampler, route, method, count)
+    try:
+        sampler.start(active=False)
+        _request_profile = profile
+        try:
+            await asyncio.wait_for(profile.done.wait(), timeout=min(timeout, MAX_SECONDS))
+        except asyncio.TimeoutError:
+            pass
+    finally:
+        _request_profile = None
+        sampler.stop()
+        _release()
+    return sampler, profile.completed
+
+
+class ProfilerMiddleware:
+    """ASGI middleware feeding matching requests to an armed request profile."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        profile = _request_profile
+        if profile is None or scope["type"] != "http" or not profile.try_enter(scope):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.exit()
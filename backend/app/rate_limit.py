@@ -0,0 +1,185 @@
+"""Token-bucket rate limiting for code updates and executions.
+
+Buckets are keyed by (session, userId) for code updates and by session
+for executions. The check runs before the endpoint touches the database,
+so a client stuck in a retry loop costs one dict lookup per rejected
+request.
+
+Buckets live in process memory by default. Set RATE_LIMIT_REDIS_URL (and
+install `redis`) to share them between workers; any object implementing
+`RateLimitStore` can be plugged in with `limiter.store = ...`.
+"""
+
+import math
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .metrics import record_rate_limited
+from .reaper import register_eviction_hook
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", "")
+# Buckets held in memory at most; the least recently used is dropped first
+RATE_LIMIT_MAX_BUCKETS = int(os.environ.get("RATE_LIMIT_MAX_BUCKETS", "100000"))
+
+
+class Limit:
+    """Refill `rate` tokens per second, holding at most `burst`."""
+
+    __slots__ = ("name", "rate", "burst")
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+
+CODE_UPDATE_LIMIT = Limit(
+    "code_update",
+    float(os.environ.get("RATE_LIMIT_CODE_UPDATES_PER_SECOND", "10")),
+    float(os.environ.get("RATE_LIMIT_CODE_UPDATES_BURST", "30")),
+)
+EXECUTE_LIMIT = Limit(
+    "execute",
+    float(os.environ.get("RATE_LIMIT_EXECUTIONS_PER_SECOND", "0.5")),
+    float(os.environ.get("RATE_LIMIT_EXECUTIONS_BURST", "5")),
+)
+
+
+class RateLimitStore(ABC):
+    """Backend holding bucket state."""
+
+    @abstractmethod
+    def consume(self, session_id: str, key: Tuple[str, ...], limit: Limit) -> float:
+        """Take one token; return 0 if allowed, else seconds until one is available."""
+
+    def evict(self, session_id: str) -> None:
+        """Drop every bucket of a session."""
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Per-process buckets in least recently used order.
+
+    A missing bucket starts full, so a bucket is dropped as soon as it has
+    refilled completely; only buckets used within their last burst/rate
+    seconds are held. RATE_LIMIT_MAX_BUCKETS additionally bounds memory
+    against floods of made-up session or user ids; dropping a bucket early
+    only forgives what it was owed.
+    """
+
+    def __init__(self, max_buckets: int = RATE_LIMIT_MAX_BUCKETS):
+        self._lock = threading.Lock()
+        self.max_buckets = max_buckets
+        # (session id, *bucket key) -> [tokens, last refill, full again at] (monotonic)
+        self._buckets: "OrderedDict[Tuple[str, ...], List[float]]" = OrderedDict()
+
+    def consume(self, session_id: str, key: Tuple[str, ...], limit: Limit) -> float:
+        now = time.monotonic()
+        bucket_key = (session_id,) + key
+        with self._lock:
+            state = self._buckets.pop(bucket_key, None)
+            tokens = limit.burst if state is None else min(limit.burst, state[0] + (now - state[1]) * limit.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / limit.rate
+            self._buckets[bucket_key] = [tokens, now, now + (limit.burst - tokens) / limit.rate]
+            self._prune(now)
+            return wait
+
+    def _prune(self, now: float) -> None:
+        # Every bucket behind an unexpired front one was used more recently
+        # than it, i.e. within the longest refill time
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if oldest[2] > now and len(self._buckets) <= self.max_buckets:
+                return
+            self._buckets.popitem(last=False)
+
+    def evict(self, session_id: str) -> None:
+        with self._lock:
+            for bucket_key in [bucket_key for bucket_key in self._buckets if bucket_key[0] == session_id]:
+                del self._buckets[bucket_key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+# Refill and take a token atomically, using the Redis clock so all workers agree
+_REDIS_CONSUME = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """Buckets shared by every worker through Redis.
+
+    Keys expire once a bucket would be full again, so nothing needs to be
+    evicted explicitly.
+    """
+
+    def __init__(self, url: str, prefix: str = "codecollab:ratelimit"):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but redis is not installed")
+        self._client = redis.Redis.from_url(url)
+        self._consume = self._client.register_script(_REDIS_CONSUME)
+        self.prefix = prefix
+
+    def consume(self, session_id: str, key: Tuple[str, ...], limit: Limit) -> float:
+        redis_key = ":".join((self.prefix, session_id) + key)
+        return float(self._consume(keys=[redis_key], args=[limit.rate, limit.burst]))
+
+
+class RateLimiter:
+    """Checks requests against their buckets, raising 429 when one is empty."""
+
+    def __init__(self, store: Optional[RateLimitStore] = None):
+        self.store = store or MemoryRateLimitStore()
+
+    def check(self, limit: Limit, session_id: str, *key: str) -> None:
+        if not RATE_LIMIT_ENABLED:
+            return
+        wait = self.store.consume(session_id, (limit.name,) + key, limit)
+        if wait > 0:
+            record_rate_limited(limit.name)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    def evict(self, session_id: str) -> None:
+        self.store.evict(session_id)
+
+
+limiter = RateLimiter(RedisRateLimitStore(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else None)
+register_eviction_hook(limiter.evict)
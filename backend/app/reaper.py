@@ -0,0 +1,154 @@
+"""Background reaper that ends and cleans up abandoned sessions."""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .orm_models import Session as ORMSession, SessionUser, CodeChange, CodeBlob
+
+logger = logging.getLogger(__name__)
+
+# Sessions with no join/leave/code update for this long are considered abandoned
+IDLE_TIMEOUT_SECONDS = int(os.environ.get("SESSION_IDLE_TIMEOUT_SECONDS", "7200"))
+# How often the reaper wakes up; 0 disables it
+REAPER_INTERVAL_SECONDS = int(os.environ.get("SESSION_REAPER_INTERVAL_SECONDS", "300"))
+# Rows touched per transaction, keeps each lock short
+REAPER_BATCH_SIZE = int(os.environ.get("SESSION_REAPER_BATCH_SIZE", "100"))
+# Whether code_changes rows of reaped sessions are dropped along with
+# participants. Off by default: purged sessions lose history replay,
+# snapshots at a version and their history in archives.
+REAPER_PURGE_HISTORY = os.environ.get("SESSION_REAPER_PURGE_HISTORY", "0") == "1"
+# Unreferenced blobs used more recently than this are kept, so a blob that an
+# in-flight update is about to reference is never collected. Must stay well
+# above database.BLOB_TOUCH_INTERVAL.
+BLOB_GC_GRACE = timedelta(hours=1)
+
+# Callbacks invoked with a session id once it has been reaped, so in-memory
+# caches keyed by session can release their entries.
+_eviction_hooks: List[Callable[[str], None]] = []
+
+
+def register_eviction_hook(hook: Callable[[str], None]) -> Callable[[str], None]:
+    """Register a callback to run for every reaped session id."""
+    _eviction_hooks.append(hook)
+    return hook
+
+
+def _run_eviction_hooks(session_id: str) -> None:
+    for hook in _eviction_hooks:
+        try:
+            hook(session_id)
+        except Exception:
+            logger.exception("Eviction hook %r failed for session %s", hook, session_id)
+
+
+def _delete_in_batches(db: Session, model, session_id: str, batch_size: int) -> int:
+    """Delete rows of `model` belonging to a session, one short transaction per batch."""
+    total = 0
+    while True:
+        ids = db.scalars(
+            select(model.id).where(model.session_id == session_id).limit(batch_size)
+        ).all()
+        if not ids:
+            return total
+        db.execute(delete(model).where(model.id.in_(ids)))
+        db.commit()
+        total += len(ids)
+
+
+def collect_orphan_blobs(
+    db: Session, grace: timedelta = BLOB_GC_GRACE, batch_size: int = REAPER_BATCH_SIZE
+) -> int:
+    """Delete code blobs no session or history row references any more."""
+    cutoff = datetime.utcnow() - grace
+    unreferenced = (
+        CodeBlob.lastUsedAt < cutoff,
+        ~select(ORMSession.id).where(ORMSession.code_hash == CodeBlob.hash).exists(),
+        ~select(CodeChange.id).where(CodeChange.content_hash == CodeBlob.hash).exists(),
+    )
+    total = 0
+    while True:
+        hashes = db.scalars(select(CodeBlob.hash).where(*unreferenced).limit(batch_size)).all()
+        if not hashes:
+            return total
+        db.execute(delete(CodeBlob).where(CodeBlob.hash.in_(hashes), *unreferenced))
+        db.commit()
+        total += len(hashes)
+
+
+def reap_inactive_sessions(
+    db: Session,
+    idle_for: timedelta = timedelta(seconds=IDLE_TIMEOUT_SECONDS),
+    batch_size: int = REAPER_BATCH_SIZE,
+    purge_history: bool = REAPER_PURGE_HISTORY,
+) -> List[str]:
+    """End sessions idle for longer than `idle_for` and evict their data.
+
+    Sessions are processed `batch_size` at a time and every batch of deleted
+    rows is committed on its own, so no transaction holds locks for long.
+    Returns the ids of the reaped sessions.
+    """
+    cutoff = datetime.utcnow() - idle_for
+    reaped: List[str] = []
+
+    while True:
+        ids = db.scalars(
+            select(ORMSession.id)
+            .where(ORMSession.isActive == True, ORMSession.lastActivityAt < cutoff)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            break
+
+        # Re-check the idle condition so a session touched since the select survives
+        db.execute(
+            update(ORMSession)
+            .where(
+                ORMSession.id.in_(ids),
+                ORMSession.isActive == True,
+                ORMSession.lastActivityAt < cutoff,
+            )
+            .values(isActive=False)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        ended = db.scalars(
+            select(ORMSession.id).where(ORMSession.id.in_(ids), ORMSession.isActive == False)
+        ).all()
+
+        for session_id in ended:
+            _delete_in_batches(db, SessionUser, session_id, batch_size)
+            if purge_history:
+                _delete_in_batches(db, CodeChange, session_id, batch_size)
+            _run_eviction_hooks(session_id)
+        reaped.extend(ended)
+
+    if reaped:
+        if purge_history:
+            collect_orphan_blobs(db, batch_size=batch_size)
+        logger.info("Reaped %d inactive sessions", len(reaped))
+    return reaped
+
+
+def _reap_once() -> List[str]:
+    db = SessionLocal()
+    try:
+        return reap_inactive_sessions(db)
+    finally:
+        db.close()
+
+
+async def run_reaper(interval: float = REAPER_INTERVAL_SECONDS) -> None:
+    """Periodically reap inactive sessions until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_reap_once)
+        except Exception:
+            logger.exception("Session reaper run failed")
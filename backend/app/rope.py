@@ -0,0 +1,250 @@
+"""Rope of text chunks with a line index.
+
+The rope is an implicit treap: an in-order walk of the nodes yields the
+text, and every node carries the length and newline count of its
+subtree. Ranged edits split and merge the tree in O(log n) expected
+time, and offsets convert to (line, column) and back by walking down
+the same aggregates. Lines and columns are 0-based; columns count
+characters.
+"""
+
+import random
+from typing import Iterator, List, Optional, Tuple
+
+from .history import utf16_index, utf16_length
+
+# Text is stored in chunks of at most this many characters
+CHUNK_SIZE = 1024
+
+
+class _Node:
+    __slots__ = ("text", "priority", "left", "right", "length", "newlines", "count")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.priority = random.random()
+        self.left: Optional[_Node] = None
+        self.right: Optional[_Node] = None
+        self.length = len(text)
+        self.newlines = text.count("\n")
+        self.count = 1
+
+    def update(self) -> "_Node":
+        length, newlines, count = len(self.text), self.text.count("\n"), 1
+        for child in (self.left, self.right):
+            if child is not None:
+                length += child.length
+                newlines += child.newlines
+                count += child.count
+        self.length, self.newlines, self.count = length, newlines, count
+        return self
+
+
+def _length(node: Optional[_Node]) -> int:
+    return node.length if node is not None else 0
+
+
+def _newlines(node: Optional[_Node]) -> int:
+    return node.newlines if node is not None else 0
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return left.update()
+    right.left = _merge(left, right.left)
+    return right.update()
+
+
+def _split(node: Optional[_Node], offset: int) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """Split into the first `offset` characters and the rest."""
+    if node is None:
+        return None, None
+    left_length = _length(node.left)
+    if offset <= left_length:
+        left, node.left = _split(node.left, offset)
+        return left, node.update()
+    if offset >= left_length + len(node.text):
+        node.right, right = _split(node.right, offset - left_length - len(node.text))
+        return node.update(), right
+
+    # The cut falls inside this node's chunk
+    cut = offset - left_length
+    tail = _Node(node.text[cut:])
+    node.text = node.text[:cut]
+    tail.right, node.right = node.right, None
+    return node.update(), tail.update()
+
+
+def _build(text: str) -> Optional[_Node]:
+    """Balanced tree over the chunks of `text`, built in linear time."""
+    nodes = [_Node(text[i : i + CHUNK_SIZE]) for i in range(0, len(text), CHUNK_SIZE)]
+    depths = [0] * len(nodes)
+
+    def link(lo: int, hi: int, depth: int) -> Optional[_Node]:
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        node = nodes[mid]
+        depths[mid] = depth
+        node.left = link(lo, mid, depth + 1)
+        node.right = link(mid + 1, hi, depth + 1)
+        return node.update()
+
+    root = link(0, len(nodes), 0)
+    # Shallower nodes get the larger of the random priorities, so the
+    # balanced shape is also a valid treap
+    priorities = sorted((random.random() for _ in nodes), reverse=True)
+    for priority, index in zip(priorities, sorted(range(len(nodes)), key=depths.__getitem__)):
+        nodes[index].priority = priority
+    return root
+
+
+class Rope:
+    """Mutable text supporting O(log n) ranged edits and line lookups."""
+
+    def __init__(self, text: str = ""):
+        self._root = _build(text)
+
+    def __len__(self) -> int:
+        return _length(self._root)
+
+    def __str__(self) -> str:
+        return "".join(self._chunks())
+
+    def _chunks(self) -> Iterator[str]:
+        stack: List[_Node] = []
+        node = self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.text
+            node = node.right
+
+    def utf16_to_offset(self, units: int) -> int:
+        """Character offset of a position given in UTF-16 code units.
+
+        Walks the chunks from the start, so it costs O(offset); callers skip
+        it for text without characters outside the BMP.
+        """
+        if units < 0:
+            raise IndexError(f"Offset {units} outside document")
+        offset = 0
+        for chunk in self._chunks():
+            size = utf16_length(chunk)
+            if units <= size:
+                return offset + utf16_index(chunk, units)
+            units -= size
+            offset += len(chunk)
+        if units == 0:
+            return offset
+        raise IndexError("Offset past the end of the document")
+
+    @property
+    def line_count(self) -> int:
+        return _newlines(self._root) + 1
+
+    @property
+    def chunk_count(self) -> int:
+        return self._root.count if self._root is not None else 0
+
+    def replace(self, start: int, end: int, text: str) -> None:
+        """Replace characters [start, end) with `text`."""
+        if not 0 <= start <= end <= len(self):
+            raise IndexError(f"Range {start}..{end} outside document of length {len(self)}")
+        left, rest = _split(self._root, start)
+        _, right = _split(rest, end - start)
+        self._root = _merge(_merge(left, _build(text)), right)
+        # Small edits leave small chunks behind; rebuild once they dominate
+        if self.chunk_count > 64 and self.chunk_count > 4 * (len(self) // CHUNK_SIZE + 1):
+            self._root = _build(str(self))
+
+    def insert(self, offset: int, text: str) -> None:
+        self.replace(offset, offset, text)
+
+    def delete(self, start: int, end: int) -> None:
+        self.replace(start, end, "")
+
+    def slice(self, start: int, end: int) -> str:
+        """Text of characters [start, end)."""
+        parts: List[str] = []
+        self._collect(self._root, max(start, 0), min(end, len(self)), parts)
+        return "".join(parts)
+
+    def _collect(self, node: Optional[_Node], start: int, end: int, parts: List[str]) -> None:
+        while node is not None and start < end:
+            left_length = _length(node.left)
+            if start < left_length:
+                self._collect(node.left, start, min(end, left_length), parts)
+            chunk_start = left_length
+            chunk_end = left_length + len(node.text)
+            if start < chunk_end and end > chunk_start:
+                parts.append(node.text[max(start - chunk_start, 0) : min(end, chunk_end) - chunk_start])
+            if end <= chunk_end:
+                return
+            start = max(start - chunk_end, 0)
+            end -= chunk_end
+            node = node.right
+
+    def offset_to_position(self, offset: int) -> Tuple[int, int]:
+        """(line, column) of a character offset."""
+        if not 0 <= offset <= len(self):
+            raise IndexError(f"Offset {offset} outside document of length {len(self)}")
+        line = self._newlines_before(offset)
+        return line, offset - self._line_start(line)
+
+    def _newlines_before(self, offset: int) -> int:
+        count = 0
+        node = self._root
+        while node is not None:
+            left_length = _length(node.left)
+            if offset <= left_length:
+                node = node.left
+                continue
+            count += _newlines(node.left)
+            offset -= left_length
+            if offset <= len(node.text):
+                return count + node.text.count("\n", 0, offset)
+            count += node.text.count("\n")
+            offset -= len(node.text)
+            node = node.right
+        return count
+
+    def position_to_offset(self, line: int, column: int) -> int:
+        """Character offset of (line, column); the column is clamped to the line."""
+        if not 0 <= line < self.line_count or column < 0:
+            raise IndexError(f"Position {line}:{column} outside document")
+        start = self._line_start(line)
+        end = self._line_start(line + 1) - 1 if line + 1 < self.line_count else len(self)
+        return min(start + column, end)
+
+    def _line_start(self, line: int) -> int:
+        """Offset just after the `line`-th newline (0 for the first line)."""
+        if line == 0:
+            return 0
+        remaining = line
+        base = 0
+        node = self._root
+        while node is not None:
+            left_newlines = _newlines(node.left)
+            if remaining <= left_newlines:
+                node = node.left
+                continue
+            remaining -= left_newlines
+            chunk_start = base + _length(node.left)
+            chunk_newlines = node.text.count("\n")
+            if remaining <= chunk_newlines:
+                index = -1
+                for _ in range(remaining):
+                    index = node.text.index("\n", index + 1)
+                return chunk_start + index + 1
+            remaining -= chunk_newlines
+            base = chunk_start + len(node.text)
+            node = node.right
+        raise IndexError(f"Line {line} outside document")
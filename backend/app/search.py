@@ -0,0 +1,330 @@
+"""Full-text search over the current code of sessions.
+
+Code updates do not touch the index. They only queue the session id, and
+the queued sessions are indexed in one batch later. This happens every
+SEARCH_INDEX_INTERVAL_SECONDS in the background and on shutdown; searches
+only read, so they may miss edits from the last interval. A session
+edited many times in between is indexed once, with its latest code,
+which also keeps full-text reindexing off the per-keystroke path.
+
+Indexing writes the session's code to `search_documents`. On SQLite an
+FTS5 table with a prefix index follows that table through triggers and
+results are ranked by bm25; on PostgreSQL a GIN index over
+`to_tsvector('simple', code)` serves the query and results are ranked by
+ts_rank. Both match every query term as a prefix, so `heap` also finds
+`heapq` and `min_heap`. Snippets are cut in Python from the page of
+results only.
+
+`python -m app.search reindex` adds sessions whose code has not changed
+since before the index existed. It also catches up sessions whose queued
+update was lost, e.g. because the process crashed.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .orm_models import CodeBlob, SearchDocument, Session as ORMSession
+
+logger = logging.getLogger(__name__)
+
+# Terms of a query beyond this many are ignored
+MAX_QUERY_TERMS = 8
+# Characters of context around the first match in a snippet
+SNIPPET_CONTEXT = 60
+# Sessions indexed per transaction by reindex and per query of the queue
+REINDEX_BATCH_SIZE = 500
+# How often queued sessions are indexed in the background; 0 disables it
+SEARCH_INDEX_INTERVAL_SECONDS = float(os.environ.get("SEARCH_INDEX_INTERVAL_SECONDS", "5"))
+
+# Very common terms match a large share of all sessions, and scoring every
+# match costs far more than finding them. Only this many of the most
+# recently indexed matches are scored and ordered; pages beyond them widen
+# the window just enough to be filled.
+SEARCH_RANK_CANDIDATES = int(os.environ.get("SEARCH_RANK_CANDIDATES", "5000"))
+
+_SQLITE_FLOOR_QUERY = """
+SELECT search_fts.rowid FROM search_fts {language_join}
+WHERE search_fts MATCH :match {language_filter}
+ORDER BY search_fts.rowid DESC
+LIMIT 1 OFFSET :candidates - 1
+"""
+
+_SQLITE_QUERY = """
+SELECT d.session_id AS session_id, d.language AS language, d."updatedAt" AS updated_at,
+       d.code AS code, -m.rank AS score
+FROM (
+    SELECT search_fts.rowid AS rowid, search_fts.rank AS rank FROM search_fts {language_join}
+    WHERE search_fts MATCH :match AND search_fts.rowid >= :floor {language_filter}
+    ORDER BY search_fts.rank, search_fts.rowid
+    LIMIT :limit OFFSET :offset
+) m JOIN search_documents d ON d.id = m.rowid
+ORDER BY m.rank, d.id
+"""
+
+_POSTGRES_QUERY = """
+WITH candidates AS (
+    SELECT d.id FROM search_documents d
+    WHERE to_tsvector('simple', d.code) @@ to_tsquery('simple', :match) {language_filter}
+    ORDER BY d.id DESC
+    LIMIT :candidates
+)
+SELECT d.session_id AS session_id, d.language AS language, d."updatedAt" AS updated_at,
+       d.code AS code, ts_rank(to_tsvector('simple', d.code), to_tsquery('simple', :match)) AS score
+FROM candidates c JOIN search_documents d ON d.id = c.id
+ORDER BY score DESC, d.id
+LIMIT :limit OFFSET :offset
+"""
+
+
+def query_terms(query: str) -> List[str]:
+    """Words of a search query, lowercased; punctuation and operators are dropped."""
+    return re.findall(r"[^\W_]+", query.lower())[:MAX_QUERY_TERMS]
+
+
+def index_code(db: Session, session_id: str, code: str, language: str, at: Optional[datetime] = None) -> None:
+    """Make the index reflect a session's current code. The caller commits."""
+    values = {"code": code, "language": language, "updatedAt": at or datetime.utcnow()}
+    stmt = (
+        update(SearchDocument)
+        .where(SearchDocument.session_id == session_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.execute(stmt).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(SearchDocument.__table__).values(session_id=session_id, **values))
+    except IntegrityError:
+        # Another request indexed the session first
+        db.execute(stmt)
+
+
+class IndexQueue:
+    """Sessions whose code changed since they were last indexed, with the time of the change."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, datetime] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def mark(self, session_id: str, at: datetime) -> None:
+        """Queue a session; call after the change is committed."""
+        with self._lock:
+            if at > self._pending.get(session_id, at.min):
+                self._pending[session_id] = at
+
+    def take(self) -> Dict[str, datetime]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+
+index_queue = IndexQueue()
+
+
+def index_pending(db: Session) -> int:
+    """Index the current code of every queued session; returns how many were indexed.
+
+    Commits. If indexing fails, the sessions are queued again.
+    """
+    pending = index_queue.take()
+    if not pending:
+        return 0
+    try:
+        session_ids = list(pending)
+        indexed = 0
+        for start in range(0, len(session_ids), REINDEX_BATCH_SIZE):
+            batch = session_ids[start : start + REINDEX_BATCH_SIZE]
+            rows = {
+                row.id: row
+                for row in db.execute(
+                    select(ORMSession.id, ORMSession.language, CodeBlob.content)
+                    .join(CodeBlob, CodeBlob.hash == ORMSession.code_hash)
+                    .where(ORMSession.id.in_(batch))
+                )
+            }
+            # In queue order, so sessions first indexed here get ids in order of their first change
+            for session_id in batch:
+                row = rows.get(session_id)
+                if row is not None:
+                    index_code(db, session_id, row.content, row.language, pending[session_id])
+            indexed += len(rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        for session_id, at in pending.items():
+            index_queue.mark(session_id, at)
+        raise
+    return indexed
+
+
+def _index_once() -> int:
+    db = SessionLocal()
+    try:
+        return index_pending(db)
+    finally:
+        db.close()
+
+
+async def run_search_indexer(interval: float = SEARCH_INDEX_INTERVAL_SECONDS) -> None:
+    """Periodically index queued sessions until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_index_once)
+        except Exception:
+            logger.exception("Search indexing failed")
+
+
+def index_new_sessions(db: Session, documents: Sequence[dict]) -> None:
+    """Bulk-index sessions that have no search document yet. The caller commits."""
+    if documents:
+        db.execute(insert(SearchDocument.__table__), list(documents))
+
+
+def _snippet(code: str, terms: Sequence[str]) -> tuple:
+    """(1-based line, text around it) of the first match of any term."""
+    pattern = re.compile(r"(?<![^\W_])(?:" + "|".join(map(re.escape, terms)) + ")", re.IGNORECASE)
+    match = pattern.search(code)
+    if match is None:
+        return None, code[: SNIPPET_CONTEXT * 2].strip()
+    line_start = code.rfind("\n", 0, match.start()) + 1
+    line_end = code.find("\n", match.end())
+    line_end = len(code) if line_end == -1 else line_end
+    start = max(line_start, match.start() - SNIPPET_CONTEXT)
+    end = min(line_end, match.end() + SNIPPET_CONTEXT)
+    return code.count("\n", 0, match.start()) + 1, code[start:end].strip()
+
+
+def search_code(
+    db: Session, query: str, language: Optional[str] = None, limit: int = 20, offset: int = 0
+) -> dict:
+    """A page of sessions whose code matches every term of `query`, best first.
+
+    Returns {"results", "hasMore"}; one row past the page is fetched to
+    tell whether there is another page, so no count query is needed.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return {"results": [], "hasMore": False}
+    params = {
+        "limit": limit + 1,
+        "offset": offset,
+        "candidates": max(SEARCH_RANK_CANDIDATES, offset + limit + 1),
+    }
+    clauses = {"language_join": "", "language_filter": ""}
+    if language is not None:
+        params["language"] = language
+        clauses["language_filter"] = "AND d.language = :language"
+
+    if db.get_bind().dialect.name == "postgresql":
+        params["match"] = " & ".join(f"{term}:*" for term in terms)
+        rows = db.execute(text(_POSTGRES_QUERY.format(**clauses)), params).all()
+    else:
+        params["match"] = " ".join(f'"{term}"*' for term in terms)
+        if language is not None:
+            clauses["language_join"] = "JOIN search_documents d ON d.id = search_fts.rowid"
+        floor = db.execute(text(_SQLITE_FLOOR_QUERY.format(**clauses)), params).scalar()
+        params["floor"] = floor or 0
+        rows = db.execute(text(_SQLITE_QUERY.format(**clauses)), params).all()
+
+    results = []
+    for row in rows[:limit]:
+        line, snippet = _snippet(row.code, terms)
+        results.append(
+            {
+                "sessionId": row.session_id,
+                "language": row.language,
+                "updatedAt": row.updated_at,
+                "score": float(row.score),
+                "line": line,
+                "snippet": snippet,
+            }
+        )
+    return {"results": results, "hasMore": len(rows) > limit}
+
+
+def reindex_missing(db: Session, batch_size: int = REINDEX_BATCH_SIZE) -> int:
+    """Index every session that has no search document; returns how many were added."""
+    total = 0
+    while True:
+        rows = db.execute(
+            select(ORMSession.id, ORMSession.language, ORMSession.lastActivityAt, CodeBlob.content)
+            .join(CodeBlob, CodeBlob.hash == ORMSession.code_hash)
+            .where(~select(SearchDocument.id).where(SearchDocument.session_id == ORMSession.id).exists())
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return total
+        index_new_sessions(
+            db,
+            [
+                {"session_id": row.id, "language": row.language, "code": row.content, "updatedAt": row.lastActivityAt}
+                for row in rows
+            ],
+        )
+        db.commit()
+        total += len(rows)
+
+
+def reindex_stale(db: Session, batch_size: int = REINDEX_BATCH_SIZE) -> int:
+    """Reindex sessions active since their search document was written; returns how many.
+
+    Activity other than code changes (e.g. joins) also counts, so this may
+    reindex unchanged code; it is meant for maintenance, not the hot path.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(SearchDocument.id, ORMSession.id.label("session_id"), ORMSession.language)
+            .add_columns(ORMSession.lastActivityAt, CodeBlob.content)
+            .join(ORMSession, ORMSession.id == SearchDocument.session_id)
+            .join(CodeBlob, CodeBlob.hash == ORMSession.code_hash)
+            .where(SearchDocument.id > last_id, SearchDocument.updatedAt < ORMSession.lastActivityAt)
+            .order_by(SearchDocument.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return total
+        for row in rows:
+            index_code(db, row.session_id, row.content, row.language, row.lastActivityAt)
+        db.commit()
+        total += len(rows)
+        last_id = rows[-1].id
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    from .db import init_db
+
+    parser = argparse.ArgumentParser(prog="python -m app.search", description="Maintain the code search index")
+    parser.add_argument(
+        "command", choices=["reindex"], help="index sessions that are missing from the index or out of date"
+    )
+    parser.parse_args(argv)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        print(f"Indexed {reindex_missing(db)} new and {reindex_stale(db)} out-of-date sessions")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Fast JSON encoding for session payloads.
+
+Session dicts built by `DatabaseService` already have the exact shape of
+`InterviewSession`, so running them through Pydantic validation and
+`jsonable_encoder` on every poll only burns CPU. When enabled, endpoints
+return a `FastJSONResponse` directly, which FastAPI sends as-is.
+
+orjson is used when installed (`pip install backend[fast]`); otherwise the
+stdlib encoder is called directly, which still skips the generic encoder.
+"""
+
+import json
+import os
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Opt in to the fast path for session payloads
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "0") == "1"
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode `content` to JSON bytes, matching FastAPI's default output."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response that trusts its content and encodes it in one pass."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,174 @@
+"""In-memory index for serving the bundled SPA.
+
+The static directory is scanned once at startup. Text assets are held in
+memory together with gzip (and brotli, when the module is installed)
+variants, so requests never touch the filesystem except for large binary
+files, which are streamed with a cached stat result. Precompressed
+`.gz`/`.br` files produced by the frontend build are picked up as-is.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+from fastapi.responses import FileResponse, Response
+
+from .compression import COMPRESSIBLE_TYPES, accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Files up to this size are kept in memory
+MAX_IN_MEMORY_BYTES = 2 * 1024 * 1024
+# Smaller files are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+# Vite emits content-hashed names such as assets/index-B2x9Kq1a.js. Only
+# files in its assets directory are hashed; elsewhere (public/) a name like
+# site-manifest.json is stable and must stay revalidatable.
+HASHED_ASSETS_DIR = "assets/"
+HASHED_NAME = re.compile(r"[-.][A-Za-z0-9_]{8,}\.[A-Za-z0-9]+$")
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+DEFAULT_CACHE = "public, max-age=3600"
+INDEX_CACHE = "no-cache"
+
+_ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class StaticAsset:
+    """One servable file and its encoded variants."""
+
+    __slots__ = ("path", "content_type", "etag", "cache_control", "body", "stat", "variants")
+
+    def __init__(self, path: Path, content_type: str, etag: str, cache_control: str):
+        self.path = path
+        self.content_type = content_type
+        self.etag = etag
+        self.cache_control = cache_control
+        # Identity body when held in memory, otherwise streamed from `path`
+        self.body: Optional[bytes] = None
+        self.stat: Optional[os.stat_result] = None
+        self.variants: Dict[str, bytes] = {}
+
+    def etags(self):
+        yield self.etag
+        for encoding in self.variants:
+            yield self._variant_etag(encoding)
+
+    def _variant_etag(self, encoding: str) -> str:
+        return f'{self.etag[:-1]}-{encoding}"'
+
+    def response(self, headers: Mapping[str, str]) -> Response:
+        """Build the response for a request, honouring ETags and Accept-Encoding."""
+        base_headers = {"Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, self.etags()):
+            return Response(status_code=304, headers={**base_headers, "ETag": self.etag})
+
+        encoding = _choose_encoding(headers.get("accept-encoding", ""), self.variants)
+        if encoding:
+            return Response(
+                self.variants[encoding],
+                media_type=self.content_type,
+                headers={**base_headers, "ETag": self._variant_etag(encoding), "Content-Encoding": encoding},
+            )
+        if self.body is not None:
+            return Response(self.body, media_type=self.content_type, headers={**base_headers, "ETag": self.etag})
+        return FileResponse(
+            self.path,
+            media_type=self.content_type,
+            stat_result=self.stat,
+            headers={**base_headers, "ETag": self.etag},
+        )
+
+
+class StaticAssetIndex:
+    """All files under the static directory, keyed by relative URL path."""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root
+        self.assets: Dict[str, StaticAsset] = {}
+
+    @property
+    def index(self) -> Optional[StaticAsset]:
+        return self.assets.get("index.html")
+
+    def get(self, path: str) -> Optional[StaticAsset]:
+        return self.assets.get(path.lstrip("/"))
+
+    @classmethod
+    def build(cls, root: Path) -> "StaticAssetIndex":
+        index = cls(root)
+        if not root.is_dir():
+            return index
+
+        files = {p.relative_to(root).as_posix(): p for p in root.rglob("*") if p.is_file()}
+        for rel, path in files.items():
+            if any(rel.endswith(suffix) and rel[: -len(suffix)] in files for suffix in _ENCODING_SUFFIXES.values()):
+                # Precompressed sibling, attached to its original below
+                continue
+            index.assets[rel] = _load_asset(rel, path, files)
+        return index
+
+
+def _load_asset(rel: str, path: Path, files: Dict[str, Path]) -> StaticAsset:
+    stat = path.stat()
+    content_type = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+    if rel == "index.html":
+        cache_control = INDEX_CACHE
+    elif rel.startswith(HASHED_ASSETS_DIR) and HASHED_NAME.search(rel):
+        cache_control = IMMUTABLE_CACHE
+    else:
+        cache_control = DEFAULT_CACHE
+
+    if stat.st_size > MAX_IN_MEMORY_BYTES:
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        asset = StaticAsset(path, content_type, etag, cache_control)
+        asset.stat = stat
+        return asset
+
+    body = path.read_bytes()
+    asset = StaticAsset(path, content_type, f'"{hashlib.sha1(body).hexdigest()[:20]}"', cache_control)
+    asset.body = body
+
+    for encoding, suffix in _ENCODING_SUFFIXES.items():
+        sibling = files.get(rel + suffix)
+        if sibling is not None:
+            asset.variants[encoding] = sibling.read_bytes()
+
+    if len(body) >= MIN_COMPRESS_BYTES and content_type.startswith(COMPRESSIBLE_TYPES):
+        if "gzip" not in asset.variants:
+            asset.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        if "br" not in asset.variants and brotli is not None:
+            asset.variants["br"] = brotli.compress(body)
+    # Drop variants that do not actually save bytes
+    asset.variants = {e: v for e, v in asset.variants.items() if len(v) < len(body)}
+    return asset
+
+
+def _choose_encoding(accept_encoding: str, variants: Mapping[str, bytes]) -> Optional[str]:
+    if not variants or not accept_encoding:
+        return None
+    try:
+        accepted = accepted_encodings(accept_encoding)
+    except ValueError:
+        return None
+    for encoding in ("br", "gzip"):
+        if encoding in variants and (encoding in accepted or "*" in accepted):
+            return encoding
+    return None
+
+
+def _etag_matches(if_none_match: str, etags) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(etag in candidates for etag in etags)
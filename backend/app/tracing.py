@@ -0,0 +1,123 @@
+"""Per-request SQL tracing: slow-query log, N+1 detection, Server-Timing.
+
+Every statement seen by the engine hooks in `app.db` is attributed to the
+request currently being served through a context variable, which also
+follows work FastAPI hands off to its threadpool.
+"""
+
+import logging
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from contextvars import ContextVar
+from typing import Optional
+
+from .db import add_statement_observer
+
+logger = logging.getLogger(__name__)
+
+SQL_TRACING = os.environ.get("SQL_TRACING", "1") == "1"
+# Statements slower than this are logged with their route
+SLOW_QUERY_MS = float(os.environ.get("SQL_SLOW_QUERY_MS", "100"))
+# Warn when one request runs the same statement shape more than this many times
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+# Add a Server-Timing header with db time and query count to every response
+SERVER_TIMING = os.environ.get("SQL_SERVER_TIMING", "0") == "1"
+
+# "(?, ?, ?)" / "(%(p_1)s, %(p_2)s)" lists of any length share one shape
+_PARAM_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+# Statements come from SQLAlchemy's compiled cache, so few distinct strings repeat
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so repeats with different parameters compare equal."""
+    return _PARAM_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class RequestTrace:
+    """SQL activity of one request."""
+
+    __slots__ = ("scope", "query_count", "db_time", "statements")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.query_count = 0
+        self.db_time = 0.0
+        # Executions per statement shape
+        self.statements: Counter = Counter()
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return "<none>"
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "<unmatched>")
+
+    def repeated_statements(self, threshold: int = None):
+        """Statement shapes executed more than `threshold` times."""
+        threshold = N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return [(shape, count) for shape, count in self.statements.items() if count > threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.db_time * 1000:.2f};desc="{self.query_count} queries"'
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("sql_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def _observe_statement(statement: str, elapsed: float) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.query_count += 1
+        trace.db_time += elapsed
+        trace.statements[statement_shape(statement)] += 1
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        route = trace.route if trace is not None else "<background>"
+        logger.warning("Slow query (%.1f ms) on %s: %s", elapsed * 1000, route, statement_shape(statement))
+
+
+def report_trace(trace: RequestTrace) -> None:
+    """Log possible N+1 patterns found in a finished request."""
+    for shape, count in trace.repeated_statements():
+        logger.warning("Possible N+1 on %s: statement ran %d times: %s", trace.route, count, shape)
+
+
+class SQLTracingMiddleware:
+    """ASGI middleware that opens a RequestTrace for every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SQL_TRACING:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope)
+        token = _current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if SERVER_TIMING and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            report_trace(trace)
+
+
+def install_sql_tracing() -> None:
+    """Attribute every SQL statement to the current request."""
+    if SQL_TRACING:
+        add_statement_observer(_observe_statement)
@@ -0,0 +1,223 @@
+"""Optional MessagePack wire format for session messages.
+
+Clients that send `Accept: application/msgpack` get session payloads as
+MessagePack with a positional schema: each Pydantic model in
+`app.models` becomes an array of its field values in declaration order,
+so field names are never repeated on the wire. Datetimes are sent as
+integer milliseconds since the Unix epoch (UTC), which is both cheaper to
+produce than the MessagePack timestamp extension and what `new Date(ms)`
+takes. `GET /wire/schema` publishes the field order of every model so
+clients can rebuild objects.
+
+What this saves is the field names and JSON punctuation: a 200-byte
+session shrinks by about 40%, while a 10 KB one shrinks by only about 5%.
+The positional conversion runs in Python, so encoding still costs several
+times what orjson takes for JSON, and decoding costs more than parsing
+JSON. Messages dominated by free text (code, program output) therefore
+get JSON even from clients that accept MessagePack; see
+WIRE_MSGPACK_MAX_TEXT.
+
+Everything else, including clients that do not ask for it, gets JSON.
+msgpack is an optional dependency (`pip install backend[msgpack]`); when
+it is missing the negotiation always falls back to JSON.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, get_args, get_origin
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from . import models
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Messages carrying more free text than this (in characters) are sent as JSON
+WIRE_MSGPACK_MAX_TEXT = int(os.environ.get("WIRE_MSGPACK_MAX_TEXT", "2048"))
+_MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+# Models whose positional layout is published to clients
+WIRE_MODELS: Tuple[Type[BaseModel], ...] = (
+    models.User,
+    models.CodeChange,
+    models.InterviewSession,
+    models.ExecutionResult,
+    models.JoinSessionResponse,
+    models.AwarenessResponse,
+)
+
+Converter = Optional[Callable[[Any], Any]]
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+def _to_millis(value: datetime) -> int:
+    if value.tzinfo is not None:
+        # Timestamps in the database are naive UTC
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MILLISECOND
+
+
+def _from_millis(value: int) -> datetime:
+    return _EPOCH + value * _MILLISECOND
+
+
+def _model_of(annotation) -> Optional[Type[BaseModel]]:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+
+def _nested_model(annotation) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """(nested model, whether it is a list of them) of a field annotation."""
+    nested = _model_of(annotation)
+    if nested is not None:
+        return nested, False
+    args = get_args(annotation)
+    if get_origin(annotation) is list and args and _model_of(args[0]) is not None:
+        return args[0], True
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def _codec(model: Type[BaseModel]) -> Tuple[Tuple[str, ...], Tuple[Tuple[int, Converter, Converter], ...]]:
+    """Field names in order, plus (index, encoder, decoder) of the fields that need converting.
+
+    Only datetimes and nested models are converted; every other field is
+    copied as is, so the per-field work stays a single list comprehension.
+    """
+    names = tuple(model.model_fields)
+    converters = []
+    for index, field in enumerate(model.model_fields.values()):
+        annotation = field.annotation
+        if annotation is datetime:
+            converters.append((index, _to_millis, _from_millis))
+            continue
+        nested, many = _nested_model(annotation)
+        if nested is None:
+            continue
+        encode, decode = _encoder(nested), _decoder(nested)
+        if many:
+            converters.append(
+                (
+                    index,
+                    lambda v, encode=encode: [encode(item) for item in v],
+                    lambda v, decode=decode: [decode(item) for item in v],
+                )
+            )
+        else:
+            converters.append((index, encode, decode))
+    return names, tuple(converters)
+
+
+@lru_cache(maxsize=None)
+def _encoder(model: Type[BaseModel]) -> Callable[[Any], list]:
+    names, converters = _codec(model)
+    converters = tuple((index, encode) for index, encode, _ in converters)
+
+    def encode(value: Any) -> list:
+        if isinstance(value, dict):
+            get = value.get
+            array = [get(name) for name in names]
+        else:
+            array = [getattr(value, name, None) for name in names]
+        for index, convert in converters:
+            item = array[index]
+            if item is not None:
+                array[index] = convert(item)
+        return array
+
+    return encode
+
+
+@lru_cache(maxsize=None)
+def _decoder(model: Type[BaseModel]) -> Callable[[list], dict]:
+    names, converters = _codec(model)
+    converters = tuple((index, decode) for index, _, decode in converters)
+
+    def decode(array: list) -> dict:
+        items = list(array)
+        for index, convert in converters:
+            if index < len(items) and items[index] is not None:
+                items[index] = convert(items[index])
+        return dict(zip(names, items))
+
+    return decode
+
+
+def schema(model: Type[BaseModel]) -> List:
+    """Field order of a model; nested models are given as [name, nested schema]."""
+    result = []
+    for name, field in model.model_fields.items():
+        nested, _ = _nested_model(field.annotation)
+        result.append([name, schema(nested)] if nested is not None else name)
+    return result
+
+
+def encode_model(model: Type[BaseModel], value: Any) -> list:
+    """Turn a model instance, or a dict of its fields, into a positional array.
+
+    Fields missing from a dict (e.g. a sparse fieldset) are sent as nil.
+    """
+    return _encoder(model)(value)
+
+
+def decode_model(model: Type[BaseModel], array: list) -> dict:
+    """Rebuild the field dict of a model from its positional array."""
+    return _decoder(model)(array)
+
+
+_packers = threading.local()
+
+
+def packb(content: Any) -> bytes:
+    # A Packer per thread: building one per call costs as much as packing a small message
+    packer = getattr(_packers, "packer", None)
+    if packer is None:
+        packer = _packers.packer = msgpack.Packer(use_bin_type=True)
+    return packer.pack(content)
+
+
+def unpackb(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+
+def wants_msgpack(accept: Optional[str], text_size: int = 0) -> bool:
+    """Whether to answer in MessagePack; JSON stays the default.
+
+    `text_size` is the length of the free text (code, output) the message
+    carries. Over WIRE_MSGPACK_MAX_TEXT MessagePack saves too little to pay
+    for its encoding, so the answer is JSON.
+    """
+    if msgpack is None or not accept or text_size > WIRE_MSGPACK_MAX_TEXT:
+        return False
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        if media_type.strip().lower() in _MSGPACK_MEDIA_TYPES:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+class MsgPackResponse(Response):
+    """Response carrying a model as a positional MessagePack array."""
+
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def __init__(self, model: Type[BaseModel], content: Any, status_code: int = 200, **kwargs):
+        super().__init__(encode_model(model, content), status_code=status_code, **kwargs)
+        self.headers.add_vary_header("Accept")
+
+    def render(self, content: Any) -> bytes:
+        return packb(content)
+
+
+def wire_schema() -> Dict[str, List]:
+    return {model.__name__: schema(model) for model in WIRE_MODELS}
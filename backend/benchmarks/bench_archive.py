@@ -0,0 +1,63 @@
+"""Throughput of the streaming session export and the batched import.
+
+Seeds sessions with long histories, exports them to an in-memory gzip
+JSONL archive and imports the archive into an empty database, reporting
+history rows per second for both directions.
+
+    uv run python -m benchmarks.bench_archive
+"""
+
+import gzip
+import io
+import time
+from datetime import datetime
+
+from benchmarks.common import make_session_factory, seed_history
+from app.archive import import_archive, iter_archive_records, iter_gzip_jsonl, read_archive
+from app.database import DatabaseService
+
+SESSIONS = 20
+CHANGES_PER_SESSION = 5_000
+
+
+def _history(session: int):
+    # A 40-line solution where every change rewrites one line, like typing
+    lines = [f"    step_{i} = values[{i % 7}] * {i}\n" for i in range(40)]
+    for i in range(CHANGES_PER_SESSION):
+        lines[(i * 7) % 40] = f"    step_{i} = values[{i % 7}] * {session}\n"
+        yield f"def solve_{session}(values):\n" + "".join(lines)
+
+
+def main():
+    source = make_session_factory()()
+    service = DatabaseService(source)
+    start = datetime.utcnow()
+    for session in range(SESSIONS):
+        session_id, _ = service.create_session("Host", "http://bench")
+        seed_history(source, session_id, list(_history(session)), start)
+    rows = SESSIONS * CHANGES_PER_SESSION
+
+    began = time.perf_counter()
+    archive = io.BytesIO()
+    for chunk in iter_gzip_jsonl(iter_archive_records(source)):
+        archive.write(chunk)
+    elapsed = time.perf_counter() - began
+    raw = len(gzip.decompress(archive.getvalue()))
+    print(
+        f"export  {rows} changes in {elapsed:.2f}s  {rows / elapsed:>9.0f} rows/s"
+        f"  {archive.tell() / 1e6:.1f} MB gzip ({raw / 1e6:.1f} MB raw)"
+    )
+
+    target = make_session_factory()()
+    archive.seek(0)
+    began = time.perf_counter()
+    counts = import_archive(target, read_archive(archive))
+    elapsed = time.perf_counter() - began
+    print(f"import  {counts['changes']} changes in {elapsed:.2f}s  {counts['changes'] / elapsed:>9.0f} rows/s")
+
+    source.close()
+    target.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark storage size and latency of compressed code columns.
+
+Writes the same workload with CODE_COMPRESSION off, zlib and zstd and
+reports bytes stored in code_blobs.content along with update_code and
+get_session latency.
+"""
+
+from sqlalchemy import func, select
+
+from benchmarks.common import make_session_factory, measure, report
+from app import column_types
+from app.database import DatabaseService, DEFAULT_CODE
+from app.orm_models import CodeBlob
+
+
+def _code(size: int) -> str:
+    text = "".join(DEFAULT_CODE.values())
+    return (text * (size // len(text) + 1))[:size]
+
+
+def _stored_bytes(db) -> int:
+    return db.scalar(select(func.sum(func.length(CodeBlob.__table__.c.content)))) or 0
+
+
+def main():
+    codecs = ["off", "zlib"]
+    if column_types.zstandard is not None:
+        codecs.append("zstd")
+
+    for size in (2_000, 20_000, 200_000):
+        code = _code(size)
+        raw_bytes = None
+        for codec in codecs:
+            column_types.COMPRESSION_CODEC = codec
+            SessionLocal = make_session_factory()
+            db = SessionLocal()
+            service = DatabaseService(db)
+            session_id, _ = service.create_session("Host", "http://bench")
+
+            counter = iter(range(10**9))
+            write = measure(
+                lambda: service.update_code(session_id, code + str(next(counter)), "python"),
+                repeat=100,
+            )
+            read = measure(lambda: service.get_session(session_id), repeat=100)
+            stored = _stored_bytes(db)
+            raw_bytes = raw_bytes or stored
+            db.close()
+
+            label = f"{size // 1000}KB {codec}"
+            report(f"update_code {label}", write)
+            report(f"get_session {label}", read)
+            print(f"{'stored bytes ' + label:<40} {stored:>12,}   ratio {raw_bytes / stored:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Random edits on a 1 MB document: rope versus rewriting the string.
+
+Each step replaces a short random range with a few characters, the way
+keystrokes and small pastes arrive. The rope edits in place; the string
+baseline rebuilds the full text per edit, as PATCH /code does. Offset to
+line/column conversions are compared against counting newlines.
+
+    uv run python -m benchmarks.bench_document
+"""
+
+import random
+
+from benchmarks.common import measure, report
+from app.rope import Rope
+
+DOCUMENT_SIZE = 1024 * 1024
+
+
+def _document(size: int) -> str:
+    line = "    total += values[i] * weights[i]  # accumulate\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def _edit(rng: random.Random, length: int):
+    start = rng.randrange(length)
+    end = min(length, start + rng.randint(0, 8))
+    return start, end, "x" * rng.randint(0, 8)
+
+
+def main():
+    text = _document(DOCUMENT_SIZE)
+    rope = Rope(text)
+    rng = random.Random(0)
+    state = {"text": text}
+
+    def edit_rope():
+        start, end, insert = _edit(rng, len(rope))
+        rope.replace(start, end, insert)
+
+    def edit_str():
+        current = state["text"]
+        start, end, insert = _edit(rng, len(current))
+        state["text"] = current[:start] + insert + current[end:]
+
+    report("edit rope (1 MB)", measure(edit_rope, repeat=5000))
+    report("edit str (1 MB)", measure(edit_str, repeat=500))
+
+    def position_rope():
+        rope.offset_to_position(rng.randrange(len(rope)))
+
+    def position_str():
+        current = state["text"]
+        offset = rng.randrange(len(current))
+        current.count("\n", 0, offset), offset - current.rfind("\n", 0, offset) - 1
+
+    report("offset->line/col rope", measure(position_rope, repeat=5000))
+    report("offset->line/col str", measure(position_str, repeat=500))
+
+    def line_rope():
+        rope.position_to_offset(rng.randrange(rope.line_count), 10)
+
+    report("line/col->offset rope", measure(line_rope, repeat=5000))
+    report("materialize rope (flush)", measure(lambda: str(rope), repeat=50))
+    print(f"chunks after edits: {rope.chunk_count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Microbenchmark suite for DatabaseService and executor hot paths.
+
+Every case runs against fixed datasets (participants 2/20/200, code
+1 KB to 1 MB, history 10 to 100k rows) and reports ops/sec plus the peak
+memory allocated per call. Results can be saved as a baseline and later
+runs compared against it:
+
+    uv run python -m benchmarks.bench_hot_paths --save-baseline
+    uv run python -m benchmarks.bench_hot_paths --compare
+
+--compare exits non-zero when a case is slower or allocates more than
+--tolerance allows. Baselines are machine-specific; regenerate them on
+the machine that runs the comparison.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, insert
+
+from benchmarks.common import make_session_factory, seed_history
+from app.database import DatabaseService
+from app.executor import execute_code
+from app.orm_models import SessionUser
+
+BASELINE_PATH = Path(__file__).parent / "baselines.json"
+
+PARTICIPANT_COUNTS = (2, 20, 200)
+CODE_SIZES = {"1KB": 1_000, "10KB": 10_000, "100KB": 100_000, "1MB": 1_000_000}
+HISTORY_LENGTHS = (10, 1_000, 100_000)
+QUICK_CODE_SIZES = {"1KB": 1_000, "100KB": 100_000}
+QUICK_HISTORY_LENGTHS = (10, 10_000)
+
+
+@dataclass
+class Case:
+    name: str
+    run: Callable[[], object]
+    # Runs after every timed call, outside the measurement
+    teardown: Optional[Callable[[], None]] = None
+
+
+def _code(size: int) -> str:
+    line = "    total += values[i] * weights[i]  # accumulate\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+class Datasets:
+    """Fixed sessions the cases run against, built once per run."""
+
+    def __init__(self, quick: bool):
+        self.db = make_session_factory()()
+        self.service = DatabaseService(self.db)
+        self.code_sizes = QUICK_CODE_SIZES if quick else CODE_SIZES
+        self.history_lengths = QUICK_HISTORY_LENGTHS if quick else HISTORY_LENGTHS
+
+        self.by_participants = {n: self._session(participants=n) for n in PARTICIPANT_COUNTS}
+        self.by_code_size = {
+            label: self._session(code=_code(size)) for label, size in self.code_sizes.items()
+        }
+        self.by_history = {n: self._session(history=n) for n in self.history_lengths}
+
+    def _session(self, participants: int = 2, code: Optional[str] = None, history: int = 0) -> str:
+        session_id, _ = self.service.create_session("Host", "http://bench")
+        now = datetime.utcnow()
+        users = [
+            {
+                "id": str(uuid.uuid4()),
+                "name": f"User {i}",
+                "isHost": False,
+                "joinedAt": now,
+                "session_id": session_id,
+            }
+            for i in range(participants - 1)
+        ]
+        if users:
+            self.db.execute(insert(SessionUser), users)
+            self.db.commit()
+        if code is not None:
+            self.service.update_code(session_id, code, "python")
+        if history:
+            start = now - timedelta(seconds=history)
+            seed_history(self.db, session_id, [f"print({i})\n" for i in range(history)], start)
+        return session_id
+
+
+def build_cases(data: Datasets) -> List[Case]:
+    service, db = data.service, data.db
+    cases: List[Case] = []
+
+    for n, session_id in data.by_participants.items():
+        cases.append(Case(f"get_session participants={n}", lambda s=session_id: service.get_session(s)))
+    for label, session_id in data.by_code_size.items():
+        cases.append(Case(f"get_session code={label}", lambda s=session_id: service.get_session(s)))
+
+    for n, session_id in data.by_participants.items():
+        joined: List[str] = []
+
+        def join(s=session_id, joined=joined):
+            joined.append(service.join_session(s, "Candidate")[1])
+
+        def leave(joined=joined):
+            db.execute(delete(SessionUser).where(SessionUser.id == joined.pop()))
+            db.commit()
+
+        cases.append(Case(f"join_session participants={n}", join, teardown=leave))
+
+    for label, session_id in data.by_code_size.items():
+        base = _code(data.code_sizes[label])
+        counter = iter(range(10**9))
+        cases.append(
+            Case(
+                f"update_code code={label}",
+                lambda s=session_id, b=base, c=counter: service.update_code(s, b + str(next(c)), "python"),
+            )
+        )
+        current = service.get_session(session_id)["code"]
+        cases.append(
+            Case(f"update_code noop code={label}", lambda s=session_id, c=current: service.update_code(s, c, "python"))
+        )
+
+    for n, session_id in data.by_history.items():
+        counter = iter(range(10**9))
+        cases.append(
+            Case(
+                f"update_code history={n}",
+                lambda s=session_id, c=counter: service.update_code(s, f"x = {next(c)}", "python"),
+            )
+        )
+        at = datetime.utcnow() - timedelta(seconds=n // 2)
+        cases.append(Case(f"get_code_at history={n}", lambda s=session_id, a=at: service.get_code_at(s, a)))
+
+    loop = asyncio.new_event_loop()
+    for label, language, code in (
+        ("javascript", "javascript", "console.log('hello');\n" * 5),
+        ("python", "python", "print('hello')\n" * 5),
+        ("javascript 100KB", "javascript", _code(100_000)),
+    ):
+        cases.append(
+            Case(f"execute_code {label}", lambda c=code, l=language: loop.run_until_complete(execute_code(c, l)))
+        )
+
+    return cases
+
+
+def run_case(case: Case, min_time: float, max_iterations: int) -> Dict[str, float]:
+    """Measure ops/sec, then peak allocation per call in a separate pass."""
+    for _ in range(3):
+        case.run()
+        if case.teardown:
+            case.teardown()
+
+    timed = 0.0
+    iterations = 0
+    while timed < min_time and iterations < max_iterations:
+        start = time.perf_counter()
+        case.run()
+        timed += time.perf_counter() - start
+        iterations += 1
+        if case.teardown:
+            case.teardown()
+
+    # tracemalloc slows everything down, so it is kept out of the timing pass
+    peaks = []
+    tracemalloc.start()
+    for _ in range(min(iterations, 5)):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        case.run()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - baseline)
+        if case.teardown:
+            case.teardown()
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": iterations / timed,
+        "us_per_op": timed / iterations * 1e6,
+        "peak_alloc_kb": sorted(peaks)[len(peaks) // 2] / 1024,
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Return a description of every case that regressed beyond `tolerance`."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['ops_per_sec']:.0f} ops/s vs baseline {base['ops_per_sec']:.0f}"
+            )
+        if result["peak_alloc_kb"] > base["peak_alloc_kb"] * (1 + tolerance) + 1:
+            regressions.append(
+                f"{name}: {result['peak_alloc_kb']:.1f} KB/op vs baseline {base['peak_alloc_kb']:.1f}"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Smaller datasets for fast CI runs")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to time each case")
+    parser.add_argument("--max-iterations", type=int, default=10_000)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail on regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    print("Building datasets...")
+    data = Datasets(quick=args.quick)
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+
+    results: Dict[str, dict] = {}
+    print(f"\n{'case':<40}{'ops/s':>12}{'us/op':>12}{'KB/op':>10}{'vs base':>10}")
+    for case in build_cases(data):
+        if args.filter not in case.name:
+            continue
+        result = results[case.name] = run_case(case, args.min_time, args.max_iterations)
+        base = baseline.get(case.name)
+        delta = f"{result['ops_per_sec'] / base['ops_per_sec'] - 1:+.0%}" if base else "-"
+        print(
+            f"{case.name:<40}{result['ops_per_sec']:>12.0f}{result['us_per_op']:>12.1f}"
+            f"{result['peak_alloc_kb']:>10.1f}{delta:>10}"
+        )
+
+    if args.save_baseline:
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.compare:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Latency of GET /search over a large code index.
+
+Fills search_documents with synthetic solutions (about 1% use a heap,
+10% a deque) and times ranked, paginated queries against it. Pass the
+number of documents as the first argument (default one million); the
+fill takes a minute or two at that size.
+
+    uv run python -m benchmarks.bench_search 1000000
+"""
+
+import random
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from benchmarks.common import make_session_factory, measure, report
+from app.orm_models import SearchDocument
+from app.search import search_code
+
+WORDS = ("total", "values", "result", "index", "count", "left", "right", "mid", "node", "graph", "memo", "visited")
+
+
+def _code(rng: random.Random, i: int) -> str:
+    lines = [f"def solve_{i}(values):"]
+    if rng.random() < 0.01:
+        lines += ["    import heapq", "    heapq.heapify(values)", "    return heapq.heappop(values)"]
+    elif rng.random() < 0.1:
+        lines += ["    from collections import deque", "    queue = deque(values)", "    return queue.popleft()"]
+    lines += [f"    {rng.choice(WORDS)} = {rng.choice(WORDS)} + {rng.randint(0, 99)}" for _ in range(6)]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    db = make_session_factory()()
+    rng = random.Random(0)
+    now = datetime.utcnow()
+
+    began = time.perf_counter()
+    for start in range(0, rows, 10_000):
+        db.execute(
+            insert(SearchDocument.__table__),
+            [
+                {"session_id": f"s{i:09d}", "language": "python", "code": _code(rng, i), "updatedAt": now}
+                for i in range(start, min(rows, start + 10_000))
+            ],
+        )
+        db.commit()
+    print(f"indexed {rows} documents in {time.perf_counter() - began:.1f}s")
+
+    for query, offset in (("heap", 0), ("heapq heappop", 0), ("deque", 0), ("deque", 1000), ("nothing_matches", 0)):
+        report(f"search {query!r} offset {offset}", measure(lambda: search_code(db, query, offset=offset), repeat=50))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
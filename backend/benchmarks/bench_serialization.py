@@ -0,0 +1,57 @@
+"""Benchmark serialization cost of GET /sessions/{id} and join payloads.
+
+Compares FastAPI's default path (Pydantic validation and/or
+jsonable_encoder + stdlib json) with the opt-in FastJSONResponse.
+"""
+
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks.common import measure, report
+from app import serialization
+from app.models import JoinSessionResponse
+from app.serialization import FastJSONResponse
+
+
+def _session(code_size: int, participants: int) -> dict:
+    line = "    total += values[i] * weights[i]  # accumulate\n"
+    return {
+        "id": "abc12345",
+        "code": (line * (code_size // len(line) + 1))[:code_size],
+        "language": "python",
+        "participants": [
+            {"id": f"user-{i}", "name": f"User {i}", "isHost": i == 0, "joinedAt": datetime.utcnow()}
+            for i in range(participants)
+        ],
+        "createdAt": datetime.utcnow(),
+        "isActive": True,
+    }
+
+
+def main():
+    encoder = "orjson" if serialization.orjson is not None else "stdlib json"
+    print(f"fast path encoder: {encoder}\n")
+
+    for code_size, participants in ((1_000, 2), (50_000, 2), (500_000, 20)):
+        session = _session(code_size, participants)
+        label = f"{code_size // 1000}KB/{participants}p"
+
+        # GET /sessions/{id}: dict -> jsonable_encoder -> JSONResponse
+        report(f"get default   {label}", measure(lambda: JSONResponse(jsonable_encoder(session))))
+        report(f"get fast      {label}", measure(lambda: FastJSONResponse(session)))
+
+        # POST /sessions/{id}/join: response_model validation + encoding
+        def join_default():
+            model = JoinSessionResponse(session=session, userId="user-1")
+            validated = JoinSessionResponse.model_validate(model.model_dump())
+            return JSONResponse(jsonable_encoder(validated))
+
+        report(f"join default  {label}", measure(join_default))
+        report(f"join fast     {label}", measure(lambda: FastJSONResponse({"session": session, "userId": "user-1"})))
+        print()
+
+
+if __name__ == "__main__":
+    main()
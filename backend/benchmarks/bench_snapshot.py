@@ -0,0 +1,42 @@
+"""Benchmark GET /sessions/{id}/snapshot lookups against history length.
+
+The snapshot query is an index seek on (session_id, timestamp, id), so the
+latency for a 10-change session and a 50k-change session should match.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_session_factory, measure, report, seed_history
+from app.database import DatabaseService
+
+
+def _seed(db, history_length: int) -> tuple[str, datetime, datetime]:
+    service = DatabaseService(db)
+    session_id, _ = service.create_session("Host", "http://bench")
+    start = datetime.utcnow()
+    seed_history(db, session_id, [f"print({i})\n" * 20 for i in range(history_length)], start)
+    return session_id, start, start + timedelta(seconds=history_length)
+
+
+def main():
+    SessionLocal = make_session_factory()
+    db = SessionLocal()
+    service = DatabaseService(db)
+    rng = random.Random(0)
+
+    for history_length in (10, 50_000):
+        session_id, start, end = _seed(db, history_length)
+        span = (end - start).total_seconds()
+
+        def lookup():
+            at = start + timedelta(seconds=rng.uniform(0, span))
+            assert service.get_code_at(session_id, at) is not None
+
+        report(f"snapshot ({history_length} changes)", measure(lookup, repeat=500))
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Compare JSON and positional MessagePack for session messages.
+
+Reports encode and decode time plus bytes per message for the payloads
+the realtime paths send: full sessions, code changes, awareness updates
+and execution results.
+
+MessagePack saves bytes on small messages but costs more CPU on both
+sides. The positional step runs in Python in both directions. "decode
+json" also leaves timestamps as strings, while "decode msgpack" rebuilds
+datetimes. Needs the msgpack extra:
+
+    uv run --extra msgpack python -m benchmarks.bench_wire
+"""
+
+import json
+from datetime import datetime
+
+from benchmarks.common import measure, report
+from app import serialization, wire
+from app.models import AwarenessResponse, CodeChange, ExecutionResult, InterviewSession
+from app.serialization import dumps
+
+
+def _code(size: int) -> str:
+    line = "    total += values[i] * weights[i]  # accumulate\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def _messages():
+    now = datetime.utcnow()
+    participants = [
+        {"id": f"4f1c2b9e-0d7a-4c55-9b1e-{i:012d}", "name": f"User {i}", "isHost": i == 0, "joinedAt": now}
+        for i in range(4)
+    ]
+    for size in (200, 10_000):
+        session = {
+            "id": "abc12345",
+            "code": _code(size),
+            "language": "python",
+            "participants": participants,
+            "createdAt": now,
+            "isActive": True,
+        }
+        yield f"session {size // 1000 or size}{'KB' if size >= 1000 else 'B'}", InterviewSession, session
+    yield "code change 200B", CodeChange, {
+        "userId": participants[1]["id"],
+        "content": _code(200),
+        "timestamp": now,
+        "language": "python",
+    }
+    yield "awareness 4 users", AwarenessResponse, {
+        "cursor": 1234,
+        "states": [(p["id"], 12, 4, 12, 18) for p in participants],
+        "removed": [],
+    }
+    yield "execution result", ExecutionResult, {
+        "success": True,
+        "output": "Hello, World!\n" * 3,
+        "error": None,
+        "executionTime": 0.0123,
+    }
+
+
+# Decode JSON with the same library the server encodes with
+loads = serialization.orjson.loads if serialization.orjson is not None else json.loads
+
+
+def main():
+    if wire.msgpack is None:
+        raise SystemExit("msgpack is not installed; run with the msgpack extra")
+
+    print(f"{'message':<22}{'json B':>9}{'msgpack B':>11}{'ratio':>8}")
+    for name, model, message in _messages():
+        as_json = dumps(message)
+        as_msgpack = wire.packb(wire.encode_model(model, message))
+        print(f"{name:<22}{len(as_json):>9}{len(as_msgpack):>11}{len(as_msgpack) / len(as_json):>8.2f}")
+
+    print()
+    for name, model, message in _messages():
+        as_json = dumps(message)
+        as_msgpack = wire.packb(wire.encode_model(model, message))
+        report(f"encode json     {name}", measure(lambda: dumps(message), repeat=2000))
+        report(f"encode msgpack  {name}", measure(lambda: wire.packb(wire.encode_model(model, message)), repeat=2000))
+        report(f"decode json     {name}", measure(lambda: loads(as_json), repeat=2000))
+        report(
+            f"decode msgpack  {name}",
+            measure(lambda: wire.decode_model(model, wire.unpackb(as_msgpack)), repeat=2000),
+        )
+        print()
+
+
+if __name__ == "__main__":
+    main()
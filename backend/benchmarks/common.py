@@ -0,0 +1,91 @@
+"""Shared helpers for the benchmark scripts.
+
+Run benchmarks from the backend directory, e.g.:
+    uv run python -m benchmarks.bench_snapshot
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Callable, Sequence
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db import Base
+from app.database import hash_code
+from app.orm_models import CodeBlob, CodeChange
+
+
+def make_session_factory():
+    """Create a throwaway SQLite database and return a session factory for it."""
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        future=True,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+def seed_history(db, session_id: str, contents: Sequence[str], start: datetime) -> None:
+    """Bulk-insert one history row per entry of `contents`, one second apart."""
+    existing = set(db.scalars(select(CodeBlob.hash)))
+    blobs = {}
+    for content in contents:
+        digest = hash_code(content)
+        if digest not in existing and digest not in blobs:
+            blobs[digest] = {
+                "hash": digest,
+                "content": content,
+                "size": len(content.encode("utf-8")),
+                "lastUsedAt": start,
+            }
+    changes = [
+        {
+            "session_id": session_id,
+            "userId": "system",
+            "content_hash": hash_code(content),
+            "language": "python",
+            "timestamp": start + timedelta(seconds=i),
+        }
+        for i, content in enumerate(contents)
+    ]
+    for rows, model in ((list(blobs.values()), CodeBlob), (changes, CodeChange)):
+        for offset in range(0, len(rows), 5000):
+            db.execute(insert(model), rows[offset : offset + 5000])
+    db.commit()
+
+
+def measure(fn: Callable[[], object], repeat: int = 200, warmup: int = 10) -> dict:
+    """Time `fn` and return latency percentiles in microseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "median_us": statistics.median(samples),
+        "p95_us": samples[int(len(samples) * 0.95) - 1],
+        "ops_per_sec": 1e6 / statistics.mean(samples),
+    }
+
+
+def report(name: str, result: dict) -> None:
+    """Print one benchmark result line."""
+    print(
+        f"{name:<40} median {result['median_us']:>10.1f} us"
+        f"   p95 {result['p95_us']:>10.1f} us"
+        f"   {result['ops_per_sec']:>10.0f} ops/s"
+    )
@@ -0,0 +1,265 @@
+"""Load generator that simulates concurrent interviews.
+
+Each simulated session has a host and a candidate behaving like the
+frontend: both poll GET /sessions/{id} twice per second (code and
+participant subscriptions), the candidate types in bursts that PATCH the
+full code on every keystroke, and presses Run every so often.
+
+Target a running server:
+    uv run python -m benchmarks.load_test --base-url http://localhost:8000
+
+or, without --base-url, the app in-process against a throwaway SQLite DB:
+    uv run python -m benchmarks.load_test --sessions 20 --duration 30 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+
+class Recorder:
+    """Collects latency samples and errors per endpoint."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.latencies[label].append(time.perf_counter() - start)
+            self.errors[label] += 1
+            return None
+        self.latencies[label].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+    def summary(self, duration: float) -> dict:
+        endpoints = {}
+        for label, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            count = len(samples)
+            endpoints[label] = {
+                "count": count,
+                "errors": self.errors[label],
+                "error_rate": self.errors[label] / count,
+                "throughput_rps": count / duration,
+                "p50_ms": _percentile(samples, 50) * 1000,
+                "p95_ms": _percentile(samples, 95) * 1000,
+                "p99_ms": _percentile(samples, 99) * 1000,
+                "max_ms": samples[-1] * 1000,
+                "mean_ms": statistics.mean(samples) * 1000,
+            }
+        total = sum(e["count"] for e in endpoints.values())
+        errors = sum(e["errors"] for e in endpoints.values())
+        return {
+            "endpoints": endpoints,
+            "totals": {
+                "requests": total,
+                "errors": errors,
+                "error_rate": errors / total if total else 0.0,
+                "throughput_rps": total / duration,
+            },
+        }
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    index = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+async def _pause(stop: asyncio.Event, seconds: float) -> bool:
+    """Sleep for `seconds` or until the run stops; True means stop."""
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+async def _poller(client, recorder, session_id: str, interval: float, stop: asyncio.Event):
+    # Stagger pollers so they do not all fire on the same tick
+    if await _pause(stop, random.uniform(0, interval)):
+        return
+    while True:
+        await recorder.request(client, "GET /sessions/{id}", "GET", f"/sessions/{session_id}")
+        if await _pause(stop, interval):
+            return
+
+
+async def _typist(client, recorder, session_id: str, user_id: str, args, stop: asyncio.Event):
+    code = "# candidate solution\n" + "x = 0\n" * (args.code_size // 6)
+    while not await _pause(stop, random.expovariate(1 / args.think_time)):
+        for _ in range(random.randint(1, args.burst_size)):
+            code += random.choice("abcdefghijklmnopqrstuvwxyz \n")
+            await recorder.request(
+                client,
+                "PATCH /sessions/{id}/code",
+                "PATCH",
+                f"/sessions/{session_id}/code",
+                json={"userId": user_id, "code": code, "language": "python"},
+            )
+            if await _pause(stop, args.keystroke_interval):
+                return
+
+
+async def _runner(client, recorder, session_id: str, args, stop: asyncio.Event):
+    while not await _pause(stop, random.expovariate(1 / args.run_interval)):
+        await recorder.request(
+            client,
+            "POST /sessions/{id}/execute",
+            "POST",
+            f"/sessions/{session_id}/execute",
+            json={"code": "print('hello')", "language": "python"},
+        )
+
+
+async def _interview(client, recorder, args, stop: asyncio.Event) -> List[asyncio.Task]:
+    created = await recorder.request(client, "POST /sessions", "POST", "/sessions", json={"hostName": "Host"})
+    if created is None or created.status_code != 201:
+        return []
+    session_id = created.json()["sessionId"]
+    joined = await recorder.request(
+        client, "POST /sessions/{id}/join", "POST", f"/sessions/{session_id}/join", json={"userName": "Candidate"}
+    )
+    if joined is None or joined.status_code != 200:
+        return []
+    candidate_id = joined.json()["userId"]
+
+    # Host and candidate each run the code and participant pollers
+    tasks = [
+        asyncio.create_task(_poller(client, recorder, session_id, args.poll_interval, stop)) for _ in range(4)
+    ]
+    tasks.append(asyncio.create_task(_typist(client, recorder, session_id, candidate_id, args, stop)))
+    tasks.append(asyncio.create_task(_runner(client, recorder, session_id, args, stop)))
+    return tasks
+
+
+def _in_process_client() -> httpx.AsyncClient:
+    from benchmarks.common import make_session_factory
+    from app.db import get_db
+    from main import app
+
+    SessionLocal = make_session_factory()
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest")
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    if args.base_url:
+        client = httpx.AsyncClient(
+            base_url=args.base_url,
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=args.max_connections),
+        )
+    else:
+        client = _in_process_client()
+
+    recorder = Recorder()
+    stop = asyncio.Event()
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    async with client:
+        # Ramp sessions up over the first seconds instead of all at once
+        tasks: List[asyncio.Task] = []
+        for _ in range(args.sessions):
+            tasks.extend(await _interview(client, recorder, args, stop))
+            await asyncio.sleep(args.ramp_up / max(args.sessions, 1))
+        remaining = args.duration - (time.perf_counter() - start)
+        await asyncio.sleep(max(0.0, remaining))
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    duration = time.perf_counter() - start
+
+    result = {
+        "started_at": started_at.isoformat(),
+        "duration_s": duration,
+        "target": args.base_url or "in-process",
+        "config": {
+            key: getattr(args, key)
+            for key in (
+                "sessions",
+                "duration",
+                "poll_interval",
+                "keystroke_interval",
+                "burst_size",
+                "think_time",
+                "run_interval",
+                "code_size",
+                "seed",
+            )
+        },
+    }
+    result.update(recorder.summary(duration))
+    return result
+
+
+def _print_report(result: dict) -> None:
+    print(f"\nTarget: {result['target']}   duration: {result['duration_s']:.1f}s")
+    print(f"{'endpoint':<32}{'count':>8}{'rps':>9}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for label, stats in result["endpoints"].items():
+        print(
+            f"{label:<32}{stats['count']:>8}{stats['throughput_rps']:>9.1f}"
+            f"{stats['error_rate'] * 100:>7.1f}{stats['p50_ms']:>9.1f}"
+            f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+        )
+    totals = result["totals"]
+    print(
+        f"{'total':<32}{totals['requests']:>8}{totals['throughput_rps']:>9.1f}"
+        f"{totals['error_rate'] * 100:>7.1f}\n"
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Server to target; runs the app in-process when omitted")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent interviews")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds over which sessions start")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Frontend poll interval")
+    parser.add_argument("--keystroke-interval", type=float, default=0.15, help="Seconds between keystrokes")
+    parser.add_argument("--burst-size", type=int, default=20, help="Max keystrokes per typing burst")
+    parser.add_argument("--think-time", type=float, default=3.0, help="Mean pause between bursts")
+    parser.add_argument("--run-interval", type=float, default=30.0, help="Mean seconds between Run clicks")
+    parser.add_argument("--code-size", type=int, default=2000, help="Initial code size in characters")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    result = asyncio.run(run(args))
+    _print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0 if result["totals"]["error_rate"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,42 @@
 """Main FastAPI application."""
 
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Literal, Optional
 from sqlalchemy.orm import Session
+import asyncio
 import os
+import tempfile
 from pathlib import Path
 
-from app.db import init_db, get_db
-from app.database import DatabaseService
+from app.db import init_db, get_db, SessionLocal
+from app.changelog import changelog
+from app.database import DatabaseService, HistoryUnavailable, SESSION_FIELDS
+from app.documents import documents, run_document_flusher, DOCUMENT_FLUSH_INTERVAL_SECONDS
 from app.executor import execute_code
+from app.history import iter_history_ndjson, to_utc_naive
+from app.serialization import FastJSONResponse, FAST_JSON_RESPONSES
+from app.compression import CompressionMiddleware
+from app.idempotency import IdempotencyMiddleware
+from app.metrics import MetricsMiddleware, install_db_metrics, render_metrics
+from app.tracing import SQLTracingMiddleware, install_sql_tracing
+from app.admin import require_admin
+from app.archive import (
+    ARCHIVE_MEDIA_TYPE,
+    IMPORT_SPOOL_BYTES,
+    import_archive,
+    iter_archive_records,
+    iter_gzip_jsonl,
+    read_archive,
+)
+from app import awareness, diagnostics, profiler, wire
+from app.rate_limit import CODE_UPDATE_LIMIT, EXECUTE_LIMIT, limiter
+from app.reaper import run_reaper, REAPER_INTERVAL_SECONDS
+from app.static_assets import StaticAssetIndex
+from app.search import SEARCH_INDEX_INTERVAL_SECONDS, index_pending, run_search_indexer, search_code
 from app.models import (
     CreateSessionRequest,
     CreateSessionResponse,
@@ -20,17 +46,70 @@ from app.models import (
     ExecuteCodeRequest,
     LeaveSessionRequest,
     DefaultCodeResponse,
+    CodeSnapshotResponse,
+    BatchCreateSessionsRequest,
+    BatchCreateSessionsResponse,
+    SessionLookupRequest,
+    SessionLookupResponse,
+    AwarenessUpdateRequest,
+    AwarenessResponse,
+    ApplyOpsRequest,
+    ApplyOpsResponse,
+    SessionStatsResponse,
+    SearchResponse,
+    MAX_SEARCH_LIMIT,
+    StatsSummaryResponse,
+    InterviewSession,
+    ExecutionResult,
+    ChangesResponse,
+    SupportedLanguage,
+    DiagnosticsResponse,
 )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager."""
-    # Startup: initialize database (skip in test mode)
+    # Startup: initialize database and start the reaper (skip in test mode)
+    reaper_task = None
+    flusher_task = None
+    indexer_task = None
     if not os.getenv("TESTING"):
         init_db()
+        if REAPER_INTERVAL_SECONDS > 0:
+            reaper_task = asyncio.create_task(run_reaper(REAPER_INTERVAL_SECONDS))
+        if DOCUMENT_FLUSH_INTERVAL_SECONDS > 0:
+            flusher_task = asyncio.create_task(run_document_flusher(DOCUMENT_FLUSH_INTERVAL_SECONDS))
+        if SEARCH_INDEX_INTERVAL_SECONDS > 0:
+            indexer_task = asyncio.create_task(run_search_indexer(SEARCH_INDEX_INTERVAL_SECONDS))
     yield
-    # Shutdown
+    # Shutdown: stop background tasks, then write back live documents and
+    # index what is still queued (including the documents just written)
+    if reaper_task is not None:
+        reaper_task.cancel()
+    if flusher_task is not None:
+        flusher_task.cancel()
+        await asyncio.to_thread(_flush_documents)
+    if indexer_task is not None:
+        indexer_task.cancel()
+    if not os.getenv("TESTING"):
+        await asyncio.to_thread(_index_pending)
+
+
+def _flush_documents() -> None:
+    db = SessionLocal()
+    try:
+        documents.flush(db)
+    finally:
+        db.close()
+
+
+def _index_pending() -> None:
+    db = SessionLocal()
+    try:
+        index_pending(db)
+    finally:
+        db.close()
 
 
 app = FastAPI(
@@ -49,8 +128,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files (frontend build) if they exist - mount at end
+# Attribute SQL statements to requests: slow-query log, N+1 warnings, Server-Timing
+app.add_middleware(SQLTracingMiddleware)
+install_sql_tracing()
+
+# Lets an armed request profile sample matching requests; no-op otherwise
+app.add_middleware(profiler.ProfilerMiddleware)
+
+# Replay responses to retried POSTs carrying an Idempotency-Key
+app.add_middleware(IdempotencyMiddleware)
+
+# Compress large API payloads; inside metrics so sizes are recorded as sent
+app.add_middleware(CompressionMiddleware)
+
+# Record per-route latency and SQL timings (outermost, so it sees everything)
+app.add_middleware(MetricsMiddleware)
+install_db_metrics()
+
+# Index the frontend build once; requests are then served from memory
 static_dir = Path(__file__).parent / "static"
+static_assets = StaticAssetIndex.build(static_dir)
 
 
 @app.post("/sessions", response_model=CreateSessionResponse, status_code=201)
@@ -59,21 +156,67 @@ async def create_session(request: Request, body: CreateSessionRequest, db: Sessi
     base_url = f"{request.url.scheme}://{request.url.netloc}"
     service = DatabaseService(db)
     session_id, share_link = service.create_session(body.hostName, base_url)
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse({"sessionId": session_id, "shareLink": share_link}, status_code=201)
     return CreateSessionResponse(sessionId=session_id, shareLink=share_link)
 
 
+@app.post("/sessions/batch", response_model=BatchCreateSessionsResponse, status_code=201)
+async def create_sessions_batch(request: Request, body: BatchCreateSessionsRequest, db: Session = Depends(get_db)):
+    """Create many interview sessions in one transaction."""
+    base_url = f"{request.url.scheme}://{request.url.netloc}"
+    service = DatabaseService(db)
+    created = service.create_sessions([item.hostName for item in body.sessions], base_url)
+    sessions = [{"sessionId": session_id, "shareLink": share_link} for session_id, share_link in created]
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse({"sessions": sessions}, status_code=201)
+    return BatchCreateSessionsResponse(sessions=sessions)
+
+
+@app.post("/sessions/lookup", response_model=SessionLookupResponse)
+async def lookup_sessions(body: SessionLookupRequest, db: Session = Depends(get_db)):
+    """Get summaries of many sessions with a single query."""
+    service = DatabaseService(db)
+    sessions = service.lookup_sessions(body.sessionIds)
+    found = {session["id"] for session in sessions}
+    missing = [session_id for session_id in dict.fromkeys(body.sessionIds) if session_id not in found]
+    return SessionLookupResponse(sessions=sessions, missing=missing)
+
+
 @app.get("/sessions/{session_id}", status_code=200)
-async def get_session(session_id: str, db: Session = Depends(get_db)):
-    """Get session details."""
+async def get_session(
+    session_id: str, request: Request, fields: Optional[str] = None, db: Session = Depends(get_db)
+):
+    """Get session details.
+
+    `fields` is a comma-separated subset of the session fields, e.g.
+    `participants` or `code,language`; `id` is always included.
+    """
+    requested = None
+    if fields is not None:
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested.difference(SESSION_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
     service = DatabaseService(db)
-    session = service.get_session(session_id)
+    session = service.get_session(session_id, requested)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+    if "code" in session:
+        live = documents.snapshot(session_id)
+        if live is not None:
+            session["code"] = live["code"]
+    if wire.wants_msgpack(request.headers.get("accept"), len(session.get("code") or "")):
+        return wire.MsgPackResponse(InterviewSession, session)
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(session)
     return session
 
 
 @app.post("/sessions/{session_id}/join", response_model=JoinSessionResponse)
-async def join_session(session_id: str, body: JoinSessionRequest, db: Session = Depends(get_db)):
+async def join_session(
+    session_id: str, body: JoinSessionRequest, request: Request, db: Session = Depends(get_db)
+):
     """Join an existing session."""
     service = DatabaseService(db)
     result = service.join_session(session_id, body.userName)
@@ -81,30 +224,173 @@ async def join_session(session_id: str, body: JoinSessionRequest, db: Session =
         raise HTTPException(status_code=404, detail="Session not found")
 
     session, user_id = result
+    live = documents.snapshot(session_id)
+    if live is not None:
+        session["code"] = live["code"]
+    if wire.wants_msgpack(request.headers.get("accept"), len(session["code"])):
+        return wire.MsgPackResponse(JoinSessionResponse, {"session": session, "userId": user_id})
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse({"session": session, "userId": user_id})
     return JoinSessionResponse(session=session, userId=user_id)
 
 
 @app.patch("/sessions/{session_id}/code", status_code=204)
 async def update_code(session_id: str, body: UpdateCodeRequest, db: Session = Depends(get_db)):
     """Update session code."""
+    limiter.check(CODE_UPDATE_LIMIT, session_id, body.userId)
     service = DatabaseService(db)
-    success = service.update_code(session_id, body.code, body.language)
-    if not success:
+    # Whole-text updates continue from the live document's edits, if any
+    if session_id in documents:
+        documents.flush(db, [session_id])
+        documents.discard(session_id)
+    version = service.update_code(session_id, body.code, body.language, body.userId)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    changelog.record(session_id, version, body.userId, body.code, body.language, datetime.utcnow())
+
+
+@app.get("/sessions/{session_id}/changes", response_model=ChangesResponse)
+async def get_changes(session_id: str, last_version: int = -1, db: Session = Depends(get_db)):
+    """Changes since `last_version`, served from memory when still buffered.
+
+    Falls back to a snapshot of the current code when the client is further
+    behind than the buffer reaches (or passes no version at all).
+    """
+    buffered = changelog.changes_since(session_id, last_version)
+    if buffered is not None:
+        version, changes = buffered
+        if FAST_JSON_RESPONSES:
+            return FastJSONResponse({"version": version, "changes": changes, "snapshot": None})
+        return ChangesResponse(version=version, changes=changes)
+
+    current = documents.snapshot(session_id)
+    if current is None:
+        current = DatabaseService(db).get_versioned_code(session_id)
+    if current is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    changelog.seed(session_id, current["version"], current["code"], current["language"])
+    snapshot = {"code": current["code"], "language": current["language"]}
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse({"version": current["version"], "changes": [], "snapshot": snapshot})
+    return ChangesResponse(version=current["version"], snapshot=snapshot)
+
+
+@app.post("/sessions/{session_id}/ops", response_model=ApplyOpsResponse)
+async def apply_ops(session_id: str, body: ApplyOpsRequest, db: Session = Depends(get_db)):
+    """Apply ranged edits to the session's live document.
+
+    Edits land in memory and are written to the session code on the next
+    flush. Pass `baseVersion` to get a 409 instead of editing a document
+    that changed since the client last saw it.
+    """
+    limiter.check(CODE_UPDATE_LIMIT, session_id, body.userId)
+    service = DatabaseService(db)
+    result = documents.apply(
+        session_id, body.ops, body.userId, body.baseVersion, lambda: service.get_versioned_code(session_id)
+    )
+    if result is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    now = datetime.utcnow()
+    for version, edit in result["edits"]:
+        changelog.record_edit(session_id, version, body.userId, result["language"], now, edit)
+    state = {"version": result["version"], "length": result["length"], "lineCount": result["lineCount"]}
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(state)
+    return ApplyOpsResponse(**state)
+
+
+@app.get("/sessions/{session_id}/diagnostics", response_model=DiagnosticsResponse)
+async def get_diagnostics(session_id: str, db: Session = Depends(get_db)):
+    """Syntax diagnostics of the session's current code.
+
+    Meant to be polled: while the session version is unchanged the result
+    is served from memory after a single version lookup.
+    """
+    current = documents.snapshot(session_id)
+    version = current["version"] if current is not None else DatabaseService(db).get_version(session_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
+    cached = diagnostics.cache.for_version(session_id, version)
+    if cached is not None:
+        language, found = cached
+    else:
+        if current is None:
+            current = DatabaseService(db).get_versioned_code(session_id)
+            if current is None:
+                raise HTTPException(status_code=404, detail="Session not found")
+        version, language = current["version"], current["language"]
+        found = diagnostics.cache.check(session_id, version, language, current["code"])
+
+    result = {"version": version, "language": language, "diagnostics": found}
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(result)
+    return result
+
 
 @app.post("/sessions/{session_id}/execute")
-async def execute_code_endpoint(session_id: str, body: ExecuteCodeRequest, db: Session = Depends(get_db)):
+async def execute_code_endpoint(
+    session_id: str, body: ExecuteCodeRequest, request: Request, db: Session = Depends(get_db)
+):
     """Execute code in a safe sandbox."""
+    limiter.check(EXECUTE_LIMIT, session_id)
     service = DatabaseService(db)
-    session = service.get_session(session_id)
-    if not session:
+    if not service.session_exists(session_id):
         raise HTTPException(status_code=404, detail="Session not found")
 
     result = await execute_code(body.code, body.language)
+    service.record_run(session_id, result.success)
+    if wire.wants_msgpack(request.headers.get("accept"), len(result.output or "") + len(result.error or "")):
+        return wire.MsgPackResponse(ExecutionResult, result)
     return result
 
 
+@app.get("/sessions/{session_id}/stats", response_model=SessionStatsResponse)
+async def get_session_stats(
+    session_id: str, window: int = Query(default=0, ge=0, le=1440), db: Session = Depends(get_db)
+):
+    """Activity counters of a session, plus per-minute buckets for the last `window` minutes."""
+    service = DatabaseService(db)
+    stats = service.get_session_stats(session_id, timedelta(minutes=window))
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(stats)
+    return stats
+
+
+@app.get("/stats/sessions", response_model=StatsSummaryResponse)
+async def get_stats_summary(
+    since: Optional[datetime] = None, until: Optional[datetime] = None, db: Session = Depends(get_db)
+):
+    """Activity totals across the sessions created in [`since`, `until`)."""
+    service = DatabaseService(db)
+    summary = service.summarize_stats(to_utc_naive(since), to_utc_naive(until))
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(summary)
+    return summary
+
+
+@app.get("/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(min_length=1, max_length=200),
+    language: Optional[SupportedLanguage] = None,
+    limit: int = Query(default=20, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(default=0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """Sessions whose current code contains every word of `q` (as a prefix), best match first.
+
+    Read-only: edits reach the index through the background indexer, so
+    results may lag behind them by up to SEARCH_INDEX_INTERVAL_SECONDS.
+    """
+    page = search_code(db, q, language, limit, offset)
+    page.update(limit=limit, offset=offset)
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(page)
+    return page
+
+
 @app.post("/sessions/{session_id}/leave", status_code=204)
 async def leave_session(session_id: str, body: LeaveSessionRequest, db: Session = Depends(get_db)):
     """Leave a session."""
@@ -112,15 +398,94 @@ async def leave_session(session_id: str, body: LeaveSessionRequest, db: Session
     success = service.leave_session(session_id, body.userId)
     if not success:
         raise HTTPException(status_code=404, detail="Session not found")
+    awareness.hub.remove_user(session_id, body.userId)
 
 
 @app.post("/sessions/{session_id}/end", status_code=204)
 async def end_session(session_id: str, db: Session = Depends(get_db)):
     """End a session (host only)."""
     service = DatabaseService(db)
+    documents.flush(db, [session_id])
     success = service.end_session(session_id)
     if not success:
         raise HTTPException(status_code=404, detail="Session not found")
+    documents.discard(session_id)
+    awareness.hub.evict(session_id)
+    diagnostics.cache.evict(session_id)
+    changelog.evict(session_id)
+    limiter.evict(session_id)
+
+
+@app.get("/wire/schema")
+async def get_wire_schema():
+    """Field order of the models sent positionally as MessagePack."""
+    return wire.wire_schema()
+
+
+@app.put("/sessions/{session_id}/awareness", status_code=204)
+async def update_awareness(session_id: str, body: AwarenessUpdateRequest, db: Session = Depends(get_db)):
+    """Publish a user's cursor/selection; kept in memory only."""
+    # Users with a live state were checked already; leaving or ending the session drops it
+    if not awareness.hub.has_user(session_id, body.userId):
+        participant = DatabaseService(db).is_participant(session_id, body.userId)
+        if participant is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        if not participant:
+            raise HTTPException(status_code=403, detail="User is not a participant of this session")
+    awareness.hub.update(session_id, body.userId, body.selection)
+
+
+@app.get("/sessions/{session_id}/awareness", response_model=AwarenessResponse)
+async def get_awareness(session_id: str, request: Request, since: int = 0):
+    """Latest cursor/selection per user changed after the `since` cursor."""
+    cursor, states, removed = awareness.hub.changes(session_id, since)
+    if wire.wants_msgpack(request.headers.get("accept")):
+        return wire.MsgPackResponse(AwarenessResponse, {"cursor": cursor, "states": states, "removed": removed})
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse({"cursor": cursor, "states": states, "removed": removed})
+    return AwarenessResponse(cursor=cursor, states=states, removed=removed)
+
+
+@app.get("/sessions/{session_id}/history")
+async def get_session_history(
+    session_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    diff: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Stream the session's code history as NDJSON, oldest first.
+
+    With `diff`, changes after the first carry a splice against their
+    predecessor; its offsets count UTF-16 code units, as in /changes.
+    """
+    service = DatabaseService(db)
+    if not service.session_exists(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    changes = service.iter_code_changes(
+        session_id, since=to_utc_naive(since), until=to_utc_naive(until)
+    )
+    return StreamingResponse(
+        iter_history_ndjson(changes, diffs=diff),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.get("/sessions/{session_id}/snapshot", response_model=CodeSnapshotResponse)
+async def get_session_snapshot(session_id: str, at: datetime, db: Session = Depends(get_db)):
+    """Get the session's code as it was at a point in time."""
+    at = to_utc_naive(at)
+    service = DatabaseService(db)
+    try:
+        snapshot = service.get_code_at(session_id, at)
+    except HistoryUnavailable:
+        raise HTTPException(status_code=410, detail="Session history is no longer available")
+    if snapshot is None:
+        if not service.session_exists(session_id):
+            raise HTTPException(status_code=404, detail="Session not found")
+        raise HTTPException(status_code=404, detail="Session did not exist at that time")
+    return CodeSnapshotResponse(sessionId=session_id, at=at, **snapshot)
 
 
 @app.get("/default-code", response_model=DefaultCodeResponse)
@@ -144,46 +509,119 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this worker."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def _profile_response(sampler, name: str, format: str):
+    if format == "collapsed":
+        return PlainTextResponse(profiler.to_collapsed(sampler.samples))
+    return profiler.to_speedscope(sampler.samples, name, sampler.interval)
+
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_worker(seconds: float = 10.0, format: Literal["speedscope", "collapsed"] = "speedscope"):
+    """Sample this worker for a number of seconds (admin only)."""
+    try:
+        sampler = await profiler.profile_for(seconds)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _profile_response(sampler, f"worker {os.getpid()} for {seconds}s", format)
+
+
+@app.post("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def profile_requests(
+    route: str,
+    count: int = 10,
+    method: Optional[str] = None,
+    timeout: float = 60.0,
+    format: Literal["speedscope", "collapsed"] = "speedscope",
+):
+    """Sample the next `count` requests matching a route template (admin only)."""
+    try:
+        sampler, profiled = await profiler.profile_requests(route, count, method=method, timeout=timeout)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _profile_response(sampler, f"{profiled} requests to {route}", format)
+
+
+@app.get("/admin/export", dependencies=[Depends(require_admin)])
+async def export_sessions(
+    ids: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """Stream sessions, participants and history as a gzip JSONL archive.
+
+    Select sessions by comma-separated `ids` and/or a createdAt range
+    [`since`, `until`).
+    """
+    session_ids = [item for item in ids.split(",") if item] if ids else None
+    records = iter_archive_records(db, session_ids, to_utc_naive(since), to_utc_naive(until))
+    return StreamingResponse(
+        iter_gzip_jsonl(records),
+        media_type=ARCHIVE_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="sessions.jsonl.gz"'},
+    )
+
+
+@app.post("/admin/import", dependencies=[Depends(require_admin)])
+async def import_sessions(request: Request, db: Session = Depends(get_db)):
+    """Load a gzip JSONL archive from /admin/export sent as the request body.
+
+    The body is spooled to a temporary file, so large archives do not sit
+    in memory. Sessions that already exist are skipped.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as archive:
+        async for chunk in request.stream():
+            archive.write(chunk)
+        archive.seek(0)
+        try:
+            return await asyncio.to_thread(import_archive, db, read_archive(archive))
+        except (ValueError, KeyError, OSError) as exc:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=f"Invalid archive: {exc}")
+
+
 # Root route: serve index.html for SPA
 @app.get("/")
-async def serve_index():
+async def serve_index(request: Request):
     """Serve the SPA index.html at the root."""
-    # Redirect to the explicit static path
-    static_index = Path(__file__).parent / "static" / "index.html"
-    if static_index.exists():
-        return FileResponse(static_index)
+    index = static_assets.index
+    if index is not None:
+        return index.response(request.headers)
     return {"detail": "Not Found"}
 
-# Also mount the static directory at /static for direct file access
-from fastapi.staticfiles import StaticFiles
-static_dir = Path(__file__).parent / "static"
-if static_dir.exists():
-    app.mount("/static", StaticFiles(directory=static_dir), name="static-files")
+
+# Also serve the static directory at /static for direct file access
+@app.get("/static/{file_path:path}")
+async def serve_static(file_path: str, request: Request):
+    """Serve a file from the static directory."""
+    asset = static_assets.get(file_path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return asset.response(request.headers)
 
 
 # Catch-all route: serve index.html for all non-API routes (SPA support)
 @app.get("/{full_path:path}")
-async def serve_frontend(full_path: str):
+async def serve_frontend(full_path: str, request: Request):
     """Serve frontend static files, falling back to index.html for SPA routing."""
-    static_dir_path = Path(__file__).parent / "static"
-    static_index = static_dir_path / "index.html"
-    
-    # For paths without extension, serve index.html
-    if "." not in full_path.split("/")[-1]:
-        if static_index.exists():
-            return FileResponse(static_index)
-    else:
-        # Try to serve the actual file if it has an extension
-        file_path = static_dir_path / full_path
-        if file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
-    
-    # Fallback: if file doesn't exist, try index.html (SPA routing)
-    if static_index.exists():
-        return FileResponse(static_index)
-    
-    return {"detail": "Not Found"}
+    # Only paths with an extension can name an actual file
+    if "." in full_path.split("/")[-1]:
+        asset = static_assets.get(full_path)
+        if asset is not None:
+            return asset.response(request.headers)
+
+    # Fallback: serve index.html (SPA routing)
+    index = static_assets.index
+    if index is not None:
+        return index.response(request.headers)
 
+    return {"detail": "Not Found"}
 
 if __name__ == "__main__":
     import uvicorn
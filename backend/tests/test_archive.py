@@ -0,0 +1,133 @@
+"""Tests for streaming session export and import."""
+
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import admin
+from app.archive import import_archive, iter_archive_records, iter_gzip_jsonl
+from app.db import Base
+
+TOKEN = "test-admin-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", TOKEN)
+
+
+def _seed(client: TestClient, versions: int) -> str:
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    client.post(f"/sessions/{session_id}/join", json={"userName": "Candidate"})
+    for i in range(versions):
+        client.patch(
+            f"/sessions/{session_id}/code",
+            json={"userId": "candidate", "code": f"print({i})\n" * (i + 1), "language": "python"},
+        )
+    return session_id
+
+
+def _state(client: TestClient, session_id: str) -> dict:
+    session = client.get(f"/sessions/{session_id}").json()
+    for participant in session["participants"]:
+        participant.pop("joinedAt")
+    history = [
+        {key: value for key, value in json.loads(line).items() if key != "id"}
+        for line in client.get(f"/sessions/{session_id}/history").text.splitlines()
+    ]
+    stats = client.get(f"/sessions/{session_id}/stats").json()
+    return {"session": session, "history": history, "stats": stats}
+
+
+def _clear(db) -> None:
+    for table in reversed(Base.metadata.sorted_tables):
+        db.execute(text(f"DELETE FROM {table.name}"))
+    db.commit()
+
+
+def test_export_import_round_trip(client: TestClient, test_db):
+    """Test an exported archive restores sessions, participants, stats and history."""
+    first, second = _seed(client, 3), _seed(client, 5)
+    client.post(f"/sessions/{first}/execute", json={"code": "print(1)", "language": "python"})
+    before = {session_id: _state(client, session_id) for session_id in (first, second)}
+
+    response = client.get("/admin/export", headers=AUTH)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    records = [json.loads(line) for line in gzip.decompress(response.content).splitlines()]
+    assert [r["type"] for r in records].count("session") == 2
+    assert [r["type"] for r in records].count("stats") == 2
+    assert sum("diff" in r for r in records) == 6
+
+    _clear(test_db)
+    imported = client.post("/admin/import", headers=AUTH, content=response.content)
+    assert imported.json() == {"sessions": 2, "users": 4, "changes": 8, "skipped": 0}
+    assert {session_id: _state(client, session_id) for session_id in (first, second)} == before
+
+    again = client.post("/admin/import", headers=AUTH, content=response.content)
+    assert again.json() == {"sessions": 0, "users": 0, "changes": 0, "skipped": 2}
+
+
+def test_export_selection_and_batches(client: TestClient, test_db):
+    """Test sessions are selected by id and import batches stay consistent."""
+    keep, _ = _seed(client, 4), _seed(client, 2)
+    archive = b"".join(iter_gzip_jsonl(iter_archive_records(test_db, [keep], page_size=1)))
+    lines = gzip.decompress(archive).splitlines()
+    assert {json.loads(line)["sessionId"] for line in lines[1:]} == {keep}
+    before = _state(client, keep)
+
+    _clear(test_db)
+    counts = import_archive(test_db, lines, batch_size=2)
+    assert counts == {"sessions": 1, "users": 2, "changes": 4, "skipped": 0}
+    assert _state(client, keep) == before
+
+
+def test_import_rejects_bad_archives(client: TestClient):
+    """Test malformed archives and missing tokens are refused."""
+    assert client.get("/admin/export", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.post("/admin/import", headers=AUTH, content=b"not gzip")
+    assert response.status_code == 400
+    orphan = gzip.compress(b'{"type": "change", "sessionId": "x"}\n')
+    assert client.post("/admin/import", headers=AUTH, content=orphan).status_code == 400
+
+
+def test_failed_import_leaves_no_partial_session(client: TestClient, test_db):
+    """Test an import failing mid-session rolls that session back, so a rerun completes it."""
+    first, second = _seed(client, 2), _seed(client, 3)
+    before = {session_id: _state(client, session_id) for session_id in (first, second)}
+    lines = gzip.decompress(b"".join(iter_gzip_jsonl(iter_archive_records(test_db)))).splitlines()
+    # Replace the last change of the second session with a bad record
+    last_session = json.loads(lines[-1])["sessionId"]
+    broken = lines[:-1] + [json.dumps({"type": "bogus", "sessionId": last_session}).encode()]
+
+    _clear(test_db)
+    with pytest.raises(ValueError):
+        import_archive(test_db, broken, batch_size=1)
+    imported = {row[0] for row in test_db.execute(text("SELECT id FROM sessions"))}
+    assert len(imported) == 1
+    [done] = imported
+    assert test_db.execute(text("SELECT COUNT(*) FROM code_changes WHERE session_id != :id"), {"id": done}).scalar() == 0
+
+    counts = import_archive(test_db, lines, batch_size=1)
+    assert counts["sessions"] == 1 and counts["skipped"] == 1
+    assert {session_id: _state(client, session_id) for session_id in (first, second)} == before
+
+
+def test_export_queries_do_not_grow_with_sessions(client: TestClient, test_db):
+    """Test history is read per page of sessions, not once per session."""
+    from app import tracing
+
+    for _ in range(6):
+        _seed(client, 2)
+    trace = tracing.RequestTrace()
+    token = tracing._current_trace.set(trace)
+    try:
+        records = list(iter_archive_records(test_db, page_size=3, change_page_size=4))
+    finally:
+        tracing._current_trace.reset(token)
+    assert sum(r["type"] == "change" for r in records) == 12
+    assert trace.repeated_statements(threshold=4) == []
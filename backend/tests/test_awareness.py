@@ -0,0 +1,121 @@
+"""Tests for the ephemeral cursor/selection awareness channel."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import awareness
+from app.awareness import AwarenessHub
+from app.reaper import _run_eviction_hooks
+
+
+@pytest.fixture(autouse=True)
+def fresh_hub(monkeypatch):
+    monkeypatch.setattr(awareness, "hub", AwarenessHub())
+
+
+def _session_with_users(client: TestClient, count: int):
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    users = [
+        client.post(f"/sessions/{session_id}/join", json={"userName": f"U{i}"}).json()["userId"]
+        for i in range(count)
+    ]
+    return session_id, users
+
+
+def test_latest_state_per_user(client: TestClient):
+    """Test rapid updates coalesce into the latest selection per user."""
+    session_id, (alice, bob) = _session_with_users(client, 2)
+    url = f"/sessions/{session_id}/awareness"
+    for column in range(20):
+        body = {"userId": alice, "selection": [3, column, 3, column]}
+        assert client.put(url, json=body).status_code == 204
+    client.put(url, json={"userId": bob, "selection": [1, 0, 2, 4]})
+
+    data = client.get(url).json()
+    assert data["states"] == [[alice, 3, 19, 3, 19], [bob, 1, 0, 2, 4]]
+    assert data["removed"] == []
+
+    cursor = data["cursor"]
+    assert client.get(f"{url}?since={cursor}").json()["states"] == []
+    client.put(url, json={"userId": bob, "selection": [2, 0, 2, 0]})
+    assert client.get(f"{url}?since={cursor}").json()["states"] == [[bob, 2, 0, 2, 0]]
+
+
+def test_updates_need_a_participant(client: TestClient):
+    """Test unknown sessions get 404 and users outside the session 403."""
+    session_id, _ = _session_with_users(client, 1)
+    body = {"userId": "someone", "selection": [0, 0, 0, 0]}
+
+    assert client.put("/sessions/missing/awareness", json=body).status_code == 404
+    assert client.put(f"/sessions/{session_id}/awareness", json=body).status_code == 403
+    assert client.get(f"/sessions/{session_id}/awareness").json()["states"] == []
+
+
+def test_left_users_are_rejected(client: TestClient):
+    """Test a user who left can no longer publish a state."""
+    session_id, (user_id,) = _session_with_users(client, 1)
+    body = {"userId": user_id, "selection": [0, 0, 0, 0]}
+    assert client.put(f"/sessions/{session_id}/awareness", json=body).status_code == 204
+
+    client.post(f"/sessions/{session_id}/leave", json={"userId": user_id})
+    assert client.put(f"/sessions/{session_id}/awareness", json=body).status_code == 403
+
+
+def test_steady_traffic_never_touches_the_database(client: TestClient, monkeypatch):
+    """Test only a user's first update runs SQL, to check membership."""
+    from app import tracing
+
+    session_id, (user_id,) = _session_with_users(client, 1)
+    monkeypatch.setattr(tracing, "SERVER_TIMING", True)
+    url = f"/sessions/{session_id}/awareness"
+    response = client.put(url, json={"userId": user_id, "selection": [0, 0, 0, 0]})
+    assert not response.headers["server-timing"].endswith('desc="0 queries"')
+    response = client.put(url, json={"userId": user_id, "selection": [0, 1, 0, 1]})
+    assert response.headers["server-timing"].endswith('desc="0 queries"')
+    response = client.get(url)
+    assert response.headers["server-timing"].endswith('desc="0 queries"')
+
+
+def test_leave_removes_user(client: TestClient):
+    """Test a user leaving the session is reported as removed."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    user_id = client.post(f"/sessions/{session_id}/join", json={"userName": "C"}).json()["userId"]
+    client.put(f"/sessions/{session_id}/awareness", json={"userId": user_id, "selection": [1, 1, 1, 1]})
+    cursor = client.get(f"/sessions/{session_id}/awareness").json()["cursor"]
+
+    client.post(f"/sessions/{session_id}/leave", json={"userId": user_id})
+    data = client.get(f"/sessions/{session_id}/awareness?since={cursor}").json()
+    assert data["removed"] == [user_id]
+    assert data["states"] == []
+
+
+def test_memory_bounds(monkeypatch):
+    """Test per-session users, tracked sessions and silent users are all bounded."""
+    monkeypatch.setattr(awareness, "MAX_USERS_PER_SESSION", 2)
+    monkeypatch.setattr(awareness, "MAX_SESSIONS", 2)
+    clock = [0.0]
+    monkeypatch.setattr(awareness.time, "monotonic", lambda: clock[0])
+    hub = AwarenessHub()
+
+    for i, user in enumerate(("a", "b", "c")):
+        clock[0] = i
+        hub.update("s1", user, (0, 0, 0, 0))
+    _, states, removed = hub.changes("s1")
+    assert [s[0] for s in states] == ["b", "c"]
+    assert removed == ["a"]
+
+    hub.update("s2", "a", (0, 0, 0, 0))
+    hub.update("s3", "a", (0, 0, 0, 0))
+    assert len(hub) == 2
+    assert hub.changes("s1") == (0, [], [])
+
+    clock[0] = 100
+    _, states, removed = hub.changes("s3")
+    assert states == [] and removed == ["a"]
+
+
+def test_reaped_sessions_are_evicted():
+    """Test the reaper eviction hook drops a session's awareness."""
+    awareness.hub.update("reaped", "a", (0, 0, 0, 0))
+    _run_eviction_hooks("reaped")
+    assert len(awareness.hub) == 0
@@ -0,0 +1,148 @@
+"""Tests for versioned changes and reconnect resume."""
+
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import changelog as changelog_module
+from app.changelog import ChangeLog
+from app.history import apply_diff
+from app.reaper import _run_eviction_hooks
+
+
+@pytest.fixture(autouse=True)
+def fresh_changelog(monkeypatch):
+    log = ChangeLog()
+    monkeypatch.setattr(changelog_module, "changelog", log)
+    monkeypatch.setattr("main.changelog", log)
+    return log
+
+
+def _update(client: TestClient, session_id: str, code: str, user_id: str = "alice"):
+    response = client.patch(
+        f"/sessions/{session_id}/code", json={"userId": user_id, "code": code, "language": "python"}
+    )
+    assert response.status_code == 204
+
+
+def _replay(code: str, changes) -> str:
+    for change in changes:
+        code = apply_diff(code, change["edit"])
+    return code
+
+
+def _replay_utf16(code: str, changes) -> str:
+    """Apply splices the way JavaScript `slice` does, in UTF-16 code units."""
+    units = code.encode("utf-16-le")
+    for change in changes:
+        edit = change["edit"]
+        units = units[: edit["start"] * 2] + edit["text"].encode("utf-16-le") + units[edit["end"] * 2 :]
+    return units.decode("utf-16-le")
+
+
+def test_resume_from_buffer(client: TestClient, monkeypatch):
+    """Test a client gets only the changes after its version, without SQL."""
+    from app import tracing
+
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    start = client.get(f"/sessions/{session_id}/changes").json()
+    assert start["version"] == 0
+    assert start["snapshot"]["language"] == "javascript"
+
+    _update(client, session_id, "x = 1\n")
+    _update(client, session_id, "x = 1\ny = 2\n", user_id="bob")
+    _update(client, session_id, "x = 1\ny = 2\n")  # no-op, no new version
+
+    monkeypatch.setattr(tracing, "SERVER_TIMING", True)
+    response = client.get(f"/sessions/{session_id}/changes?last_version=0")
+    assert response.headers["server-timing"].endswith('desc="0 queries"')
+    data = response.json()
+    assert data["version"] == 2
+    assert data["snapshot"] is None
+    assert [(c["version"], c["userId"]) for c in data["changes"]] == [(1, "alice"), (2, "bob")]
+    assert _replay(start["snapshot"]["code"], data["changes"]) == "x = 1\ny = 2\n"
+
+    data = client.get(f"/sessions/{session_id}/changes?last_version=1").json()
+    assert [c["version"] for c in data["changes"]] == [2]
+    assert data["changes"][0]["edit"] == {"start": 6, "end": 6, "text": "y = 2\n"}
+
+    assert client.get(f"/sessions/{session_id}/changes?last_version=2").json()["changes"] == []
+
+
+def test_offsets_count_utf16_code_units(client: TestClient):
+    """Test splices after characters outside the BMP still apply in a browser."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    _update(client, session_id, "s = '😀'\nx = 1\n")
+    start = client.get(f"/sessions/{session_id}/changes").json()
+    _update(client, session_id, "s = '😀😀'\nx = 2\n")
+    _update(client, session_id, "s = '😀😀'\ny = 2 # é\n")
+    data = client.get(f"/sessions/{session_id}/changes?last_version={start['version']}").json()
+    assert data["changes"][0]["edit"]["start"] == 7
+    assert _replay_utf16(start["snapshot"]["code"], data["changes"]) == "s = '😀😀'\ny = 2 # é\n"
+
+
+def test_snapshot_when_gap_exceeds_buffer(client: TestClient, monkeypatch):
+    """Test clients further behind than the buffer get a full snapshot."""
+    monkeypatch.setattr(changelog_module, "CHANGE_BUFFER_SIZE", 3)
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    client.get(f"/sessions/{session_id}/changes")
+    for i in range(6):
+        _update(client, session_id, f"x = {i}\n")
+
+    data = client.get(f"/sessions/{session_id}/changes?last_version=1").json()
+    assert data["version"] == 6
+    assert data["snapshot"] == {"code": "x = 5\n", "language": "python"}
+
+    data = client.get(f"/sessions/{session_id}/changes?last_version=3").json()
+    assert [c["version"] for c in data["changes"]] == [4, 5, 6]
+
+    assert client.get("/sessions/missing/changes?last_version=0").status_code == 404
+
+
+def test_cold_buffer_restarts_without_holes(fresh_changelog):
+    """Test a buffer never serves a sequence with a missing version."""
+    now = datetime.utcnow()
+    fresh_changelog.record("s", 5, "a", "v5", "python", now)
+    assert fresh_changelog.changes_since("s", 4) is None
+    assert fresh_changelog.changes_since("s", 5) == (5, [])
+
+    # Version 6 happened elsewhere; 7 cannot be diffed against 5
+    fresh_changelog.record("s", 7, "a", "v7", "python", now)
+    assert fresh_changelog.changes_since("s", 5) is None
+    assert fresh_changelog.changes_since("s", 7) == (7, [])
+
+
+def test_bounded_by_bytes_and_sessions(fresh_changelog, monkeypatch):
+    """Test splice text per session and the number of sessions are capped."""
+    monkeypatch.setattr(changelog_module, "CHANGE_BUFFER_MAX_BYTES", 100)
+    monkeypatch.setattr(changelog_module, "CHANGE_BUFFER_MAX_SESSIONS", 2)
+    now = datetime.utcnow()
+    fresh_changelog.seed("s", 0, "", "python")
+    for version in range(1, 6):
+        fresh_changelog.record("s", version, "a", "x" * 40 * version, "python", now)
+    version, changes = fresh_changelog.changes_since("s", 3)
+    assert version == 5 and len(changes) == 2
+    assert fresh_changelog.changes_since("s", 2) is None
+
+    fresh_changelog.seed("t", 0, "", "python")
+    fresh_changelog.seed("u", 0, "", "python")
+    assert len(fresh_changelog) == 2
+    assert fresh_changelog.changes_since("s", 5) is None
+
+
+def test_reaped_sessions_are_evicted(fresh_changelog):
+    """Test the reaper eviction hook drops a session's buffer."""
+    fresh_changelog.seed("reaped", 0, "", "python")
+    _run_eviction_hooks("reaped")
+    assert len(fresh_changelog) == 0
+
+
+def test_history_records_the_editing_user(client: TestClient, test_db):
+    """Test code_changes rows now carry the user who made the change."""
+    from app.orm_models import CodeChange
+
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    _update(client, session_id, "print(1)", user_id="candidate-1")
+    change = test_db.query(CodeChange).filter(CodeChange.session_id == session_id).one()
+    assert change.userId == "candidate-1"
@@ -0,0 +1,61 @@
+"""Tests for the compressed text column type."""
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import column_types
+from app.column_types import decode_text, encode_text
+from app.database import DatabaseService, DEFAULT_CODE
+
+
+LARGE = "def solution(values):\n    return sum(v for v in values if v > 0)  # ünïcode\n" * 200
+
+
+@pytest.mark.parametrize("codec", ["zlib", "zstd"])
+def test_roundtrip_compressed(codec: str):
+    """Test large values are compressed and decode byte-identically."""
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    encoded = encode_text(LARGE, codec, min_bytes=64)
+    assert len(encoded) < len(LARGE) / 4
+    assert decode_text(encoded) == LARGE
+
+
+def test_small_values_stay_raw():
+    """Test values under the threshold are stored unchanged."""
+    assert encode_text("x = 1", "zlib", min_bytes=64) == "x = 1"
+    assert encode_text(LARGE, "off", min_bytes=64) == LARGE
+
+
+def test_marker_prefixed_text_is_escaped():
+    """Test plain text starting with the marker survives a roundtrip."""
+    value = "\x1ez:not actually compressed"
+    encoded = encode_text(value, "off", min_bytes=64)
+    assert encoded != value
+    assert decode_text(encoded) == value
+
+
+def test_database_reads_are_identical(test_db: Session, monkeypatch):
+    """Test code written compressed reads back identically through the service."""
+    monkeypatch.setattr(column_types, "COMPRESSION_CODEC", "zlib")
+    monkeypatch.setattr(column_types, "COMPRESSION_MIN_BYTES", 64)
+    service = DatabaseService(test_db)
+    session_id, _ = service.create_session("Host", "http://test")
+    service.update_code(session_id, LARGE, "python")
+
+    stored = test_db.execute(
+        text(
+            "SELECT b.content FROM code_blobs b JOIN sessions s ON s.code_hash = b.hash"
+            " WHERE s.id = :id"
+        ),
+        {"id": session_id},
+    ).scalar()
+    assert stored.startswith("\x1ez:")
+    assert service.get_session(session_id)["code"] == LARGE
+    assert [c["content"] for c in service.iter_code_changes(session_id)] == [LARGE]
+
+    # Rows written before compression was enabled remain readable
+    monkeypatch.setattr(column_types, "COMPRESSION_CODEC", "off")
+    service.update_code(session_id, DEFAULT_CODE["python"], "python")
+    assert service.get_session(session_id)["code"] == DEFAULT_CODE["python"]
@@ -0,0 +1,102 @@
+"""Tests for negotiated response compression."""
+
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import accepted_encodings, choose_encoding
+from app.metrics import COMPRESSION_SAVED_BYTES, COMPRESSION_SKIPPED
+
+
+LARGE_CODE = "function add(a, b) {\n  return a + b;\n}\n" * 500
+
+
+def _session_with_code(client: TestClient, code: str) -> str:
+    session_id = client.post("/sessions", json={"hostName": "Alice"}).json()["sessionId"]
+    response = client.patch(
+        f"/sessions/{session_id}/code", json={"code": code, "language": "javascript", "userId": "u1"}
+    )
+    assert response.status_code == 204
+    return session_id
+
+
+def test_accept_encoding_negotiation():
+    """Test zstd is preferred, q=0 is honoured and unknown codings are ignored."""
+    pytest.importorskip("zstandard")
+    assert accepted_encodings("gzip, deflate;q=0.5, br;q=0") == {"gzip", "deflate"}
+    assert choose_encoding("gzip, zstd") == "zstd"
+    assert choose_encoding("gzip, zstd;q=0") == "gzip"
+    assert choose_encoding("br, identity") is None
+    assert choose_encoding("") is None
+
+
+def test_large_session_payload_is_compressed(client: TestClient):
+    """Test polling a session with a large buffer returns a compressed body."""
+    session_id = _session_with_code(client, LARGE_CODE)
+    saved_before = sum(COMPRESSION_SAVED_BYTES.values().values())
+
+    response = client.get(f"/sessions/{session_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(LARGE_CODE) // 10
+    assert response.json()["code"] == LARGE_CODE
+
+    assert sum(COMPRESSION_SAVED_BYTES.values().values()) > saved_before + len(LARGE_CODE) // 2
+
+
+def test_zstd_when_accepted(client: TestClient):
+    """Test zstd is used for clients that advertise it."""
+    pytest.importorskip("zstandard")
+    session_id = _session_with_code(client, LARGE_CODE)
+    response = client.get(f"/sessions/{session_id}", headers={"Accept-Encoding": "zstd, gzip"})
+    assert response.headers["content-encoding"] == "zstd"
+
+
+def test_raw_zstd_body_decodes(client: TestClient):
+    """Test the zstd body on the wire is a valid frame of the JSON payload."""
+    zstandard = pytest.importorskip("zstandard")
+    session_id = _session_with_code(client, LARGE_CODE)
+    with client.stream("GET", f"/sessions/{session_id}", headers={"Accept-Encoding": "zstd"}) as response:
+        raw = b"".join(response.iter_raw())
+    body = zstandard.ZstdDecompressor().decompress(raw, max_output_size=10**7)
+    assert json.loads(body)["code"] == LARGE_CODE
+
+
+def test_small_and_empty_responses_are_skipped(client: TestClient):
+    """Test tiny bodies and 204 responses are sent unchanged."""
+    skipped = COMPRESSION_SKIPPED.values()
+    small_before = skipped.get(("/sessions", "small"), 0)
+
+    response = client.post("/sessions", json={"hostName": "Alice"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert COMPRESSION_SKIPPED.values()[("/sessions", "small")] == small_before + 1
+
+    session_id = response.json()["sessionId"]
+    response = client.patch(
+        f"/sessions/{session_id}/code",
+        json={"code": LARGE_CODE, "language": "javascript", "userId": "u1"},
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 204
+    assert "content-encoding" not in response.headers
+
+
+def test_threshold_and_kill_switch(client: TestClient, monkeypatch):
+    """Test the size threshold and RESPONSE_COMPRESSION=0 both apply."""
+    session_id = _session_with_code(client, "x")
+    headers = {"Accept-Encoding": "gzip"}
+    assert "content-encoding" not in client.get(f"/sessions/{session_id}", headers=headers).headers
+
+    monkeypatch.setattr(compression, "RESPONSE_COMPRESSION", False)
+    session_id = _session_with_code(client, LARGE_CODE)
+    assert "content-encoding" not in client.get(f"/sessions/{session_id}", headers=headers).headers
+
+
+def test_gzip_output_is_deterministic():
+    """Test gzip bodies carry no timestamp, so equal payloads compress equally."""
+    assert compression.compress("gzip", b"a" * 2000) == compression.compress("gzip", b"a" * 2000)
+    assert gzip.decompress(compression.compress("gzip", b"a" * 2000)) == b"a" * 2000
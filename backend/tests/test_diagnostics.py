@@ -0,0 +1,107 @@
+"""Tests for the syntax diagnostics endpoint."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import diagnostics as diagnostics_module
+from app.diagnostics import DiagnosticsCache, check_brackets, check_python
+from app.reaper import _run_eviction_hooks
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = DiagnosticsCache()
+    monkeypatch.setattr(diagnostics_module, "cache", cache)
+    return cache
+
+
+def _session(client: TestClient, code: str, language: str = "python") -> str:
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    client.patch(f"/sessions/{session_id}/code", json={"userId": "u", "code": code, "language": language})
+    return session_id
+
+
+def test_python_syntax_errors():
+    """Test Python errors are reported with 1-based positions."""
+    assert check_python("def f():\n    return 1\n") == []
+    [error] = check_python("def f(:\n    pass\n")
+    assert (error["line"], error["column"], error["severity"]) == (1, 7, "error")
+    [error] = check_python("x = (1,\ny = 2\n")
+    assert error["line"] == 1 and "never closed" in error["message"]
+    assert check_python("a\x00b")[0]["line"] == 1
+
+
+def test_deeply_nested_python_is_a_cached_warning(client: TestClient, monkeypatch):
+    """Test code too deep for the parser gets a warning instead of a 500."""
+    for code in ("-" * 3000 + "1", "a" + ".b" * 3000, "-" * 10000 + "1"):
+        [warning] = check_python(code)
+        assert warning["severity"] == "warning" and "too deeply nested" in warning["message"]
+
+    session_id = _session(client, "-" * 3000 + "1")
+    calls = []
+    real_check = diagnostics_module.check
+    monkeypatch.setattr(diagnostics_module, "check", lambda *args: calls.append(args) or real_check(*args))
+    first = client.get(f"/sessions/{session_id}/diagnostics")
+    assert first.status_code == 200
+    assert first.json()["diagnostics"][0]["severity"] == "warning"
+    assert client.get(f"/sessions/{session_id}/diagnostics").json() == first.json()
+    assert len(calls) == 1
+
+
+def test_bracket_checker():
+    """Test the JS/TS checker skips strings, comments and template literals."""
+    clean = "const s = `a ${f({x: [1]})} b`; // ) ]\n/* { */ const t = '}' + \"(\";\n"
+    assert check_brackets(clean) == []
+
+    [error] = check_brackets("function f() {\n  return [1, 2);\n}\n")
+    assert (error["line"], error["column"]) == (2, 15)
+    assert "does not match '['" in error["message"]
+
+    messages = [d["message"] for d in check_brackets("if (x) {\n  y = 'abc\n")]
+    assert messages == ["'{' is never closed", "Unterminated string literal"]
+    assert check_brackets("x)")[0]["message"] == "Unexpected ')'"
+    assert check_brackets("`${a")[0]["message"] == "Unterminated template literal"
+    assert check_brackets("/* open")[0]["message"] == "Unterminated comment"
+
+
+def test_endpoint_reparses_only_on_new_versions(client: TestClient, monkeypatch):
+    """Test polls at an unchanged version neither load code nor parse."""
+    from app import tracing
+
+    session_id = _session(client, "def f(:\n")
+    calls = []
+    real_check = diagnostics_module.check
+    monkeypatch.setattr(diagnostics_module, "check", lambda *args: calls.append(args) or real_check(*args))
+
+    data = client.get(f"/sessions/{session_id}/diagnostics").json()
+    assert data["version"] == 1 and data["language"] == "python"
+    assert data["diagnostics"][0]["line"] == 1
+
+    monkeypatch.setattr(tracing, "SERVER_TIMING", True)
+    response = client.get(f"/sessions/{session_id}/diagnostics")
+    assert response.json() == data
+    assert response.headers["server-timing"].endswith('desc="1 queries"')
+    assert len(calls) == 1
+
+    client.patch(
+        f"/sessions/{session_id}/code", json={"userId": "u", "code": "def f():\n    pass\n", "language": "python"}
+    )
+    data = client.get(f"/sessions/{session_id}/diagnostics").json()
+    assert data == {"version": 2, "language": "python", "diagnostics": []}
+
+    # The same code in another session is served from the content cache
+    other = _session(client, "def f():\n    pass\n")
+    assert client.get(f"/sessions/{other}/diagnostics").json()["diagnostics"] == []
+    assert len(calls) == 2
+
+    assert client.get("/sessions/missing/diagnostics").status_code == 404
+
+
+def test_javascript_sessions_and_eviction(client: TestClient, fresh_cache):
+    """Test JS code gets bracket diagnostics and reaped sessions are forgotten."""
+    session_id = _session(client, "function f() {\n", language="javascript")
+    data = client.get(f"/sessions/{session_id}/diagnostics").json()
+    assert data["diagnostics"][0]["message"] == "'{' is never closed"
+    assert fresh_cache.for_version(session_id, data["version"]) is not None
+    _run_eviction_hooks(session_id)
+    assert fresh_cache.for_version(session_id, data["version"]) is None
@@ -0,0 +1,131 @@
+"""Tests for live documents edited through ranged ops."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import changelog as changelog_module, documents as documents_module
+from app.changelog import ChangeLog
+from app.documents import DocumentStore
+from app.history import apply_diff
+from app.reaper import _run_eviction_hooks
+
+
+@pytest.fixture(autouse=True)
+def fresh_documents(monkeypatch):
+    store = DocumentStore()
+    monkeypatch.setattr(documents_module, "documents", store)
+    monkeypatch.setattr("main.documents", store)
+    log = ChangeLog()
+    monkeypatch.setattr(changelog_module, "changelog", log)
+    monkeypatch.setattr("main.changelog", log)
+    return store
+
+
+def _session(client: TestClient, code: str = "def f():\n    return 1\n") -> str:
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    client.patch(f"/sessions/{session_id}/code", json={"userId": "host", "code": code, "language": "python"})
+    return session_id
+
+
+def _ops(client: TestClient, session_id: str, ops, base_version=None, user_id: str = "alice"):
+    return client.post(
+        f"/sessions/{session_id}/ops", json={"userId": user_id, "baseVersion": base_version, "ops": ops}
+    )
+
+
+def test_ops_edit_in_memory_until_flushed(client: TestClient, test_db, fresh_documents):
+    """Test ops are visible right away but only reach sessions.code on flush."""
+    session_id = _session(client)
+    response = _ops(
+        client,
+        session_id,
+        [{"range": [1, 11, 1, 12], "text": "2"}, {"start": 0, "end": 0, "text": "# hi\n"}],
+        base_version=1,
+    )
+    assert response.status_code == 200
+    assert response.json() == {"version": 3, "length": 27, "lineCount": 4}
+
+    expected = "# hi\ndef f():\n    return 2\n"
+    assert client.get(f"/sessions/{session_id}?fields=code").json()["code"] == expected
+    stored = client.get(f"/sessions/{session_id}/snapshot", params={"at": "2100-01-01T00:00:00"}).json()
+    assert stored["code"] == "def f():\n    return 1\n"
+
+    assert fresh_documents.flush(test_db) == 1
+    assert fresh_documents.flush(test_db) == 0
+    stored = client.get(f"/sessions/{session_id}/snapshot", params={"at": "2100-01-01T00:00:00"}).json()
+    assert stored["code"] == expected
+
+    # A whole-text update continues the version sequence after the ops
+    client.patch(f"/sessions/{session_id}/code", json={"userId": "bob", "code": "pass\n", "language": "python"})
+    assert session_id not in fresh_documents
+    assert client.get(f"/sessions/{session_id}/changes").json()["version"] == 4
+
+
+def test_ops_feed_the_change_log(client: TestClient):
+    """Test clients resuming from a version replay ops as splices."""
+    session_id = _session(client, "abc\n")
+    start = client.get(f"/sessions/{session_id}/changes").json()
+    _ops(client, session_id, [{"start": 3, "text": "d"}, {"start": 0, "end": 1, "text": "A"}])
+    data = client.get(f"/sessions/{session_id}/changes?last_version={start['version']}").json()
+    assert [change["version"] for change in data["changes"]] == [2, 3]
+    code = start["snapshot"]["code"]
+    for change in data["changes"]:
+        code = apply_diff(code, change["edit"])
+    assert code == "Abcd\n"
+
+
+def test_op_splices_count_utf16_code_units(client: TestClient):
+    """Test ops after astral characters reach the change log in UTF-16 offsets."""
+    session_id = _session(client, "a😀b\n")
+    start = client.get(f"/sessions/{session_id}/changes").json()
+    _ops(client, session_id, [{"start": 3, "end": 4, "text": "c😀"}, {"start": 6, "text": "d"}])
+    data = client.get(f"/sessions/{session_id}/changes?last_version={start['version']}").json()
+    assert [change["edit"]["start"] for change in data["changes"]] == [3, 6]
+    units = start["snapshot"]["code"].encode("utf-16-le")
+    for change in data["changes"]:
+        edit = change["edit"]
+        units = units[: edit["start"] * 2] + edit["text"].encode("utf-16-le") + units[edit["end"] * 2 :]
+    assert units.decode("utf-16-le") == "a😀c😀d\n"
+
+
+def test_op_offsets_count_utf16_code_units(client: TestClient, fresh_documents):
+    """Test offsets and columns after a surrogate pair are read as UTF-16 code units."""
+    session_id = _session(client, "x\n😀ab\n")
+    response = _ops(
+        client,
+        session_id,
+        [{"start": 5, "end": 6, "text": "B"}, {"range": [1, 2, 1, 3], "text": "A"}],
+    )
+    assert response.status_code == 200
+    assert fresh_documents.snapshot(session_id)["code"] == "x\n😀AB\n"
+
+    # An offset inside the surrogate pair is rejected, not split
+    assert _ops(client, session_id, [{"start": 3, "text": "!"}]).status_code == 400
+    assert fresh_documents.snapshot(session_id)["code"] == "x\n😀AB\n"
+
+
+def test_conflicts_and_bad_ops_change_nothing(client: TestClient, fresh_documents):
+    """Test a stale base version and an out-of-range op are rejected atomically."""
+    session_id = _session(client, "abc")
+    assert _ops(client, session_id, [{"start": 0, "text": "x"}], base_version=0).status_code == 409
+
+    response = _ops(client, session_id, [{"start": 0, "text": "x"}, {"start": 2, "end": 99, "text": ""}])
+    assert response.status_code == 400
+    assert _ops(client, session_id, [{"text": "x"}]).status_code == 400
+    assert fresh_documents.snapshot(session_id) == {"code": "abc", "language": "python", "version": 1}
+
+    assert _ops(client, "missing", [{"start": 0, "text": "x"}]).status_code == 404
+
+
+def test_end_flushes_and_reaper_evicts(client: TestClient, test_db, fresh_documents):
+    """Test ending a session writes back its document and eviction drops it."""
+    session_id = _session(client, "abc")
+    _ops(client, session_id, [{"start": 3, "text": "d"}])
+    assert client.post(f"/sessions/{session_id}/end").status_code == 204
+    assert session_id not in fresh_documents
+    assert client.get(f"/sessions/{session_id}?fields=code").json()["code"] == "abcd"
+
+    other = _session(client)
+    _ops(client, other, [{"start": 0, "text": "x"}])
+    _run_eviction_hooks(other)
+    assert len(fresh_documents) == 0
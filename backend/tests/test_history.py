@@ -0,0 +1,161 @@
+"""Tests for the session history endpoint."""
+
+import json
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.database import DatabaseService
+from app.history import apply_diff, compute_diff
+from app.orm_models import CodeChange
+
+
+def _create_with_history(client: TestClient, versions: list[str]) -> str:
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    for code in versions:
+        client.patch(
+            f"/sessions/{session_id}/code",
+            json={"userId": "host", "code": code, "language": "python"},
+        )
+    return session_id
+
+
+def _read_ndjson(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_history_full_content(client: TestClient):
+    """Test history streams every change in order."""
+    versions = ["a = 1", "a = 12", "a = 123"]
+    session_id = _create_with_history(client, versions)
+
+    response = client.get(f"/sessions/{session_id}/history")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = _read_ndjson(response)
+    assert [r["content"] for r in records] == versions
+    assert all(r["language"] == "python" for r in records)
+
+
+def test_history_diffs_reconstruct_content(client: TestClient):
+    """Test diff mode sends full content once and splices afterwards."""
+    versions = ["def f():\n    pass\n", "def f():\n    return 1\n", "def g():\n    return 1\n"]
+    session_id = _create_with_history(client, versions)
+
+    records = _read_ndjson(client.get(f"/sessions/{session_id}/history?diff=true"))
+    assert "content" in records[0]
+    assert all("diff" in r and "content" not in r for r in records[1:])
+
+    code = records[0]["content"]
+    rebuilt = [code]
+    for record in records[1:]:
+        code = apply_diff(code, record["diff"])
+        rebuilt.append(code)
+    assert rebuilt == versions
+
+
+def test_history_time_filters(client: TestClient, test_db: Session):
+    """Test since/until restrict the streamed range."""
+    session_id = _create_with_history(client, ["one", "two", "three"])
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    changes = test_db.query(CodeChange).order_by(CodeChange.id).all()
+    for i, change in enumerate(changes):
+        change.timestamp = base + timedelta(minutes=i)
+    test_db.commit()
+
+    response = client.get(
+        f"/sessions/{session_id}/history",
+        params={"since": "2024-01-01T12:01:00", "until": "2024-01-01T12:01:30"},
+    )
+    assert [r["content"] for r in _read_ndjson(response)] == ["two"]
+
+
+def test_history_not_found(client: TestClient):
+    """Test history of a non-existent session."""
+    response = client.get("/sessions/invalid-id/history")
+    assert response.status_code == 404
+
+
+def test_iter_code_changes_pages_with_equal_timestamps(test_db: Session):
+    """Test keyset pagination does not skip rows sharing a timestamp."""
+    service = DatabaseService(test_db)
+    session_id, _ = service.create_session("Host", "http://test")
+    same_time = datetime(2024, 1, 1)
+    for i in range(7):
+        test_db.add(
+            CodeChange(
+                session_id=session_id,
+                userId="system",
+                content_hash=service.store_code(str(i)),
+                language="python",
+                timestamp=same_time,
+            )
+        )
+    test_db.commit()
+
+    contents = [c["content"] for c in service.iter_code_changes(session_id, page_size=3)]
+    assert contents == [str(i) for i in range(7)]
+
+
+def test_compute_diff_roundtrip():
+    """Test splices reproduce the new text."""
+    for old, new in [("", "abc"), ("abc", ""), ("abcdef", "abXYef"), ("aaa", "aaaa"), ("😀é😀x", "😀é😀y😀")]:
+        assert apply_diff(old, compute_diff(old, new)) == new
+
+
+def test_diff_offsets_count_utf16_code_units(client: TestClient):
+    """Test history diffs use the same offset unit as /changes: UTF-16 code units."""
+    assert compute_diff("s = '😀'\n", "s = '😀!'\n") == {"start": 7, "end": 7, "text": "!"}
+    session_id = _create_with_history(client, ["a = '😀'\n", "a = '😀😀'\nb = 1\n"])
+    lines = client.get(f"/sessions/{session_id}/history", params={"diff": "true"}).text.splitlines()
+    assert json.loads(lines[-1])["diff"]["start"] == 7
+
+
+def test_snapshot_at_timestamp(client: TestClient, test_db: Session):
+    """Test snapshot returns the code as of the requested time."""
+    session_id = _create_with_history(client, ["v1", "v2", "v3"])
+    base = datetime.utcnow() + timedelta(hours=1)
+    changes = test_db.query(CodeChange).order_by(CodeChange.id).all()
+    for i, change in enumerate(changes):
+        change.timestamp = base + timedelta(minutes=i)
+    test_db.commit()
+
+    at = (base + timedelta(minutes=1, seconds=30)).isoformat()
+    response = client.get(f"/sessions/{session_id}/snapshot", params={"at": at})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["code"] == "v2"
+    assert data["language"] == "python"
+    assert data["changeId"] == changes[1].id
+
+
+def test_snapshot_before_first_change(client: TestClient):
+    """Test snapshot before any edit returns the initial template."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    initial = client.get(f"/sessions/{session_id}").json()["code"]
+
+    at = (datetime.utcnow() + timedelta(seconds=5)).isoformat()
+    data = client.get(f"/sessions/{session_id}/snapshot", params={"at": at}).json()
+    assert data["code"] == initial
+    assert data["changeId"] is None
+
+
+def test_snapshot_not_found(client: TestClient):
+    """Test snapshot for missing sessions and times before creation."""
+    assert client.get("/sessions/invalid-id/snapshot", params={"at": "2024-01-01T00:00:00"}).status_code == 404
+
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    response = client.get(f"/sessions/{session_id}/snapshot", params={"at": "2000-01-01T00:00:00"})
+    assert response.status_code == 404
+
+
+def test_snapshot_after_history_purge_is_gone(client: TestClient, test_db: Session):
+    """Test a session whose history was purged gets 410, not the template."""
+    session_id = _create_with_history(client, ["print(1)"])
+    test_db.query(CodeChange).filter(CodeChange.session_id == session_id).delete()
+    test_db.commit()
+
+    at = (datetime.utcnow() + timedelta(seconds=5)).isoformat()
+    response = client.get(f"/sessions/{session_id}/snapshot", params={"at": at})
+    assert response.status_code == 410
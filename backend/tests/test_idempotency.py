@@ -0,0 +1,167 @@
+"""Tests for Idempotency-Key handling on POST endpoints."""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from starlette.responses import JSONResponse
+
+from app import idempotency
+from app.idempotency import IdempotencyCache, IdempotencyMiddleware
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(idempotency, "cache", IdempotencyCache())
+
+
+def test_create_session_retry_is_replayed(client: TestClient):
+    """Test a retried create returns the first session instead of a new one."""
+    headers = {"Idempotency-Key": "create-1"}
+    first = client.post("/sessions", json={"hostName": "Alice"}, headers=headers)
+    retry = client.post("/sessions", json={"hostName": "Alice"}, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+
+    other = client.post("/sessions", json={"hostName": "Alice"}, headers={"Idempotency-Key": "create-2"})
+    assert other.json()["sessionId"] != first.json()["sessionId"]
+
+
+def test_join_retry_adds_one_participant(client: TestClient):
+    """Test retried joins do not create duplicate users."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    for _ in range(3):
+        response = client.post(
+            f"/sessions/{session_id}/join", json={"userName": "Candidate"}, headers={"Idempotency-Key": "join-1"}
+        )
+        assert response.status_code == 200
+
+    participants = client.get(f"/sessions/{session_id}?fields=participants").json()["participants"]
+    assert [p["name"] for p in participants] == ["Host", "Candidate"]
+
+
+def test_key_reuse_with_different_body_is_rejected(client: TestClient):
+    """Test a key bound to one request body cannot be used for another."""
+    headers = {"Idempotency-Key": "reused"}
+    client.post("/sessions", json={"hostName": "Alice"}, headers=headers)
+    response = client.post("/sessions", json={"hostName": "Mallory"}, headers=headers)
+    assert response.status_code == 422
+
+    assert client.post("/sessions", json={"hostName": "A"}, headers={"Idempotency-Key": ""}).status_code == 400
+
+
+def test_errors_are_not_cached(client: TestClient):
+    """Test a failed request can be retried with the same key."""
+    headers = {"Idempotency-Key": "join-missing"}
+    assert client.post("/sessions/missing/join", json={"userName": "X"}, headers=headers).status_code == 404
+    assert len(idempotency.cache) == 0
+
+
+def test_concurrent_duplicates_wait_for_the_first():
+    """Test duplicates arriving mid-flight share the first response."""
+    calls = []
+
+    async def endpoint(scope, receive, send):
+        calls.append(scope["path"])
+        await asyncio.sleep(0.05)
+        await JSONResponse({"call": len(calls)})(scope, receive, send)
+
+    transport = httpx.ASGITransport(app=IdempotencyMiddleware(endpoint))
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            requests = [http.post("/run", json={}, headers={"Idempotency-Key": "k"}) for _ in range(5)]
+            return await asyncio.gather(*requests)
+
+    responses = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r.json() == {"call": 1} for r in responses)
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in responses) == 4
+
+
+def test_cache_is_bounded_and_expires(monkeypatch):
+    """Test the LRU drops the oldest keys and entries expire after the TTL."""
+    clock = [0.0]
+    monkeypatch.setattr(idempotency.time, "monotonic", lambda: clock[0])
+    cache = IdempotencyCache(max_entries=2, ttl=10)
+    for key in ("a", "b", "c"):
+        cache.complete(cache.begin(("/p", b"", key), "f"), idempotency._CachedResponse(200, [], b""))
+
+    assert cache.get(("/p", b"", "a")) is None
+    assert cache.get(("/p", b"", "c")) is not None
+    clock[0] = 11
+    assert cache.get(("/p", b"", "c")) is None
+
+
+def _echo_app(calls: list):
+    async def endpoint(scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        calls.append(scope["query_string"])
+        await JSONResponse({"call": len(calls), "size": len(body)})(scope, receive, send)
+
+    return endpoint
+
+
+def test_query_string_is_part_of_the_key():
+    """Test the same key on another query string runs the endpoint again."""
+    calls = []
+    client = TestClient(IdempotencyMiddleware(_echo_app(calls)))
+    headers = {"Idempotency-Key": "k"}
+    assert client.post("/run?dry_run=1", json={}, headers=headers).json()["call"] == 1
+    assert client.post("/run?dry_run=0", json={}, headers=headers).json()["call"] == 2
+    replay = client.post("/run?dry_run=1", json={}, headers=headers)
+    assert replay.json()["call"] == 1 and replay.headers["idempotent-replayed"] == "true"
+
+
+def test_large_bodies_are_passed_through(monkeypatch):
+    """Test bodies over the limit reach the endpoint whole and are not cached."""
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_MAX_REQUEST_BYTES", 10)
+    calls = []
+    client = TestClient(IdempotencyMiddleware(_echo_app(calls)))
+    headers = {"Idempotency-Key": "big"}
+    for _ in range(2):
+        assert client.post("/upload", content=b"x" * 100, headers=headers).json()["size"] == 100
+
+    def chunks():
+        yield b"y" * 8
+        yield b"y" * 8
+
+    assert client.post("/upload", content=chunks(), headers=headers).json()["size"] == 16
+    assert len(calls) == 3 and len(idempotency.cache) == 0
+
+    assert client.post("/upload", content=b"small", headers=headers).json()["call"] == 4
+    assert client.post("/upload", content=b"small", headers=headers).json()["call"] == 4
+
+
+def test_oversized_responses_are_not_run_twice(monkeypatch):
+    """Test duplicates of a response too large to keep get a 409, never a second run."""
+    monkeypatch.setattr(idempotency, "MAX_CACHED_BODY_BYTES", 1000)
+    calls = []
+
+    async def endpoint(scope, receive, send):
+        calls.append(scope["path"])
+        await asyncio.sleep(0.05)
+        await JSONResponse({"data": "x" * 3000})(scope, receive, send)
+
+    transport = httpx.ASGITransport(app=IdempotencyMiddleware(endpoint))
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            requests = [http.post("/big", json={}, headers={"Idempotency-Key": "k"}) for _ in range(3)]
+            responses = await asyncio.gather(*requests)
+            late = await http.post("/big", json={}, headers={"Idempotency-Key": "k"})
+            return responses + [late]
+
+    responses = asyncio.run(run())
+    assert len(calls) == 1
+    assert sorted(r.status_code for r in responses) == [200, 409, 409, 409]
+    assert all(r.headers.get("idempotent-replayed") == "true" for r in responses if r.status_code == 409)
@@ -0,0 +1,57 @@
+"""Tests for the metrics middleware and /metrics endpoint."""
+
+from fastapi.testclient import TestClient
+
+from app.metrics import Counter, Histogram, REGISTRY
+
+
+def test_metrics_use_route_templates(client: TestClient):
+    """Test request metrics are labelled by route template, not session id."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    client.get(f"/sessions/{session_id}")
+    client.post(f"/sessions/{session_id}/execute", json={"code": "console.log('x');", "language": "javascript"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+
+    assert 'codecollab_http_request_duration_seconds_count{method="GET",route="/sessions/{session_id}"}' in body
+    assert 'codecollab_http_requests_total{method="POST",route="/sessions",status="201"}' in body
+    assert session_id not in body
+    assert 'codecollab_db_queries_total{operation="SELECT"}' in body
+    assert 'codecollab_executions_total{language="javascript",outcome="success"}' in body
+    assert "codecollab_http_requests_in_flight" in body
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test histogram exposition follows the Prometheus format."""
+    histogram = Histogram("test_latency_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    REGISTRY.remove(histogram)
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(("/x",), value)
+
+    lines = list(histogram.collect())
+    assert lines == [
+        'test_latency_seconds_bucket{route="/x",le="0.1"} 1',
+        'test_latency_seconds_bucket{route="/x",le="1.0"} 3',
+        'test_latency_seconds_bucket{route="/x",le="+Inf"} 4',
+        'test_latency_seconds_sum{route="/x"} 6.05',
+        'test_latency_seconds_count{route="/x"} 4',
+    ]
+
+
+def test_counter_aggregates_thread_shards():
+    """Test per-thread shards are summed on collection."""
+    import threading
+
+    counter = Counter("test_total", "Test.")
+    REGISTRY.remove(counter)
+    threads = [threading.Thread(target=lambda: [counter.inc() for _ in range(1000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc()
+
+    assert counter.values() == {(): 4001.0}
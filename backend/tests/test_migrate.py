@@ -0,0 +1,100 @@
+"""Tests for upgrading databases created before code blobs."""
+
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app import reaper
+from app.column_types import encode_text
+from app.database import DatabaseService
+from app.db import Base
+from app.migrate import upgrade
+from app.search import search_code
+
+# Schema of the original release, before blobs, versions and activity times
+_OLD_SCHEMA = (
+    "CREATE TABLE sessions (id VARCHAR(36) NOT NULL, code TEXT NOT NULL, language VARCHAR(32) NOT NULL, "
+    '"createdAt" DATETIME, "isActive" BOOLEAN, PRIMARY KEY (id))',
+    'CREATE TABLE users (id VARCHAR(36) NOT NULL, name VARCHAR(200) NOT NULL, "isHost" BOOLEAN, '
+    '"joinedAt" DATETIME, session_id VARCHAR(36), PRIMARY KEY (id), FOREIGN KEY(session_id) REFERENCES sessions (id))',
+    'CREATE TABLE code_changes (id INTEGER NOT NULL, session_id VARCHAR(36) NOT NULL, "userId" VARCHAR(36) NOT NULL, '
+    "content TEXT NOT NULL, timestamp DATETIME, language VARCHAR(32) NOT NULL, PRIMARY KEY (id), "
+    "FOREIGN KEY(session_id) REFERENCES sessions (id))",
+)
+
+
+def test_upgrade_moves_text_into_blobs(tmp_path):
+    """Test an old database keeps its code and accepts new sessions after upgrade."""
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'old.db')}", future=True)
+    created = datetime(2024, 1, 1, 12, 0)
+    with engine.begin() as conn:
+        for statement in _OLD_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(
+            text("INSERT INTO sessions VALUES ('old1', :code, 'python', :created, 1)"),
+            {"code": "def heapify():\n    pass\n", "created": created},
+        )
+        conn.execute(text("INSERT INTO users VALUES ('u1', 'Host', 1, :created, 'old1')"), {"created": created})
+        for minute, content in enumerate(["x = 1\n", encode_text("y = 2\n" * 400, "zlib", 1024)], start=1):
+            conn.execute(
+                text("INSERT INTO code_changes VALUES (:id, 'old1', 'u1', :content, :at, 'python')"),
+                {"id": minute, "content": content, "at": created.replace(minute=minute)},
+            )
+
+    Base.metadata.create_all(bind=engine)
+    steps = upgrade(engine)
+    assert "moved 1 sessions.code values into code_blobs" in steps
+    assert "moved 2 code_changes.content values into code_blobs" in steps
+    assert upgrade(engine) == []
+    assert "code" not in {column["name"] for column in inspect(engine).get_columns("sessions")}
+
+    db = sessionmaker(bind=engine)()
+    try:
+        service = DatabaseService(db)
+        session = service.get_session("old1")
+        assert session["code"] == "def heapify():\n    pass\n"
+        assert [p["name"] for p in session["participants"]] == ["Host"]
+        versioned = service.get_versioned_code("old1")
+        assert versioned["version"] == 2
+        assert [change["content"] for change in service.iter_code_changes("old1")] == ["x = 1\n", "y = 2\n" * 400]
+        assert search_code(db, "heapify")["results"][0]["sessionId"] == "old1"
+
+        session_id, _ = service.create_session("New host", "http://test")
+        assert service.update_code(session_id, "print(1)\n", "python", "u2") == 1
+        assert service.get_session(session_id)["code"] == "print(1)\n"
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_upgraded_database_can_be_reaped(tmp_path):
+    """Test sessions of a database from before the reaper get an activity time it can use."""
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'old.db')}", future=True)
+    old, recent = datetime(2024, 1, 1, 12, 0), datetime.utcnow()
+    with engine.begin() as conn:
+        for statement in _OLD_SCHEMA:
+            conn.execute(text(statement))
+        for session_id, created in (("idle", old), ("busy", recent)):
+            conn.execute(
+                text("INSERT INTO sessions VALUES (:id, 'x = 1', 'python', :created, 1)"),
+                {"id": session_id, "created": created},
+            )
+        conn.execute(
+            text("INSERT INTO code_changes VALUES (1, 'idle', 'u1', 'x = 1', :at, 'python')"),
+            {"at": old + timedelta(minutes=5)},
+        )
+
+    Base.metadata.create_all(bind=engine)
+    steps = upgrade(engine)
+    assert "added sessions.lastActivityAt" in steps
+    assert "created index ix_sessions_active_activity" in steps
+
+    db = sessionmaker(bind=engine)()
+    try:
+        assert reaper.reap_inactive_sessions(db, idle_for=timedelta(hours=1)) == ["idle"]
+        assert DatabaseService(db).get_session("busy")["isActive"] is True
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,98 @@
+"""Tests for the on-demand profiler endpoints."""
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import admin
+
+
+TOKEN = "test-admin-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", TOKEN)
+
+
+def test_profile_requires_admin(client: TestClient, monkeypatch):
+    """Test the profiler is disabled without a token and rejects bad ones."""
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "")
+    assert client.post("/admin/profile?seconds=0").status_code == 403
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", TOKEN)
+    response = client.post("/admin/profile?seconds=0", headers={"Authorization": "Bearer wrong"})
+    assert response.status_code == 401
+
+
+def _busy(stop: threading.Event):
+    def spin_for_profiler():
+        while not stop.is_set():
+            sum(i * i for i in range(1000))
+
+    spin_for_profiler()
+
+
+def test_profile_for_seconds_speedscope(client: TestClient, admin_token):
+    """Test a timed profile returns a speedscope document with samples."""
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy, args=(stop,))
+    worker.start()
+    try:
+        response = client.post("/admin/profile?seconds=0.3", headers=AUTH)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert response.status_code == 200
+    data = response.json()
+    profile = data["profiles"][0]
+    assert profile["type"] == "sampled"
+    assert len(profile["samples"]) == len(profile["weights"]) > 0
+    names = {frame["name"] for frame in data["shared"]["frames"]}
+    assert "spin_for_profiler" in names
+
+
+def test_profile_collapsed_format(client: TestClient, admin_token):
+    """Test collapsed output has one 'stack count' line per distinct stack."""
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy, args=(stop,))
+    worker.start()
+    try:
+        response = client.post("/admin/profile?seconds=0.2&format=collapsed", headers=AUTH)
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = [line for line in response.text.splitlines() if line]
+    assert lines
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("spin_for_profiler" in line for line in lines)
+
+
+def test_profile_next_requests(client: TestClient, admin_token):
+    """Test request mode completes after the requested number of matching requests."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    result = {}
+
+    def take_profile():
+        result["response"] = client.post(
+            "/admin/profile/requests",
+            params={"route": "/sessions/{session_id}", "count": 2, "method": "GET", "timeout": 10},
+            headers=AUTH,
+        )
+
+    profiling = threading.Thread(target=take_profile)
+    profiling.start()
+    deadline = time.time() + 10
+    while profiling.is_alive() and time.time() < deadline:
+        client.get(f"/sessions/{session_id}")
+        time.sleep(0.01)
+    profiling.join()
+
+    response = result["response"]
+    assert response.status_code == 200
+    assert response.json()["name"] == "2 requests to /sessions/{session_id}"
@@ -0,0 +1,119 @@
+"""Tests for token-bucket rate limiting."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import rate_limit, tracing
+from app.rate_limit import Limit, MemoryRateLimitStore, RateLimiter
+from app.reaper import _run_eviction_hooks
+
+
+@pytest.fixture
+def tight_limits(monkeypatch):
+    monkeypatch.setattr(rate_limit, "limiter", RateLimiter())
+    monkeypatch.setattr("main.limiter", rate_limit.limiter)
+    monkeypatch.setattr(rate_limit.CODE_UPDATE_LIMIT, "rate", 0.001)
+    monkeypatch.setattr(rate_limit.CODE_UPDATE_LIMIT, "burst", 3)
+    monkeypatch.setattr(rate_limit.EXECUTE_LIMIT, "rate", 0.001)
+    monkeypatch.setattr(rate_limit.EXECUTE_LIMIT, "burst", 1)
+    return rate_limit.limiter
+
+
+def _patch(client: TestClient, session_id: str, user_id: str, code: str):
+    return client.patch(
+        f"/sessions/{session_id}/code", json={"userId": user_id, "code": code, "language": "python"}
+    )
+
+
+def test_code_updates_limited_per_user(client: TestClient, tight_limits):
+    """Test a user is rejected once their bucket is empty, without affecting others."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+
+    for i in range(3):
+        assert _patch(client, session_id, "alice", f"x = {i}").status_code == 204
+    response = _patch(client, session_id, "alice", "x = 99")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+    assert _patch(client, session_id, "bob", "y = 1").status_code == 204
+
+
+def test_rejections_do_not_touch_the_database(client: TestClient, tight_limits, monkeypatch):
+    """Test a 429 is decided before any SQL runs."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    for i in range(3):
+        _patch(client, session_id, "alice", f"x = {i}")
+
+    monkeypatch.setattr(tracing, "SERVER_TIMING", True)
+    response = _patch(client, session_id, "alice", "x = 99")
+    assert response.status_code == 429
+    assert response.headers["server-timing"].endswith('desc="0 queries"')
+
+
+def test_execute_limited_per_session(client: TestClient, tight_limits):
+    """Test executions share one bucket per session."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    body = {"code": "console.log(1)", "language": "javascript"}
+
+    assert client.post(f"/sessions/{session_id}/execute", json=body).status_code == 200
+    assert client.post(f"/sessions/{session_id}/execute", json=body).status_code == 429
+
+
+def test_bucket_refills(monkeypatch):
+    """Test tokens come back at the configured rate."""
+    clock = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    store = MemoryRateLimitStore()
+    limit = Limit("test", rate=2, burst=2)
+
+    assert store.consume("s", ("k",), limit) == 0
+    assert store.consume("s", ("k",), limit) == 0
+    assert store.consume("s", ("k",), limit) == pytest.approx(0.5)
+
+    clock[0] += 0.5
+    assert store.consume("s", ("k",), limit) == 0
+    clock[0] += 10
+    assert store.consume("s", ("k",), limit) == 0
+    assert store.consume("s", ("k",), limit) == 0
+    assert store.consume("s", ("k",), limit) > 0
+
+
+def test_reaped_sessions_are_evicted():
+    """Test the reaper eviction hook drops a session's buckets."""
+    store = rate_limit.limiter.store
+    store.consume("reaped-session", ("code_update", "alice"), rate_limit.CODE_UPDATE_LIMIT)
+    assert ("reaped-session", "code_update", "alice") in store._buckets
+
+    _run_eviction_hooks("reaped-session")
+    assert ("reaped-session", "code_update", "alice") not in store._buckets
+
+
+def test_ended_sessions_are_evicted(client: TestClient, tight_limits):
+    """Test ending a session drops its buckets."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    _patch(client, session_id, "alice", "x = 1")
+    assert len(tight_limits.store) == 1
+    assert client.post(f"/sessions/{session_id}/end").status_code == 204
+    assert len(tight_limits.store) == 0
+
+
+def test_idle_buckets_expire_and_count_is_capped(monkeypatch):
+    """Test refilled buckets are dropped and made-up ids cannot grow the store without bound."""
+    clock = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    store = MemoryRateLimitStore(max_buckets=50)
+    limit = Limit("test", rate=1, burst=2)
+
+    store.consume("a", ("k",), limit)
+    store.consume("a", ("k",), limit)
+    clock[0] += 1
+    store.consume("b", ("k",), limit)
+    assert len(store) == 2
+    # "a" is full again 2s after its last use, "b" 1s after its
+    clock[0] += 1.5
+    store.consume("c", ("k",), limit)
+    assert len(store) == 1 and ("c", "k") in store._buckets
+
+    for i in range(1000):
+        store.consume(f"session-{i}", ("k", f"user-{i}"), limit)
+    assert len(store) == 50
@@ -0,0 +1,91 @@
+"""Tests for the inactive-session reaper."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app import reaper
+from app.database import DatabaseService
+from app.orm_models import Session as ORMSession, SessionUser, CodeChange, CodeBlob
+
+
+def _make_idle(db: Session, session_id: str, hours: int = 3):
+    orm = db.query(ORMSession).filter(ORMSession.id == session_id).first()
+    orm.lastActivityAt = datetime.utcnow() - timedelta(hours=hours)
+    db.commit()
+
+
+def test_reaps_idle_sessions(test_db: Session):
+    """Test idle sessions are ended and their participants and history evicted."""
+    service = DatabaseService(test_db)
+    idle_id, _ = service.create_session("Host", "http://test")
+    service.join_session(idle_id, "Candidate")
+    for i in range(5):
+        service.update_code(idle_id, f"print({i})", "python")
+    _make_idle(test_db, idle_id)
+
+    reaped = reaper.reap_inactive_sessions(
+        test_db, idle_for=timedelta(hours=1), batch_size=2, purge_history=True
+    )
+
+    assert reaped == [idle_id]
+    session = service.get_session(idle_id)
+    assert session["isActive"] is False
+    assert session["participants"] == []
+    assert test_db.query(CodeChange).filter(CodeChange.session_id == idle_id).count() == 0
+
+
+def test_keeps_recent_sessions(test_db: Session):
+    """Test sessions with recent activity are left alone."""
+    service = DatabaseService(test_db)
+    active_id, _ = service.create_session("Host", "http://test")
+
+    reaped = reaper.reap_inactive_sessions(test_db, idle_for=timedelta(hours=1))
+
+    assert reaped == []
+    assert service.get_session(active_id)["isActive"] is True
+    assert test_db.query(SessionUser).filter(SessionUser.session_id == active_id).count() == 1
+
+
+def test_keeps_history_when_purge_disabled(test_db: Session):
+    """Test history survives by default."""
+    service = DatabaseService(test_db)
+    session_id, _ = service.create_session("Host", "http://test")
+    service.update_code(session_id, "print(1)", "python")
+    _make_idle(test_db, session_id)
+
+    reaper.reap_inactive_sessions(test_db, idle_for=timedelta(hours=1))
+
+    assert test_db.query(CodeChange).filter(CodeChange.session_id == session_id).count() == 1
+
+
+def test_eviction_hooks_called(test_db: Session, monkeypatch):
+    """Test eviction hooks receive reaped session ids."""
+    monkeypatch.setattr(reaper, "_eviction_hooks", [])
+    evicted = []
+    reaper.register_eviction_hook(evicted.append)
+
+    service = DatabaseService(test_db)
+    session_id, _ = service.create_session("Host", "http://test")
+    _make_idle(test_db, session_id)
+
+    reaper.reap_inactive_sessions(test_db, idle_for=timedelta(hours=1))
+
+    assert evicted == [session_id]
+
+
+def test_collect_orphan_blobs(test_db: Session):
+    """Test only blobs without session or history references are collected."""
+    service = DatabaseService(test_db)
+    session_id, _ = service.create_session("Host", "http://test")
+    service.update_code(session_id, "print('old')", "python")
+    service.update_code(session_id, "print('new')", "python")
+    _make_idle(test_db, session_id)
+    reaper.reap_inactive_sessions(test_db, idle_for=timedelta(hours=1), purge_history=True)
+
+    removed = reaper.collect_orphan_blobs(test_db, grace=timedelta(0))
+
+    # The default template and "old" are unreferenced; the current code survives
+    assert removed == 2
+    assert service.get_session(session_id)["code"] == "print('new')"
+    assert test_db.query(CodeBlob).count() == 1
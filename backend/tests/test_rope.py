@@ -0,0 +1,65 @@
+"""Tests for the rope document model."""
+
+import random
+
+import pytest
+
+from app import rope as rope_module
+from app.rope import Rope
+
+
+def _position(text: str, offset: int):
+    return text.count("\n", 0, offset), offset - (text.rfind("\n", 0, offset) + 1)
+
+
+@pytest.mark.parametrize("chunk_size", [4, 1024])
+def test_random_edits_match_str(monkeypatch, chunk_size):
+    """Test edits, slices and position lookups agree with plain strings."""
+    monkeypatch.setattr(rope_module, "CHUNK_SIZE", chunk_size)
+    rng = random.Random(chunk_size)
+    text = "".join(rng.choice("ab\n") for _ in range(2000))
+    rope = Rope(text)
+    for step in range(2000):
+        start = rng.randint(0, len(text))
+        end = rng.randint(start, min(len(text), start + 30))
+        insert = "".join(rng.choice("xy\n") for _ in range(rng.randint(0, 30)))
+        rope.replace(start, end, insert)
+        text = text[:start] + insert + text[end:]
+        if step % 50 == 0:
+            assert str(rope) == text
+            assert len(rope) == len(text)
+            assert rope.line_count == text.count("\n") + 1
+            for _ in range(20):
+                offset = rng.randint(0, len(text))
+                line, column = _position(text, offset)
+                assert rope.offset_to_position(offset) == (line, column)
+                assert rope.position_to_offset(line, column) == offset
+            a = rng.randint(0, len(text))
+            b = rng.randint(a, len(text))
+            assert rope.slice(a, b) == text[a:b]
+    assert str(rope) == text
+
+
+def test_small_edits_do_not_fragment_forever(monkeypatch):
+    """Test chunk count stays proportional to the text length."""
+    monkeypatch.setattr(rope_module, "CHUNK_SIZE", 64)
+    rope = Rope("x" * 64 * 10)
+    for i in range(5000):
+        rope.insert(i % len(rope), "y")
+    assert str(rope).count("y") == 5000
+    assert rope.chunk_count <= 4 * (len(rope) // 64 + 1)
+
+
+def test_positions_and_bounds():
+    """Test columns are clamped to their line and out-of-range input raises."""
+    rope = Rope("ab\ncdef\n")
+    assert rope.line_count == 3
+    assert rope.position_to_offset(0, 10) == 2
+    assert rope.position_to_offset(1, 2) == 5
+    assert rope.position_to_offset(2, 0) == 8
+    assert rope.offset_to_position(8) == (2, 0)
+    with pytest.raises(IndexError):
+        rope.position_to_offset(3, 0)
+    with pytest.raises(IndexError):
+        rope.replace(2, 100, "")
+    assert str(Rope("")) == "" and Rope("").line_count == 1
@@ -0,0 +1,123 @@
+"""Tests for full-text search over session code."""
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.search import index_pending, query_terms, reindex_missing
+
+
+def _session(client: TestClient, code: str, language: str = "python") -> str:
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    client.patch(f"/sessions/{session_id}/code", json={"userId": "u", "code": code, "language": language})
+    return session_id
+
+
+def test_search_ranks_and_snippets(client: TestClient, test_db):
+    """Test matching sessions come back best first with the matching line."""
+    heavy = _session(client, "import heapq\n\nh = []\nheapq.heappush(h, 1)\nheapq.heappop(h)\n")
+    light = _session(client, "def solve(xs):\n    # a min_heap would be faster\n    return sorted(xs)\n")
+    _session(client, "print('no match here')\n")
+    index_pending(test_db)
+
+    data = client.get("/search", params={"q": "heap"}).json()
+    assert [r["sessionId"] for r in data["results"]] == [heavy, light]
+    assert data["hasMore"] is False
+    assert data["results"][0]["score"] >= data["results"][1]["score"]
+    assert data["results"][1]["line"] == 2
+    assert "min_heap" in data["results"][1]["snippet"]
+
+    # Every term must match
+    assert [r["sessionId"] for r in client.get("/search?q=heap sorted").json()["results"]] == [light]
+
+
+def test_index_follows_updates(client: TestClient, test_db):
+    """Test the index is updated in place when code changes."""
+    session_id = _session(client, "queue = deque()\n")
+    index_pending(test_db)
+    assert len(client.get("/search?q=deque").json()["results"]) == 1
+    client.patch(f"/sessions/{session_id}/code", json={"userId": "u", "code": "stack = []\n", "language": "python"})
+    index_pending(test_db)
+    assert client.get("/search?q=deque").json()["results"] == []
+    assert client.get("/search?q=stack").json()["results"][0]["sessionId"] == session_id
+
+
+def test_pagination_and_filters(client: TestClient, test_db):
+    """Test limit/offset pages, the language filter and unsafe input."""
+    ids = {_session(client, f"value_{i} = bisect(xs, {i})\n") for i in range(5)}
+    js = _session(client, "const i = bisect(xs, 1);\n", language="javascript")
+    index_pending(test_db)
+
+    first = client.get("/search?q=bisect&limit=4").json()
+    second = client.get("/search?q=bisect&limit=4&offset=4").json()
+    assert first["hasMore"] is True and second["hasMore"] is False
+    found = [r["sessionId"] for r in first["results"] + second["results"]]
+    assert len(found) == 6 and set(found) == ids | {js}
+
+    only_js = client.get("/search?q=bisect&language=javascript").json()["results"]
+    assert [r["sessionId"] for r in only_js] == [js]
+
+    # FTS operators and quotes are treated as plain words
+    assert client.get('/search', params={"q": 'bisect" OR NEAR(*'}).status_code == 200
+    assert client.get("/search", params={"q": "!!!"}).json()["results"] == []
+    assert client.get("/search").status_code == 422
+    assert query_terms('Heap-Sort "x"') == ["heap", "sort", "x"]
+
+
+def test_reindex_backfills_missing_sessions(client: TestClient, test_db):
+    """Test sessions missing from the index are added by reindex."""
+    session_id = _session(client, "memo = lru_cache(maxsize=None)\n")
+    index_pending(test_db)
+    assert len(client.get("/search?q=lru").json()["results"]) == 1
+    test_db.execute(text("DELETE FROM search_documents"))
+    test_db.commit()
+    assert client.get("/search?q=lru").json()["results"] == []
+    assert reindex_missing(test_db) == 1
+    assert reindex_missing(test_db) == 0
+    assert client.get("/search?q=lru").json()["results"][0]["sessionId"] == session_id
+
+
+def test_common_terms_rank_the_newest_matches(client: TestClient, test_db, monkeypatch):
+    """Test only the most recently indexed matches are scored for very common terms."""
+    from app import search
+
+    monkeypatch.setattr(search, "SEARCH_RANK_CANDIDATES", 2)
+    ids = []
+    for i in range(4):
+        ids.append(_session(client, f"graph_{i} = build_graph({i})\n"))
+        index_pending(test_db)
+    page = client.get("/search?q=graph&limit=1").json()
+    assert page["results"][0]["sessionId"] in ids[-2:] and page["hasMore"] is True
+    deep = client.get("/search?q=graph&limit=2&offset=2").json()
+    assert len(deep["results"]) == 2 and deep["hasMore"] is False
+
+
+def test_updates_are_queued_and_indexed_once(client: TestClient, test_db):
+    """Test code updates and searches leave the index alone until the queue is indexed."""
+    from app.search import index_queue
+
+    index_queue.take()
+    session_id = _session(client, "first = 1\n")
+    for i in range(5):
+        body = {"userId": "u", "code": f"x_{i} = {i}\n", "language": "python"}
+        client.patch(f"/sessions/{session_id}/code", json=body)
+    assert client.get("/search?q=x_4").json()["results"] == []
+    assert test_db.execute(text("SELECT COUNT(*) FROM search_documents")).scalar() == 0
+    assert len(index_queue) == 1
+
+    assert index_pending(test_db) == 1
+    assert index_pending(test_db) == 0
+    assert test_db.execute(text("SELECT code FROM search_documents")).scalar() == "x_4 = 4\n"
+
+
+def test_reindex_catches_up_stale_documents(client: TestClient, test_db):
+    """Test sessions whose queued update was lost are reindexed by reindex_stale."""
+    from app.search import index_queue, reindex_stale
+
+    session_id = _session(client, "before = 1\n")
+    index_pending(test_db)
+    client.patch(f"/sessions/{session_id}/code", json={"userId": "u", "code": "after = 2\n", "language": "python"})
+    index_queue.take()  # lost, as in a crash
+
+    assert reindex_stale(test_db) == 1
+    assert reindex_stale(test_db) == 0
+    assert client.get("/search?q=after").json()["results"][0]["sessionId"] == session_id
@@ -0,0 +1,56 @@
+"""Tests for the fast JSON response path."""
+
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+import main
+from app import serialization
+
+
+SESSION = {
+    "id": "abc12345",
+    "code": "print('héllo')\n" * 10,
+    "language": "python",
+    "participants": [
+        {"id": "u1", "name": "Host", "isHost": True, "joinedAt": datetime(2024, 1, 1, 9, 30, 0, 123456)},
+        {"id": "u2", "name": "Cändidate", "isHost": False, "joinedAt": datetime(2024, 1, 1, 9, 31)},
+    ],
+    "createdAt": datetime(2024, 1, 1, 9, 30),
+    "isActive": True,
+}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_matches_default_encoding(use_orjson: bool, monkeypatch):
+    """Test fast encoding is byte-identical to FastAPI's default path."""
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+
+    expected = JSONResponse(jsonable_encoder(SESSION)).body
+    assert serialization.FastJSONResponse(SESSION).body == expected
+
+
+def test_fast_path_endpoints(client: TestClient, monkeypatch):
+    """Test endpoints return the same payloads with the fast path enabled."""
+    monkeypatch.setattr(main, "FAST_JSON_RESPONSES", True)
+
+    create = client.post("/sessions", json={"hostName": "Host"})
+    assert create.status_code == 201
+    session_id = create.json()["sessionId"]
+
+    join = client.post(f"/sessions/{session_id}/join", json={"userName": "Candidate"})
+    assert join.status_code == 200
+    assert len(join.json()["session"]["participants"]) == 2
+
+    monkeypatch.setattr(main, "FAST_JSON_RESPONSES", False)
+    slow = client.get(f"/sessions/{session_id}")
+    monkeypatch.setattr(main, "FAST_JSON_RESPONSES", True)
+    fast = client.get(f"/sessions/{session_id}")
+    assert fast.status_code == 200
+    assert fast.content == slow.content
@@ -199,3 +199,155 @@ def test_health_check(client: TestClient):
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_update_code_noop_is_skipped(client: TestClient, test_db):
+    """Test re-sending unchanged code does not write a history row."""
+    from app.orm_models import CodeChange
+
+    create_response = client.post("/sessions", json={"hostName": "Host"})
+    session_id = create_response.json()["sessionId"]
+    body = {"userId": "host", "code": "print(1)", "language": "python"}
+
+    for _ in range(3):
+        assert client.patch(f"/sessions/{session_id}/code", json=body).status_code == 204
+    assert test_db.query(CodeChange).filter(CodeChange.session_id == session_id).count() == 1
+
+    # A language switch with the same text is still recorded
+    body["language"] = "javascript"
+    client.patch(f"/sessions/{session_id}/code", json=body)
+    assert test_db.query(CodeChange).filter(CodeChange.session_id == session_id).count() == 2
+    assert client.get(f"/sessions/{session_id}").json()["language"] == "javascript"
+
+
+def test_identical_code_is_stored_once(client: TestClient, test_db):
+    """Test sessions sharing the default template reference a single blob."""
+    from app.orm_models import CodeBlob
+
+    for _ in range(3):
+        client.post("/sessions", json={"hostName": "Host"})
+    assert test_db.query(CodeBlob).count() == 1
+
+
+def test_get_session_sparse_fields(client: TestClient):
+    """Test fields= returns only the requested parts of the session."""
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    client.post(f"/sessions/{session_id}/join", json={"userName": "Candidate"})
+
+    data = client.get(f"/sessions/{session_id}?fields=participants").json()
+    assert set(data) == {"id", "participants"}
+    assert [p["name"] for p in data["participants"]] == ["Host", "Candidate"]
+
+    data = client.get(f"/sessions/{session_id}?fields=code,language").json()
+    assert set(data) == {"id", "code", "language"}
+    assert data["language"] == "javascript"
+
+    full = client.get(f"/sessions/{session_id}").json()
+    assert list(full) == ["id", "code", "language", "participants", "createdAt", "isActive"]
+
+    response = client.get(f"/sessions/{session_id}?fields=code,secret")
+    assert response.status_code == 400
+    assert "secret" in response.json()["detail"]
+    assert client.get("/sessions/missing?fields=code").status_code == 404
+
+
+def test_get_session_fields_skip_unrequested_tables(test_db):
+    """Test unrequested relationships are not queried."""
+    from app import tracing
+    from app.database import DatabaseService
+
+    service = DatabaseService(test_db)
+    session_id, _ = service.create_session("Host", "http://test")
+
+    trace = tracing.RequestTrace()
+    token = tracing._current_trace.set(trace)
+    try:
+        service.get_session(session_id, {"participants"})
+    finally:
+        tracing._current_trace.reset(token)
+    statements = " ".join(trace.statements)
+    assert "code_blobs" not in statements
+    assert "FROM users" in statements
+
+    trace = tracing.RequestTrace()
+    token = tracing._current_trace.set(trace)
+    try:
+        service.get_session(session_id, {"code"})
+    finally:
+        tracing._current_trace.reset(token)
+    assert trace.query_count == 1
+    assert "FROM users" not in " ".join(trace.statements)
+
+
+def test_batch_create_sessions(client: TestClient):
+    """Test many sessions with their hosts are created in one request."""
+    hosts = [{"hostName": f"Host {i}"} for i in range(50)]
+    response = client.post("/sessions/batch", json={"sessions": hosts})
+    assert response.status_code == 201
+    created = response.json()["sessions"]
+    assert len({s["sessionId"] for s in created}) == 50
+    assert all(s["shareLink"].endswith(f"/interview/{s['sessionId']}") for s in created)
+
+    session = client.get(f"/sessions/{created[7]['sessionId']}").json()
+    assert session["participants"][0]["name"] == "Host 7"
+    assert session["participants"][0]["isHost"] is True
+    assert session["isActive"] is True
+
+    assert client.post("/sessions/batch", json={"sessions": []}).status_code == 422
+
+
+def test_batch_create_uses_bulk_statements(test_db):
+    """Test the statement count does not grow with the batch size."""
+    from app import tracing
+    from app.database import DatabaseService
+
+    trace = tracing.RequestTrace()
+    token = tracing._current_trace.set(trace)
+    try:
+        DatabaseService(test_db).create_sessions([f"Host {i}" for i in range(200)], "http://test")
+    finally:
+        tracing._current_trace.reset(token)
+    inserts = [s for s in trace.statements if s.lstrip().upper().startswith("INSERT")]
+    assert sum(trace.statements[s] for s in inserts) <= 3
+
+
+def test_batch_create_avoids_taken_ids(client: TestClient, test_db, monkeypatch):
+    """Test generated ids that already exist are replaced instead of failing the batch."""
+    import uuid
+
+    from app.database import DatabaseService
+
+    taken = client.post("/sessions", json={"hostName": "Alice"}).json()["sessionId"]
+    real_uuid4 = uuid.uuid4
+    ids = iter([taken + "-0000", taken + "-0000", "aaaaaaaa-0000", "bbbbbbbb-0000"])
+    monkeypatch.setattr(uuid, "uuid4", lambda: next(ids, None) or real_uuid4())
+    created = DatabaseService(test_db).create_sessions(["Bob", "Carol"], "http://test")
+    assert sorted(session_id for session_id, _ in created) == ["aaaaaaaa", "bbbbbbbb"]
+    monkeypatch.undo()
+
+    # An id taken after the check (by a concurrent request) retries the batch
+    service = DatabaseService(test_db)
+    fresh = service._new_session_ids
+    attempts = iter([[taken], None])
+    monkeypatch.setattr(service, "_new_session_ids", lambda count: next(attempts) or fresh(count))
+    [(session_id, _)] = service.create_sessions(["Dave"], "http://test")
+    assert session_id != taken
+    assert client.get(f"/sessions/{session_id}").json()["participants"][0]["name"] == "Dave"
+    assert client.get(f"/sessions/{taken}").json()["participants"][0]["name"] == "Alice"
+
+
+def test_lookup_sessions(client: TestClient):
+    """Test summaries come back in request order with missing ids listed."""
+    first = client.post("/sessions", json={"hostName": "Alice"}).json()["sessionId"]
+    second = client.post("/sessions", json={"hostName": "Bob"}).json()["sessionId"]
+    client.post(f"/sessions/{second}/join", json={"userName": "Candidate"})
+    client.post(f"/sessions/{first}/end")
+
+    response = client.post("/sessions/lookup", json={"sessionIds": [second, "nope", first, second]})
+    assert response.status_code == 200
+    data = response.json()
+    assert [s["id"] for s in data["sessions"]] == [second, first]
+    assert data["missing"] == ["nope"]
+    assert data["sessions"][0]["hostName"] == "Bob"
+    assert data["sessions"][0]["participantCount"] == 2
+    assert data["sessions"][1]["isActive"] is False
@@ -0,0 +1,92 @@
+"""Tests for serving the frontend build from the static asset index."""
+
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.static_assets import DEFAULT_CACHE, IMMUTABLE_CACHE, INDEX_CACHE, StaticAssetIndex
+
+
+SCRIPT = "export function render() { return 'hello world'; }\n" * 100
+
+
+@pytest.fixture
+def static_root(tmp_path, monkeypatch):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<!doctype html><div id=root></div>")
+    (tmp_path / "assets" / "index-B2x9Kq1a.js").write_text(SCRIPT)
+    (tmp_path / "favicon.ico").write_bytes(b"\x00\x01" * 10)
+    monkeypatch.setattr(main, "static_assets", StaticAssetIndex.build(tmp_path))
+    return tmp_path
+
+
+def test_spa_routes_serve_index(client: TestClient, static_root):
+    """Test the root and client-side routes serve index.html without caching."""
+    for path in ("/", "/interview/abc123", "/missing.js"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert "id=root" in response.text
+        assert response.headers["cache-control"] == INDEX_CACHE
+
+
+def test_hashed_asset_is_immutable_and_compressed(client: TestClient, static_root):
+    """Test hashed assets get long-lived caching and a gzip variant."""
+    response = client.get("/assets/index-B2x9Kq1a.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.text == SCRIPT
+
+    raw = client.get("/assets/index-B2x9Kq1a.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert raw.text == SCRIPT
+    assert raw.headers["etag"] != response.headers["etag"]
+
+
+def test_only_hashed_build_assets_are_immutable(tmp_path):
+    """Test dashed names outside assets/ keep the default caching."""
+    (tmp_path / "assets").mkdir()
+    for rel in ("site-manifest.json", "apple-touch-icon.png", "assets/logo.svg", "assets/index-B2x9Kq1a.css"):
+        (tmp_path / rel).write_text("{}")
+
+    index = StaticAssetIndex.build(tmp_path)
+    assert index.get("site-manifest.json").cache_control == DEFAULT_CACHE
+    assert index.get("apple-touch-icon.png").cache_control == DEFAULT_CACHE
+    assert index.get("assets/logo.svg").cache_control == DEFAULT_CACHE
+    assert index.get("assets/index-B2x9Kq1a.css").cache_control == IMMUTABLE_CACHE
+
+
+def test_precompressed_sibling_is_used(tmp_path):
+    """Test a .gz file from the build is served instead of compressing again."""
+    (tmp_path / "app.css").write_text("body { color: red; }\n" * 100)
+    prebuilt = gzip.compress(b"precompressed")
+    (tmp_path / "app.css.gz").write_bytes(prebuilt)
+
+    index = StaticAssetIndex.build(tmp_path)
+    assert index.get("app.css.gz") is None
+    assert index.get("app.css").variants["gzip"] == prebuilt
+
+
+def test_if_none_match_returns_304(client: TestClient, static_root):
+    """Test a matching ETag, for any encoding, short-circuits with 304."""
+    first = client.get("/assets/index-B2x9Kq1a.js", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["etag"]
+
+    response = client.get("/assets/index-B2x9Kq1a.js", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get("/favicon.ico", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+
+
+def test_static_prefix_and_missing_build(client: TestClient, static_root, monkeypatch):
+    """Test /static serves files directly and the fallback without a build."""
+    assert client.get("/static/favicon.ico").content == b"\x00\x01" * 10
+    assert client.get("/static/nope.js").status_code == 404
+
+    monkeypatch.setattr(main, "static_assets", StaticAssetIndex.build(static_root / "absent"))
+    assert client.get("/interview/abc").json() == {"detail": "Not Found"}
@@ -0,0 +1,141 @@
+"""Tests for incrementally maintained session activity stats."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import documents as documents_module
+from app.database import DatabaseService
+from app.documents import DocumentStore
+
+
+def _session(client: TestClient) -> str:
+    return client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+
+
+def _update(client: TestClient, session_id: str, code: str):
+    client.patch(f"/sessions/{session_id}/code", json={"userId": "u", "code": code, "language": "python"})
+
+
+def test_stats_follow_edits_and_runs(client: TestClient):
+    """Test updates, typed characters and runs are counted as they happen."""
+    session_id = _session(client)
+    stats = client.get(f"/sessions/{session_id}/stats").json()
+    assert stats["codeUpdates"] == 0 and stats["runs"] == 0
+    assert stats["timeToFirstRunSeconds"] is None and stats["charsPerActiveMinute"] is None
+
+    _update(client, session_id, "x = 1\n")
+    _update(client, session_id, "x = 1\ny = 22\n")
+    _update(client, session_id, "x = 1\ny = 22\n")  # no-op
+    _update(client, session_id, "x = 1\n")
+    client.post(f"/sessions/{session_id}/execute", json={"code": "print(1)", "language": "python"})
+    client.post(f"/sessions/{session_id}/execute", json={"code": "throw 1", "language": "javascript"})
+
+    stats = client.get(f"/sessions/{session_id}/stats?window=5").json()
+    assert stats["codeUpdates"] == 3
+    # The first update replaces the template, which already ends in a newline
+    assert stats["charsInserted"] == 5 + 7
+    assert stats["charsDeleted"] > 7
+    assert stats["runs"] == 2 and stats["failedRuns"] == 1
+    assert stats["activeMinutes"] == len(stats["recent"]) >= 1
+    assert sum(bucket["codeUpdates"] for bucket in stats["recent"]) == 3
+    assert stats["timeToFirstRunSeconds"] >= 0
+    assert stats["charsPerActiveMinute"] == 12 / stats["activeMinutes"]
+
+    assert client.get("/sessions/missing/stats").status_code == 404
+
+
+def test_stats_do_not_scan_history(client: TestClient, test_db):
+    """Test reading stats never touches code_changes."""
+    from app import tracing
+
+    session_id = _session(client)
+    for i in range(5):
+        _update(client, session_id, f"x = {i}\n")
+    trace = tracing.RequestTrace()
+    token = tracing._current_trace.set(trace)
+    try:
+        DatabaseService(test_db).get_session_stats(session_id, timedelta(minutes=60))
+        DatabaseService(test_db).summarize_stats()
+    finally:
+        tracing._current_trace.reset(token)
+    assert "code_changes" not in " ".join(trace.statements)
+
+
+def test_minute_buckets(test_db, client: TestClient):
+    """Test activity in separate minutes lands in separate buckets."""
+    session_id = _session(client)
+    service = DatabaseService(test_db)
+    start = datetime.utcnow().replace(second=30) - timedelta(minutes=3)
+    for offset in (0, 0, 1, 3):
+        service.record_activity(session_id, start + timedelta(minutes=offset), codeUpdates=1, charsInserted=10)
+    test_db.commit()
+
+    stats = service.get_session_stats(session_id, timedelta(minutes=10))
+    assert [bucket["codeUpdates"] for bucket in stats["recent"]] == [2, 1, 1]
+    assert stats["activeMinutes"] == 3
+    assert stats["firstEditAt"] == start
+    assert service.get_session_stats(session_id, timedelta(minutes=2))["recent"][-1]["codeUpdates"] == 1
+
+
+def test_ops_and_summary(client: TestClient, test_db, monkeypatch):
+    """Test live-document edits are counted on flush and totals aggregate sessions."""
+    store = DocumentStore()
+    monkeypatch.setattr(documents_module, "documents", store)
+    monkeypatch.setattr("main.documents", store)
+
+    first, second = _session(client), _session(client)
+    client.post(f"/sessions/{first}/ops", json={"userId": "u", "ops": [{"start": 0, "text": "ab"}]})
+    client.post(f"/sessions/{first}/ops", json={"userId": "u", "ops": [{"start": 0, "end": 1, "text": ""}]})
+    store.flush(test_db)
+    stats = client.get(f"/sessions/{first}/stats").json()
+    assert (stats["codeUpdates"], stats["charsInserted"], stats["charsDeleted"]) == (2, 2, 1)
+
+    _update(client, second, "abc")
+    client.post(f"/sessions/{second}/execute", json={"code": "print(1)", "language": "python"})
+    summary = client.get("/stats/sessions").json()
+    assert summary["sessions"] == 2
+    assert summary["codeUpdates"] == 3 and summary["runs"] == 1
+    assert summary["avgTimeToFirstRunSeconds"] >= 0
+
+    future = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    assert client.get(f"/stats/sessions?since={future}").json()["sessions"] == 0
+
+
+def test_flush_keeps_activity_until_saved(client: TestClient, test_db, monkeypatch):
+    """Test activity survives a failed save and lands on the minute of the edit."""
+    store = DocumentStore()
+    monkeypatch.setattr(documents_module, "documents", store)
+    monkeypatch.setattr("main.documents", store)
+    session_id = _session(client)
+    edited_at = datetime(2024, 5, 1, 12, 30, 15)
+
+    class _Clock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return edited_at
+
+    with monkeypatch.context() as patch:
+        patch.setattr(documents_module, "datetime", _Clock)
+        client.post(f"/sessions/{session_id}/ops", json={"userId": "u", "ops": [{"start": 0, "text": "ab"}]})
+
+    def failing_save(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(DatabaseService, "save_document", failing_save)
+        with pytest.raises(RuntimeError):
+            store.flush(test_db)
+    assert client.get(f"/sessions/{session_id}/stats").json()["codeUpdates"] == 0
+
+    store.flush(test_db)
+    stats = DatabaseService(test_db).get_session_stats(session_id, timedelta(days=10000))
+    assert (stats["codeUpdates"], stats["charsInserted"]) == (1, 2)
+    assert stats["firstEditAt"] == stats["lastEditAt"] == edited_at
+    assert [bucket["minute"] for bucket in stats["recent"]] == [edited_at.replace(second=0)]
+
+    # Once saved, the counts are not written again
+    client.post(f"/sessions/{session_id}/ops", json={"userId": "u", "ops": [{"start": 0, "text": "c"}]})
+    store.flush(test_db)
+    assert client.get(f"/sessions/{session_id}/stats").json()["codeUpdates"] == 2
@@ -0,0 +1,71 @@
+"""Tests for per-request SQL tracing."""
+
+import logging
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import tracing
+from app.orm_models import SessionUser
+
+
+def test_server_timing_header(client: TestClient, monkeypatch):
+    """Test responses carry db time and query count when enabled."""
+    monkeypatch.setattr(tracing, "SERVER_TIMING", True)
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+
+    response = client.get(f"/sessions/{session_id}")
+    header = response.headers["server-timing"]
+    assert header.startswith("db;dur=")
+    assert 'queries"' in header
+    assert client.get("/health").headers["server-timing"].endswith('desc="0 queries"')
+
+
+def test_slow_queries_logged_with_route(client: TestClient, monkeypatch, caplog):
+    """Test statements over the threshold are logged with their route template."""
+    monkeypatch.setattr(tracing, "SLOW_QUERY_MS", 0)
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+
+    with caplog.at_level(logging.WARNING, logger="app.tracing"):
+        client.get(f"/sessions/{session_id}")
+    assert any("Slow query" in r.message and "/sessions/{session_id}" in r.message for r in caplog.records)
+
+
+def test_repeated_statements_flagged(test_db: Session, monkeypatch, caplog):
+    """Test a request running one statement shape many times is reported."""
+    monkeypatch.setattr(tracing, "N_PLUS_ONE_THRESHOLD", 3)
+    trace = tracing.RequestTrace({"path": "/loop"})
+    token = tracing._current_trace.set(trace)
+    try:
+        for i in range(5):
+            test_db.execute(select(SessionUser).where(SessionUser.id == str(i))).all()
+    finally:
+        tracing._current_trace.reset(token)
+
+    assert trace.query_count >= 5
+    with caplog.at_level(logging.WARNING, logger="app.tracing"):
+        tracing.report_trace(trace)
+    assert any("Possible N+1 on /loop" in r.message and "ran 5 times" in r.message for r in caplog.records)
+
+
+def test_in_list_variants_count_as_one_statement(test_db: Session, monkeypatch):
+    """Test IN lists of different lengths add up to one repeated shape."""
+    monkeypatch.setattr(tracing, "N_PLUS_ONE_THRESHOLD", 3)
+    trace = tracing.RequestTrace({"path": "/loop"})
+    token = tracing._current_trace.set(trace)
+    try:
+        for i in range(1, 6):
+            test_db.execute(select(SessionUser).where(SessionUser.id.in_([str(n) for n in range(i)]))).all()
+    finally:
+        tracing._current_trace.reset(token)
+
+    [(shape, count)] = trace.repeated_statements()
+    assert count == 5 and "IN (?)" in shape
+
+
+def test_statement_shape_collapses_parameter_lists():
+    """Test IN lists of different lengths normalize to one shape."""
+    a = tracing.statement_shape("SELECT id FROM users WHERE id IN (?, ?, ?)")
+    b = tracing.statement_shape("SELECT id\n  FROM users WHERE id IN (?)")
+    assert a == b == "SELECT id FROM users WHERE id IN (?)"
@@ -0,0 +1,97 @@
+"""Tests for the optional MessagePack wire format."""
+
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import wire
+from app.models import InterviewSession
+
+
+MSGPACK = {"Accept": "application/msgpack"}
+
+
+def test_schema_follows_model_fields(client: TestClient):
+    """Test the published schema matches the Pydantic field order."""
+    data = client.get("/wire/schema").json()
+    assert data["InterviewSession"] == [
+        "id",
+        "code",
+        "language",
+        ["participants", ["id", "name", "isHost", "joinedAt"]],
+        "createdAt",
+        "isActive",
+    ]
+    assert data["AwarenessResponse"] == ["cursor", "states", "removed"]
+
+
+def test_positional_round_trip():
+    """Test encode/decode of nested models through positional arrays."""
+    now = datetime(2024, 1, 2, 3, 4, 5)
+    session = {
+        "id": "abc",
+        "code": "x",
+        "language": "python",
+        "participants": [{"id": "u1", "name": "A", "isHost": True, "joinedAt": now}],
+        "createdAt": now,
+        "isActive": True,
+    }
+    array = wire.encode_model(InterviewSession, session)
+    millis = 1704164645000
+    assert array == ["abc", "x", "python", [["u1", "A", True, millis]], millis, True]
+    assert wire.decode_model(InterviewSession, array) == session
+    assert wire.encode_model(InterviewSession, {"id": "abc", "code": "x"}) == ["abc", "x", None, None, None, None]
+
+
+def test_negotiation():
+    """Test MessagePack is only chosen when explicitly accepted."""
+    pytest.importorskip("msgpack")
+    assert wire.wants_msgpack("application/msgpack")
+    assert wire.wants_msgpack("application/json;q=0.5, application/x-msgpack")
+    assert not wire.wants_msgpack("application/msgpack;q=0")
+    assert not wire.wants_msgpack("*/*")
+    assert not wire.wants_msgpack(None)
+
+
+def test_session_over_msgpack(client: TestClient):
+    """Test GET and join return positional MessagePack when negotiated."""
+    pytest.importorskip("msgpack")
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+
+    response = client.get(f"/sessions/{session_id}", headers=MSGPACK)
+    assert response.headers["content-type"] == "application/msgpack"
+    assert "Accept" in response.headers["vary"]
+    session = wire.decode_model(InterviewSession, wire.unpackb(response.content))
+    assert session["id"] == session_id
+    assert session["participants"][0]["name"] == "Host"
+    assert isinstance(session["createdAt"], datetime)
+    assert len(response.content) < len(client.get(f"/sessions/{session_id}").content)
+
+    response = client.post(f"/sessions/{session_id}/join", json={"userName": "C"}, headers=MSGPACK)
+    session_array, user_id = wire.unpackb(response.content)
+    assert session_array[0] == session_id
+    assert isinstance(user_id, str)
+
+    assert client.get(f"/sessions/{session_id}").headers["content-type"] == "application/json"
+
+
+def test_text_heavy_messages_stay_json(client: TestClient, monkeypatch):
+    """Test sessions with more code than WIRE_MSGPACK_MAX_TEXT are sent as JSON."""
+    pytest.importorskip("msgpack")
+    monkeypatch.setattr(wire, "WIRE_MSGPACK_MAX_TEXT", 100)
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    client.patch(f"/sessions/{session_id}/code", json={"userId": "u", "code": "x = 1\n" * 50, "language": "python"})
+    response = client.get(f"/sessions/{session_id}", headers=MSGPACK)
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["code"] == "x = 1\n" * 50
+    small = client.get(f"/sessions/{session_id}?fields=language", headers=MSGPACK)
+    assert small.headers["content-type"] == "application/msgpack"
+
+
+def test_fallback_without_msgpack(client: TestClient, monkeypatch):
+    """Test JSON is served when msgpack is not installed."""
+    monkeypatch.setattr(wire, "msgpack", None)
+    session_id = client.post("/sessions", json={"hostName": "Host"}).json()["sessionId"]
+    response = client.get(f"/sessions/{session_id}", headers=MSGPACK)
+    assert response.json()["id"] == session_id
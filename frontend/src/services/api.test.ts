@@ -127,6 +127,30 @@ describe('API Service', () => {
       unsubscribe();
     });
 
+    it('should attribute a batch with edits from several users to no one', async () => {
+      const { sessionId } = await api.createSession('Host');
+      const session = await api.getSession(sessionId);
+      const hostId = session?.participants[0].id || '';
+      const { userId: guestId } = await api.joinSession(sessionId, 'Candidate');
+
+      const callback = vi.fn();
+      const unsubscribe = api.subscribeToCodeChanges(sessionId, callback);
+      await vi.waitFor(() => expect(callback).toHaveBeenCalled());
+
+      await api.updateCode(sessionId, guestId, 'guest edit', 'javascript');
+      await api.updateCode(sessionId, hostId, 'guest edit, host edit', 'javascript');
+
+      await vi.waitFor(
+        () =>
+          expect(callback).toHaveBeenLastCalledWith(
+            expect.objectContaining({ content: 'guest edit, host edit', userId: '' })
+          ),
+        { timeout: 3000 }
+      );
+
+      unsubscribe();
+    });
+
     it('should stop notifying after unsubscribe', async () => {
       const { sessionId } = await api.createSession('Host');
       const session = await api.getSession(sessionId);
@@ -6,17 +6,34 @@ import type {
   ExecutionResult,
   User,
   CodeChange,
+  AwarenessState,
+  Selection,
+  ChangesResponse,
+  DiagnosticsResponse,
 } from '@/types/interview';
 
 const DEFAULT_POLL_INTERVAL = 1000;
+// Cursor moves are sent at most this often; the latest position wins
+const AWARENESS_SEND_INTERVAL = 100;
+const AWARENESS_POLL_INTERVAL = 250;
+
+const pendingAwareness = new Map<string, { userId: string; selection: Selection }>();
 
 const apiBase = (import.meta as any).env?.VITE_API_URL || 'http://localhost:8000';
 
 async function request<T = any>(input: string, init?: RequestInit): Promise<T> {
-  const res = await fetch(`${apiBase}${input}`, {
-    headers: { 'Content-Type': 'application/json' },
+  const options = {
     ...init,
-  });
+    headers: { 'Content-Type': 'application/json', ...init?.headers },
+  };
+  let res: Response;
+  try {
+    res = await fetch(`${apiBase}${input}`, options);
+  } catch (err) {
+    // Requests with an Idempotency-Key are safe to resend after a network error
+    if (!(options.headers as Record<string, string>)['Idempotency-Key']) throw err;
+    res = await fetch(`${apiBase}${input}`, options);
+  }
 
   const text = await res.text();
   try {
@@ -30,6 +47,11 @@ async function request<T = any>(input: string, init?: RequestInit): Promise<T> {
   }
 }
 
+// Lets the backend recognise a resent POST and replay its first response
+function idempotencyKey(): Record<string, string> {
+  return { 'Idempotency-Key': crypto.randomUUID() };
+}
+
 // Simple polling-based subscriptions until real-time is added
 function createPoller<T>(
   getState: () => Promise<T | null>,
@@ -63,6 +85,7 @@ export const api = {
   async createSession(hostName: string): Promise<CreateSessionResponse> {
     const body = await request<CreateSessionResponse>('/sessions', {
       method: 'POST',
+      headers: idempotencyKey(),
       body: JSON.stringify({ hostName }),
     });
     return body;
@@ -71,6 +94,7 @@ export const api = {
   async joinSession(sessionId: string, userName: string): Promise<JoinSessionResponse> {
     const body = await request<JoinSessionResponse>(`/sessions/${sessionId}/join`, {
       method: 'POST',
+      headers: idempotencyKey(),
       body: JSON.stringify({ userName }),
     });
     return body;
@@ -85,6 +109,20 @@ export const api = {
     }
   },
 
+  // Fetch only some fields of a session; the backend skips the rest entirely
+  async getSessionFields<K extends keyof InterviewSession>(
+    sessionId: string,
+    fields: K[],
+  ): Promise<Pick<InterviewSession, 'id' | K> | null> {
+    try {
+      return await request<Pick<InterviewSession, 'id' | K>>(
+        `/sessions/${sessionId}?fields=${fields.join(',')}`,
+      );
+    } catch (e) {
+      return null;
+    }
+  },
+
   async updateCode(sessionId: string, userId: string, code: string, language: SupportedLanguage): Promise<void> {
     await request(`/sessions/${sessionId}/code`, {
       method: 'PATCH',
@@ -92,6 +130,15 @@ export const api = {
     });
   },
 
+  // Syntax errors of the current code; cheap to poll, reparsed only when the code changes
+  async getDiagnostics(sessionId: string): Promise<DiagnosticsResponse | null> {
+    try {
+      return await request<DiagnosticsResponse>(`/sessions/${sessionId}/diagnostics`);
+    } catch (e) {
+      return null;
+    }
+  },
+
   async executeCode(code: string, language: SupportedLanguage, sessionId?: string): Promise<ExecutionResult> {
     // Determine sessionId from current location if not provided
     let sid = sessionId;
@@ -103,6 +150,7 @@ export const api = {
     if (sid) {
       const body = await request<ExecutionResult>(`/sessions/${sid}/execute`, {
         method: 'POST',
+        headers: idempotencyKey(),
         body: JSON.stringify({ code, language }),
       });
       return body;
@@ -117,23 +165,102 @@ export const api = {
   },
 
   subscribeToCodeChanges(sessionId: string, callback: (change: CodeChange) => void): () => void {
-    const getState = async () => {
-      const s = await this.getSession(sessionId);
-      if (!s) return null;
-      return { userId: '', content: s.code, timestamp: new Date(), language: s.language } as unknown as CodeChange;
+    // Resume from the last seen version; the backend sends only missed edits,
+    // or a snapshot when it no longer has them. Edit offsets count UTF-16 code
+    // units, so they apply directly with slice.
+    let stopped = false;
+    let version = -1;
+    let code = '';
+
+    const run = async () => {
+      if (stopped) return;
+      try {
+        const body = await request<ChangesResponse>(`/sessions/${sessionId}/changes?last_version=${version}`);
+        if (body.snapshot) {
+          code = body.snapshot.code;
+          version = body.version;
+          callback({ userId: '', content: code, timestamp: new Date(), language: body.snapshot.language });
+        } else if (body.changes.length) {
+          for (const { edit } of body.changes) {
+            code = code.slice(0, edit.start) + edit.text + code.slice(edit.end);
+          }
+          const last = body.changes[body.changes.length - 1];
+          // The merged text carries everyone's edits in the batch; only attribute it
+          // to one user when all of them are theirs, so others' edits are not dropped
+          const userId = body.changes.every((change) => change.userId === last.userId) ? last.userId : '';
+          version = body.version;
+          callback({ userId, content: code, timestamp: new Date(last.timestamp), language: last.language });
+        }
+      } catch (e) {
+        // ignore transient errors
+      }
+      if (!stopped) setTimeout(run, DEFAULT_POLL_INTERVAL);
+    };
+
+    run();
+    return () => {
+      stopped = true;
     };
-    // Poll and call callback with a CodeChange-like object
-    return createPoller<CodeChange>(getState, callback);
   },
 
   subscribeToParticipants(sessionId: string, callback: (participants: User[]) => void): () => void {
     const getState = async () => {
-      const s = await this.getSession(sessionId);
+      const s = await this.getSessionFields(sessionId, ['participants']);
       return s ? s.participants : null;
     };
     return createPoller<User[]>(getState, callback);
   },
 
+  updateAwareness(sessionId: string, userId: string, selection: Selection): void {
+    const queued = pendingAwareness.has(sessionId);
+    pendingAwareness.set(sessionId, { userId, selection });
+    if (queued) return;
+    setTimeout(() => {
+      const latest = pendingAwareness.get(sessionId);
+      pendingAwareness.delete(sessionId);
+      if (!latest) return;
+      request(`/sessions/${sessionId}/awareness`, {
+        method: 'PUT',
+        body: JSON.stringify(latest),
+      }).catch(() => {
+        // cursor positions are best effort
+      });
+    }, AWARENESS_SEND_INTERVAL);
+  },
+
+  subscribeToAwareness(
+    sessionId: string,
+    callback: (states: AwarenessState[]) => void,
+  ): () => void {
+    let stopped = false;
+    let cursor = 0;
+    const states = new Map<string, Selection>();
+
+    const run = async () => {
+      if (stopped) return;
+      try {
+        const body = await request<{ cursor: number; states: [string, ...Selection][]; removed: string[] }>(
+          `/sessions/${sessionId}/awareness?since=${cursor}`,
+        );
+        if (body.cursor < cursor) states.clear();
+        cursor = body.cursor;
+        if (body.states.length || body.removed.length) {
+          for (const [userId, ...selection] of body.states) states.set(userId, selection as Selection);
+          for (const userId of body.removed) states.delete(userId);
+          callback([...states].map(([userId, selection]) => ({ userId, selection })));
+        }
+      } catch (e) {
+        // ignore transient errors
+      }
+      if (!stopped) setTimeout(run, AWARENESS_POLL_INTERVAL);
+    };
+
+    run();
+    return () => {
+      stopped = true;
+    };
+  },
+
   async leaveSession(sessionId: string, userId: string): Promise<void> {
     await request(`/sessions/${sessionId}/leave`, {
       method: 'POST',
@@ -7,6 +7,14 @@ export interface User {
   joinedAt: Date;
 }
 
+// [anchorLine, anchorColumn, headLine, headColumn]; a bare cursor has anchor === head
+export type Selection = [number, number, number, number];
+
+export interface AwarenessState {
+  userId: string;
+  selection: Selection;
+}
+
 export interface CodeChange {
   userId: string;
   content: string;
@@ -14,6 +22,20 @@ export interface CodeChange {
   language: SupportedLanguage;
 }
 
+export interface VersionedChange {
+  version: number;
+  userId: string;
+  language: SupportedLanguage;
+  timestamp: string;
+  edit: { start: number; end: number; text: string };
+}
+
+export interface ChangesResponse {
+  version: number;
+  changes: VersionedChange[];
+  snapshot: { code: string; language: SupportedLanguage } | null;
+}
+
 export interface InterviewSession {
   id: string;
   code: string;
@@ -23,6 +45,22 @@ export interface InterviewSession {
   isActive: boolean;
 }
 
+// Lines and columns are 1-based; the end is exclusive
+export interface Diagnostic {
+  line: number;
+  column: number;
+  endLine: number;
+  endColumn: number;
+  message: string;
+  severity: 'error' | 'warning';
+}
+
+export interface DiagnosticsResponse {
+  version: number;
+  language: SupportedLanguage;
+  diagnostics: Diagnostic[];
+}
+
 export interface ExecutionResult {
   success: boolean;
   output: string;